@@ -0,0 +1,262 @@
+from enum import Enum
+from itertools import compress
+from operator import not_
+
+
+class GroupBy(Enum):
+    """
+    Enum representing supported periods to group Near Earth Object close
+    approaches by in aggregation queries.
+    """
+    day = 'day'
+    month = 'month'
+    year = 'year'
+
+    @staticmethod
+    def list():
+        """
+        :return: list of string representations of GroupBy enums
+        """
+        return list(map(lambda period: period.value, GroupBy))
+
+    @property
+    def length(self):
+        """
+        :return: int representing the length of the YYYY-MM-DD date prefix
+        naming the period of a date
+        """
+        return {'day': 10, 'month': 7, 'year': 4}[self.value]
+
+
+class Summary(object):
+    """
+    Object holding the aggregates of the close approaches of a period: the
+    number of approaches and of hazardous approaches, the distinct NEOs and
+    the min, mean and max miss distance.
+
+    Summaries are built from the approaches of a single day, then merged
+    into the summaries of longer periods, or added to one approach at a
+    time when streaming filtered results.
+    """
+
+    __slots__ = ('period', 'is_hazardous', 'approaches', 'hazardous', 'neos',
+                 'miss_min_km', 'miss_max_km', 'miss_sum_km')
+
+    def __init__(self, period=None, is_hazardous=None):
+        """
+        :param period: str representing the day, month or year summarized
+        :param is_hazardous: bool representing the hazard flag of the
+        approaches summarized, or None for all of them
+        """
+        self.period = period
+        self.is_hazardous = is_hazardous
+        self.approaches = 0
+        self.hazardous = 0
+        self.neos = set()
+        self.miss_min_km = None
+        self.miss_max_km = None
+        self.miss_sum_km = 0.0
+
+    @classmethod
+    def from_values(cls, is_hazardous, miss_distances, neos):
+        """
+        :param is_hazardous: bool representing the hazard flag of every
+        approach
+        :param miss_distances: list of the miss distances of the approaches
+        :param neos: iterable of a key of the NEO of each approach
+        :return: Summary of the approaches
+        """
+        summary = cls(is_hazardous=is_hazardous)
+        summary.approaches = len(miss_distances)
+        summary.hazardous = summary.approaches if is_hazardous else 0
+        summary.neos = set(neos)
+        summary.miss_min_km = min(miss_distances)
+        summary.miss_max_km = max(miss_distances)
+        summary.miss_sum_km = sum(miss_distances)
+        return summary
+
+    def __str__(self):
+        summary_contents = f'period = {self.period}\n' + \
+                           f'approaches = {self.approaches}\n' + \
+                           f'hazardous approaches = {self.hazardous}\n' + \
+                           f'distinct NEOs = {self.distinct_neos}\n' + \
+                           f'min miss distance(km) = {self.miss_min_km}\n' + \
+                           'mean miss distance(km) = ' + \
+                           f'{self.miss_mean_km}\n' + \
+                           f'max miss distance(km) = {self.miss_max_km}\n'
+        if self.is_hazardous is not None:
+            summary_contents += f'is hazardous = {self.is_hazardous}\n'
+        return summary_contents
+
+    @property
+    def distinct_neos(self):
+        """
+        :return: int representing the number of distinct NEOs approaching
+        """
+        return len(self.neos)
+
+    @property
+    def miss_mean_km(self):
+        """
+        :return: float representing the mean miss distance, or None without
+        approaches
+        """
+        if not self.approaches:
+            return None
+        return self.miss_sum_km / self.approaches
+
+    def add(self, miss_distance_km, is_hazardous, neo):
+        """
+        Adds a single approach
+
+        :param miss_distance_km: float representing its miss distance
+        :param is_hazardous: bool representing its hazard flag
+        :param neo: key of its NEO
+        :return: None
+        """
+        self.approaches += 1
+        self.hazardous += is_hazardous
+        self.neos.add(neo)
+        self.miss_sum_km += miss_distance_km
+
+        if self.miss_min_km is None or miss_distance_km < self.miss_min_km:
+            self.miss_min_km = miss_distance_km
+        if self.miss_max_km is None or miss_distance_km > self.miss_max_km:
+            self.miss_max_km = miss_distance_km
+
+    def merge(self, other):
+        """
+        Adds the approaches of another summary
+
+        :param other: Summary
+        :return: None
+        """
+        self.approaches += other.approaches
+        self.hazardous += other.hazardous
+        self.neos |= other.neos
+        self.miss_sum_km += other.miss_sum_km
+
+        if self.miss_min_km is None or other.miss_min_km < self.miss_min_km:
+            self.miss_min_km = other.miss_min_km
+        if self.miss_max_km is None or other.miss_max_km > self.miss_max_km:
+            self.miss_max_km = other.miss_max_km
+
+
+class DailySummaries(object):
+    """
+    Object holding the Summary of the approaches of every date of a
+    NEODatabase, one per hazard flag, so aggregation queries without filters
+    merge one summary per date and flag instead of reading every OrbitPath.
+    """
+
+    def __init__(self, dates, get_day):
+        """
+        :param dates: iterable of date strings
+        :param get_day: function of a date string to a tuple of the lists of
+        miss distances, hazard flags and NEO keys of its approaches
+        """
+        self.days = {approach_date: DailySummaries.summarize(
+            *get_day(approach_date)) for approach_date in dates}
+
+    @staticmethod
+    def summarize(miss_distances, hazard_flags, neos):
+        """
+        :param miss_distances: sequence of the miss distances of a date
+        :param hazard_flags: sequence of the hazard flags of the approaches
+        :param neos: sequence of a key of the NEO of each approach
+        :return: dict of hazard flag to the Summary of its approaches, for
+        the flags with approaches
+        """
+        hazardous = list(map(bool, hazard_flags))
+        summaries = {}
+
+        for is_hazardous, mask in ((False, list(map(not_, hazardous))),
+                                   (True, hazardous)):
+            distances = list(compress(miss_distances, mask))
+            if distances:
+                summaries[is_hazardous] = Summary.from_values(
+                    is_hazardous, distances, compress(neos, mask))
+
+        return summaries
+
+    def add(self, orbit):
+        """
+        Adds a single approach to the Summary of its date and flag
+
+        :param orbit: OrbitPath
+        :return: None
+        """
+        is_hazardous = bool(orbit.is_hazardous)
+        day = self.days.setdefault(orbit.close_approach_date, {})
+        if is_hazardous not in day:
+            day[is_hazardous] = Summary(is_hazardous=is_hazardous)
+        day[is_hazardous].add(orbit.miss_distance_km, is_hazardous,
+                              orbit.name)
+
+    def get(self, approach_date):
+        """
+        :param approach_date: str representing a date
+        :return: dict of hazard flag to Summary of the date
+        """
+        return self.days.get(approach_date, {})
+
+
+class Aggregator(object):
+    """
+    Object grouping the close approaches of a query into Summaries by
+    period, and optionally by hazard flag, in a single pass.
+    """
+
+    def __init__(self, group_by, by_hazard=False):
+        """
+        :param group_by: str representing the GroupBy period
+        :param by_hazard: bool representing if the approaches of each period
+        are also grouped by hazard flag
+        """
+        self.length = GroupBy(group_by).length
+        self.by_hazard = by_hazard
+        self.groups = {}
+
+    def get_group(self, approach_date, is_hazardous):
+        """
+        :param approach_date: str representing a date
+        :param is_hazardous: bool representing a hazard flag
+        :return: Summary of the group of the date and flag
+        """
+        period = approach_date[:self.length]
+        flag = bool(is_hazardous) if self.by_hazard else None
+        group = self.groups.get((period, flag))
+
+        if group is None:
+            group = self.groups[(period, flag)] = Summary(period, flag)
+        return group
+
+    def add_days(self, summaries, dates):
+        """
+        Merges the daily summaries of dates into their groups
+
+        :param summaries: DailySummaries
+        :param dates: iterable of date strings
+        :return: None
+        """
+        for approach_date in dates:
+            for is_hazardous, day in summaries.get(approach_date).items():
+                self.get_group(approach_date, is_hazardous).merge(day)
+
+    def add_orbits(self, orbits):
+        """
+        Adds OrbitPaths to their groups, one at a time
+
+        :param orbits: iterable of OrbitPaths
+        :return: None
+        """
+        for orbit in orbits:
+            self.get_group(orbit.close_approach_date, orbit.is_hazardous).add(
+                orbit.miss_distance_km, orbit.is_hazardous, orbit.name)
+
+    def results(self):
+        """
+        :return: list of the Summaries of the groups, in period order, the
+        approaches that are not hazardous first
+        """
+        return [self.groups[key] for key in sorted(self.groups)]
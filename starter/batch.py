@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Script to run a batch of Near Earth Object queries against a single load of
+the database.
+
+You can run from the commandline with: batch.py queries [args]
+Example: batch.py reports.json -f data/neo_data.csv --output_dir reports
+
+The queries file is a json list of query specs, or one json spec per line.
+A spec holds the options of main.py: date, or start_date and end_date,
+number, filter (a list of filter expressions) and return_object, and where
+its results go: output (csv_file by default, or display), output_file
+(query_<n>.csv in --output_dir by default) and gzip. For example:
+[{"start_date": "2020-01-01", "end_date": "2020-03-31",
+  "filter": ["is_hazardous:=:True"], "output_file": "hazardous_q1.csv"},
+ {"date": "2020-02-14", "number": 10, "return_object": "Path",
+  "output": "display"}]
+
+Queries whose date ranges overlap are answered together by a single scan of
+their combined range, each scanned block of orbits feeding the filters of
+every query covering it, so the time spent grows with the data scanned
+rather than with the number of queries.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+
+from aggregate import GroupBy
+from exceptions import UnsupportedFeature
+from columns import OrbitColumns
+from database import NEODatabase
+from planner import QueryPlanner
+from search import DateSearch, FilterExpression, Filter, Query
+from snapshot import Snapshot
+from partitions import PartitionManifest
+from rowindex import RowIndex
+from store import OrbitStore
+from writer import NEOWriter
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.absolute()
+
+
+class BatchQuery(object):
+    """
+    Object holding the pipeline of one query of a batch: the filters on the
+    orbits scanned, the projection to distinct NEOs, the filters on NEO
+    aggregates and the requested number. It is fed the orbits of the scans
+    it shares with the other queries, in date order.
+    """
+
+    def __init__(self, selectors, start_date, end_date, plan):
+        """
+        :param selectors: Query.Selectors object with query information
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :param plan: Plan of the query, giving the order of its filters
+        """
+        self.selectors = selectors
+        self.start_date = start_date
+        self.end_date = end_date
+        # Filters the plan evaluates through indexes are evaluated by the
+        # shared scan like any other
+        self.filters = plan.bitmap_filters + plan.filters
+        if plan.index_filter is not None:
+            self.filters = [plan.index_filter] + self.filters
+        # Queries with the same filters share the orbits passing them
+        self.key = tuple(sorted(filter.key() for filter in self.filters))
+        self.predicate = FilterExpression.compile(self.filters) \
+            if self.filters else None
+        self.neo_predicate = FilterExpression.compile(plan.neo_filters) \
+            if plan.neo_filters else None
+        self.unique = selectors.return_object == 'NEO'
+        self.number = selectors.number
+        self.seen = set()
+        self.results = []
+        self.done = self.number == 0
+
+    def feed(self, orbits):
+        """
+        Adds the results of orbits passing the filters of the query, until
+        the requested number is reached
+
+        :param orbits: iterable of OrbitPaths passing the filters, in date
+        order
+        :return: None
+        """
+        for orbit in orbits:
+            if self.unique:
+                result = orbit.neo
+                if result in self.seen:
+                    continue
+                self.seen.add(result)
+            else:
+                result = orbit
+
+            if self.neo_predicate is not None and \
+                    not self.neo_predicate(orbit.neo):
+                continue
+
+            self.results.append(result)
+            if len(self.results) == self.number:
+                self.done = True
+                return
+
+
+class BatchSearcher(object):
+    """
+    Object answering a batch of queries with shared scans.
+
+    The queries are grouped by overlapping date ranges and each group is
+    answered by one scan of its combined range: one date at a time over the
+    orbits of the database or, when it is columnar, one block of rows at a
+    time over its columns. Each block is handed to the queries covering it,
+    queries with the same filters sharing a single evaluation of them. A
+    scan stops as soon as every query of its group has its requested number
+    of results.
+    """
+
+    def __init__(self, db):
+        """
+        :param db: NEODatabase holding the NearEarthObject instances
+        and their OrbitPath instances
+        """
+        self.db = db
+        self.planner = QueryPlanner(db)
+        # Number of scans and of rows read by them
+        self.scans = 0
+        self.rows_scanned = 0
+
+    def prepare(self, selectors):
+        """
+        :param selectors: Query.Selectors object with query information
+        :return: BatchQuery
+        """
+        date_search = selectors.date_search
+
+        if date_search.get("type") == DateSearch.between.value:
+            start_date = date_search["start_date"]
+            end_date = date_search["end_date"]
+        else:
+            start_date = end_date = date_search.get("date")
+
+        filters = Filter.create_filter_options(selectors.filters or [])
+        filters, neo_filters = Filter.split_levels(filters)
+
+        # Filters on NEO aggregates need every partition loaded
+        if neo_filters:
+            self.db.load_range()
+        else:
+            self.db.load_range(start_date, end_date)
+
+        if date_search.get("type") != DateSearch.between.value and \
+                start_date not in self.db.neo_date_db:
+            print("date not found in database")
+            raise UnsupportedFeature
+        plan = self.planner.plan(
+            start_date, end_date, filters, selectors.number,
+            neo_filters=neo_filters,
+            unique=selectors.return_object == 'NEO')
+
+        return BatchQuery(selectors, start_date, end_date, plan)
+
+    def run(self, queries):
+        """
+        :param queries: list of Query.Selectors objects
+        :return: list of the list of results of each query
+        """
+        batch = [self.prepare(selectors) for selectors in queries]
+        self.execute(batch)
+        return [query.results for query in batch]
+
+    def execute(self, batch):
+        """
+        Answers prepared queries, filling the results of each
+
+        :param batch: list of BatchQuery objects
+        :return: None
+        """
+        for start_date, end_date, group in BatchSearcher.group(batch):
+            # Partitions evicted since the queries were prepared are
+            # loaded again
+            self.db.load_range(start_date, end_date)
+            self.scans += 1
+            if self.db.columnar:
+                self.scan_columns(group, start_date, end_date)
+            else:
+                self.scan_rows(group, start_date, end_date)
+
+    @staticmethod
+    def group(batch):
+        """
+        Helper function to group queries whose date ranges overlap
+
+        :param batch: list of BatchQuery objects
+        :return: list of tuples of the start date, end date and list of
+        BatchQuery objects of each group, in date order
+        """
+        groups = []
+
+        for query in sorted(batch, key=lambda query: query.start_date):
+            if groups and query.start_date <= groups[-1][1]:
+                start_date, end_date, group = groups[-1]
+                group.append(query)
+                groups[-1] = (start_date, max(end_date, query.end_date),
+                              group)
+            else:
+                groups.append((query.start_date, query.end_date, [query]))
+
+        return groups
+
+    def scan_rows(self, group, start_date, end_date):
+        """
+        Feeds the orbits of a date range to a group of queries, one date at
+        a time
+
+        :param group: list of BatchQuery objects within the date range
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :return: None
+        """
+        pending = [query for query in group if not query.done]
+
+        for approach_date in self.db.get_dates(start_date, end_date):
+            if not pending:
+                break
+
+            orbits = self.db.neo_date_db[approach_date]
+            self.rows_scanned += len(orbits)
+            passing = {}
+
+            for query in pending:
+                if not query.start_date <= approach_date <= query.end_date:
+                    continue
+                if query.key not in passing:
+                    passing[query.key] = orbits if query.predicate is None \
+                        else list(filter(query.predicate, orbits))
+                query.feed(passing[query.key])
+
+            pending = [query for query in pending if not query.done]
+
+    def scan_columns(self, group, start_date, end_date):
+        """
+        Feeds the orbits of a date range to a group of queries, one block of
+        rows of the columnar copy at a time
+
+        :param group: list of BatchQuery objects within the date range
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :return: None
+        """
+        columns = self.db.get_columns()
+        start, end = columns.get_rows(start_date, end_date)
+        rows = {query: columns.get_rows(query.start_date, query.end_date)
+                for query in group}
+        pending = [query for query in group if not query.done]
+
+        for block_start in range(start, end, OrbitColumns.BLOCK_SIZE):
+            if not pending:
+                break
+
+            block_end = min(block_start + OrbitColumns.BLOCK_SIZE, end)
+            self.rows_scanned += block_end - block_start
+            passing = {}
+
+            for query in pending:
+                query_start, query_end = rows[query]
+                low = max(block_start, query_start)
+                high = min(block_end, query_end)
+                if low >= high:
+                    continue
+                key = (query.key, low, high)
+                if key not in passing:
+                    passing[key] = columns.select(low, high, query.filters)
+                query.feed(passing[key])
+
+            pending = [query for query in pending if not query.done]
+
+    @staticmethod
+    def load_specs(filename):
+        """
+        Helper function to read a file of query specs
+
+        :param filename: str representing the pathway of a json list of
+        specs or of one json spec per line
+        :return: list of dicts of query options
+        """
+        with open(filename) as f:
+            text = f.read()
+
+        if text.lstrip().startswith('['):
+            return json.loads(text)
+
+        return [json.loads(line) for line in text.splitlines() if
+                line.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Near Earth Objects (NEOs) Database batch queries')
+    parser.add_argument(
+        'queries',
+        type=str,
+        help='Pathway of the json file of query specs')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        help='Name of input csv data file')
+    parser.add_argument(
+        '--output_dir',
+        type=str,
+        default='.',
+        help='Directory of the csv_file outputs without an output_file')
+    parser.add_argument(
+        '--columnar',
+        action='store_true',
+        help='Scan a columnar, array-backed copy of the orbit data')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Int representing the number of processes used to parse the '
+        'input csv file')
+    parser.add_argument(
+        '--no-snapshot',
+        action='store_true',
+        help='Always parse the input csv file, bypassing the snapshot')
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Open the data from a memory-mapped binary store built from the '
+        'input csv file once')
+    parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Search a sidecar index of the row offsets and searched columns '
+        'of the input csv file, reading only the results from the csv file')
+    parser.add_argument(
+        '--partition',
+        choices=GroupBy.list(),
+        help='Split the input csv file once into one csv file per year, month '
+        'or day, loading only the partitions overlapping the dates searched')
+    parser.add_argument(
+        '--max_partitions', '--max-partitions',
+        type=int,
+        help='With --partition, the number of partitions kept loaded, the '
+        'least recently used evicted first')
+
+    args = parser.parse_args()
+
+    filename = args.filename or f'{PROJECT_ROOT}/data/neo_data.csv'
+    snapshot = None if args.no_snapshot else Snapshot.default_path(filename)
+    store = OrbitStore.default_path(filename) if args.mmap else None
+    row_index = RowIndex.default_path(filename) if args.lazy else None
+    partitions = PartitionManifest.default_path(filename) \
+        if args.partition else None
+
+    db = NEODatabase(filename=filename, snapshot=snapshot,
+                     columnar=args.columnar, workers=args.workers,
+                     store=store, row_index=row_index,
+                     partitions=partitions, period=args.partition,
+                     max_partitions=args.max_partitions)
+
+    try:
+        specs = BatchSearcher.load_specs(args.queries)
+        db.load_data()
+    except FileNotFoundError as e:
+        print(f'File {e.filename} not found')
+        sys.exit()
+    except ValueError:
+        print(f'Queries file {args.queries} is not valid json')
+        sys.exit()
+
+    start = time.perf_counter()
+    searcher = BatchSearcher(db)
+    batch = []
+
+    for number, spec in enumerate(specs, 1):
+        try:
+            query_selectors = Query(
+                number=spec.get('number'),
+                **{option: spec[option] for option in
+                   ('date', 'start_date', 'end_date', 'filter',
+                    'return_object') if option in spec}
+            ).build_query()
+            batch.append((number, spec, searcher.prepare(query_selectors)))
+        except (UnsupportedFeature, ValueError, TypeError):
+            print(f'Query {number}: Unsupported Feature; skipped')
+
+    searcher.execute([query for _, _, query in batch])
+
+    for number, spec, query in batch:
+        output = spec.get('output', 'csv_file')
+        output_file = spec.get('output_file') or \
+            os.path.join(args.output_dir, f'query_{number}.csv')
+
+        try:
+            NEOWriter().write(
+                data=query.results,
+                format=output,
+                filename=output_file,
+                compress=spec.get('gzip', False),
+                return_object=query.selectors.return_object
+            )
+        except Exception as e:
+            print(f'Query {number}: Write unsuccessful')
+            continue
+
+        if output == 'csv_file':
+            print(f'Query {number}: {len(query.results)} results written to '
+                  f'{output_file}')
+
+    print(f'{len(batch)} queries answered by {searcher.scans} scans of '
+          f'{searcher.rows_scanned} rows in '
+          f'{time.perf_counter() - start:.2f}s')
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Stress benchmark of NEODatabase searches run from a pool of threads, alone
+and while a writer thread inserts new orbits, for each number of threads.
+
+Each reader thread has its own NEOSearcher and runs random month-long
+searches, with and without filters. The writer inserts batches of orbits on
+new dates past the last date of the data, each batch under one write lock,
+and every tenth search of a reader counts the orbits on those dates: since
+a search sees a single version of the data, the count must always be a
+multiple of the batch size.
+
+The columnar copy and the statistics the searches need are built before
+the threads start, so the first searches do not all build them at once.
+
+Reported per thread count: searches per second, p50 and p99 search latency,
+orbits inserted per second and inconsistent counts, which must be 0.
+
+Example: python benchmarks/bench_concurrency.py -f data/neo_data.csv \
+--threads 1 2 4 8 --duration 5 --columnar
+"""
+
+import argparse
+import copy
+import datetime
+import pathlib
+import random
+import sys
+import threading
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from database import NEODatabase  # noqa: E402
+from search import Query, NEOSearcher  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+
+# Filters of the searches, picked at random
+FILTERS = (
+    None,
+    ["is_hazardous:=:True"],
+    ["distance:<:20000000", "diameter:>:0.1"],
+    ["distance:between:1000000:40000000 and not is_hazardous:=:True"],
+)
+
+
+class Writer(threading.Thread):
+    """
+    Thread inserting batches of copies of existing orbits on new dates, one
+    date per batch, until stopped.
+    """
+
+    def __init__(self, db, batch, pause):
+        """
+        :param db: NEODatabase
+        :param batch: int representing the orbits inserted per write
+        :param pause: float representing the seconds between two writes
+        """
+        super().__init__(daemon=True)
+        self.db = db
+        self.batch = batch
+        self.pause = pause
+        self.inserted = 0
+        self.stopped = threading.Event()
+        self.templates = db.neo_date_db[db.date_index[0]][:batch]
+        self.next_date = datetime.date.fromisoformat(db.date_index[-1])
+
+    @staticmethod
+    def first_date(db):
+        """
+        :param db: NEODatabase
+        :return: str representing the first date the writer inserts on
+        """
+        last_date = datetime.date.fromisoformat(db.date_index[-1])
+        return (last_date + datetime.timedelta(days=1)).isoformat()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.next_date += datetime.timedelta(days=1)
+            approach_date = self.next_date.isoformat()
+
+            with self.db.lock.write():
+                for index in range(self.batch):
+                    template = self.templates[index % len(self.templates)]
+                    orbit = copy.copy(template)
+                    orbit.close_approach_date = approach_date
+                    self.db.insert(template.neo, orbit)
+
+            self.inserted += self.batch
+            self.stopped.wait(self.pause)
+
+
+class Reader(threading.Thread):
+    """
+    Thread running random searches until stopped, recording their latencies
+    and checking the count of the orbits inserted by the Writer.
+    """
+
+    def __init__(self, db, seed, batch):
+        """
+        :param db: NEODatabase
+        :param seed: int seeding the random searches of the thread
+        :param batch: int representing the orbits inserted per write
+        """
+        super().__init__(daemon=True)
+        self.searcher = NEOSearcher(db)
+        self.random = random.Random(seed)
+        self.dates = list(db.date_index)
+        self.batch = batch
+        self.latencies = []
+        self.inconsistent = 0
+        self.stopped = threading.Event()
+        self.inserted_query = Query(
+            start_date=Writer.first_date(db), end_date='9999-12-31',
+            number=None, return_object='Path'
+        ).build_query()
+
+    def search(self):
+        """
+        :return: Query.Selectors of a random month-long search
+        """
+        start = self.random.randrange(len(self.dates))
+        end_date = datetime.date.fromisoformat(self.dates[start]) + \
+            datetime.timedelta(days=30)
+        return Query(
+            start_date=self.dates[start], end_date=end_date.isoformat(),
+            number=self.random.choice((10, 100, None)),
+            filter=self.random.choice(FILTERS),
+            return_object=self.random.choice(('NEO', 'Path'))
+        ).build_query()
+
+    def run(self):
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            if len(self.latencies) % 10 == 9:
+                if self.searcher.count(self.inserted_query) % self.batch:
+                    self.inconsistent += 1
+            else:
+                # Consumed within the read lock, as get_objects does,
+                # without printing empty results
+                with self.searcher.db.reading():
+                    list(self.searcher.iter_objects(self.search()))
+            self.latencies.append(time.perf_counter() - start)
+
+
+def warm_up(db):
+    """
+    Builds the columnar copy and the statistics of every filter searched
+
+    :param db: NEODatabase
+    :return: None
+    """
+    searcher = NEOSearcher(db)
+    for filters in FILTERS:
+        searcher.get_objects(Query(
+            start_date=db.date_index[0], end_date=db.date_index[0],
+            number=1, filter=filters, return_object='Path'
+        ).build_query())
+
+
+def run(db, threads, duration, batch, pause, write):
+    """
+    Runs reader threads, and optionally a writer thread, for a duration
+
+    :return: tuple of the latencies, orbits inserted and inconsistent counts
+    """
+    readers = [Reader(db, seed, batch) for seed in range(threads)]
+    writer = Writer(db, batch, pause) if write else None
+
+    for thread in readers + ([writer] if writer else []):
+        thread.start()
+    time.sleep(duration)
+    for thread in readers + ([writer] if writer else []):
+        thread.stopped.set()
+    for thread in readers + ([writer] if writer else []):
+        thread.join()
+
+    latencies = sorted(latency for reader in readers
+                       for latency in reader.latencies)
+    return (latencies, writer.inserted if writer else 0,
+            sum(reader.inconsistent for reader in readers))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Concurrent search throughput of the NEODatabase under '
+        'live ingestion')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        default=f'{PROJECT_ROOT}/data/neo_data.csv',
+        help='Name of input csv data file')
+    parser.add_argument(
+        '-t', '--threads',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8],
+        help='Numbers of reader threads to run')
+    parser.add_argument(
+        '-d', '--duration',
+        type=float,
+        default=5.0,
+        help='Seconds each configuration runs for')
+    parser.add_argument(
+        '-b', '--batch',
+        type=int,
+        default=100,
+        help='Orbits inserted per write')
+    parser.add_argument(
+        '--pause',
+        type=float,
+        default=0.01,
+        help='Seconds the writer waits between two writes')
+    parser.add_argument(
+        '--columnar',
+        action='store_true',
+        help='Search a columnar copy of the orbit data')
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        for write in (False, True):
+            db = NEODatabase(filename=args.filename,
+                             snapshot=Snapshot.default_path(args.filename),
+                             columnar=args.columnar)
+            db.load_data()
+            warm_up(db)
+
+            latencies, inserted, inconsistent = run(
+                db, threads, args.duration, args.batch, args.pause, write)
+
+            searches = len(latencies)
+            label = 'ingesting' if write else 'read only'
+            print(f'{threads:>2} threads {label}: '
+                  f'{searches / args.duration:8.1f} searches/s  '
+                  f'p50 {latencies[searches // 2] * 1000:7.2f}ms  '
+                  f'p99 {latencies[int(searches * 0.99)] * 1000:7.2f}ms  '
+                  f'{inserted / args.duration:8.0f} orbits/s  '
+                  f'inconsistent {inconsistent}')
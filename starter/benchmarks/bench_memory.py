@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Benchmark comparing the memory held per csv row by the slotted models in
+models.py against the original dict-based models.
+
+Both model layers are loaded the way NEODatabase.load_data loads them, into
+a dict of names and a dict of dates, and the memory still allocated once the
+csv rows are discarded is measured with tracemalloc.
+
+Example: python benchmarks/bench_memory.py -f data/neo_data.csv
+"""
+
+import argparse
+import csv
+import gc
+import pathlib
+import sys
+import tracemalloc
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from models import NearEarthObject, OrbitPath  # noqa: E402
+
+
+class LegacyNearEarthObject(object):
+    """
+    The original NearEarthObject, storing the csv strings in a __dict__.
+    """
+
+    def __init__(self, **kwargs):
+        self.id = kwargs["id"]
+        self.neo_reference_id = kwargs["neo_reference_id"]
+        self.name = kwargs["name"]
+        self.nasa_jpl_url = kwargs["nasa_jpl_url"]
+        self.abs_magnitude_h = kwargs["absolute_magnitude_h"]
+        self.diameter_min_km = float(kwargs[
+                               "estimated_diameter_min_kilometers"])
+        self.diameter_max_km = float(kwargs[
+                               "estimated_diameter_max_kilometers"])
+        self.is_hazardous = kwargs["is_potentially_hazardous_asteroid"]
+        self.orbits = []
+        self.miss_distances_km = []
+
+
+class LegacyOrbitPath(object):
+    """
+    The original OrbitPath, copying the NEO attributes into every orbit.
+    """
+
+    def __init__(self, **kwargs):
+        self.id = kwargs["id"]
+        self.neo_reference_id = kwargs["neo_reference_id"]
+        self.name = kwargs["name"]
+        self.km_per_second = kwargs["kilometers_per_second"]
+        self.km_per_hour = kwargs["kilometers_per_hour"]
+        self.close_approach_date = kwargs["close_approach_date"]
+        self.close_approach_date_full = kwargs["close_approach_date_full"]
+        self.diameter_min_km = float(kwargs[
+                               "estimated_diameter_min_kilometers"])
+        self.diameter_max_km = float(kwargs[
+                               "estimated_diameter_max_kilometers"])
+        self.is_hazardous = kwargs["is_potentially_hazardous_asteroid"]
+        self.miss_distance_km = float(kwargs["miss_distance_kilometers"])
+
+
+def load_legacy(filename, rows):
+    """
+    Loads the csv rows with the original models and loading loop
+    """
+    neo_name_db, neo_date_db = {}, {}
+
+    with open(filename, 'r') as f:
+        for _, row in zip(range(rows), csv.DictReader(f)):
+            neo = LegacyNearEarthObject(**row)
+            orbit = LegacyOrbitPath(**row)
+            neo_name_db.setdefault(neo.name, neo).orbits.append(orbit)
+            neo_date_db.setdefault(
+                row["close_approach_date"], []).append(orbit)
+
+    return neo_name_db, neo_date_db
+
+
+def load_slotted(filename, rows):
+    """
+    Loads the csv rows with the slotted models and shared NEO attributes
+    """
+    neo_name_db, neo_date_db = {}, {}
+
+    with open(filename, 'r') as f:
+        for _, row in zip(range(rows), csv.DictReader(f)):
+            neo = neo_name_db.get(row["name"])
+            if neo is None:
+                neo = neo_name_db[row["name"]] = NearEarthObject(**row)
+            orbit = OrbitPath(neo=neo, **row)
+            neo.update_orbits(orbit)
+            neo_date_db.setdefault(
+                orbit.close_approach_date, []).append(orbit)
+
+    return neo_name_db, neo_date_db
+
+
+def measure(loader, filename, rows):
+    """
+    :return: tuple of the rows loaded and the bytes held by the loaded data
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+
+    neo_name_db, neo_date_db = loader(filename, rows)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - start
+
+    tracemalloc.stop()
+    return sum(map(len, neo_date_db.values())), held
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Memory per row of the NEO models')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        default=f'{PROJECT_ROOT}/data/neo_data.csv',
+        help='Name of input csv data file')
+    parser.add_argument(
+        '-n', '--rows',
+        type=int,
+        default=sys.maxsize,
+        help='Int representing max number of csv rows to load')
+    args = parser.parse_args()
+
+    results = {}
+    for label, loader in (('legacy', load_legacy),
+                          ('slotted', load_slotted)):
+        rows, held = measure(loader, args.filename, args.rows)
+        results[label] = held / rows
+        print(f'{label:>8}: {rows} rows, {held / 2 ** 20:.1f} MiB, '
+              f'{held / rows:.0f} bytes/row')
+
+    print(f'   ratio: {results["slotted"] / results["legacy"]:.2f}')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Benchmark of NEODatabase.load_data scaling from one worker process up to
+the number of available cores, checking every parallel load against the
+serial one.
+
+Example: python benchmarks/bench_parallel_load.py -f data/neo_data.csv -w 8
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from database import NEODatabase  # noqa: E402
+
+
+def signature(db):
+    """
+    :return: tuple describing the loaded data, equal for identical loads
+    """
+    return (
+        list(db.neo_name_db),
+        [[(orbit.name, orbit.close_approach_date_full, orbit.miss_distance_km,
+           orbit.neo is db.neo_name_db[orbit.name]) for orbit in orbits]
+         for orbits in db.neo_date_db.values()],
+        [[orbit.close_approach_date_full for orbit in neo.orbits]
+         for neo in db.neo_name_db.values()]
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Parallel load scaling of the NEODatabase')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        default=f'{PROJECT_ROOT}/data/neo_data.csv',
+        help='Name of input csv data file')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help='Int representing the max number of worker processes')
+    args = parser.parse_args()
+
+    serial = None
+    workers = 1
+
+    while workers <= args.workers:
+        db = NEODatabase(filename=args.filename, workers=workers)
+        start = time.perf_counter()
+        db.load_data()
+        elapsed = time.perf_counter() - start
+
+        if serial is None:
+            serial, serial_time = signature(db), elapsed
+            matches = 'reference'
+        else:
+            matches = 'match' if signature(db) == serial else 'MISMATCH'
+
+        print(f'{workers:>3} workers: {elapsed:7.2f}s '
+              f'speedup {serial_time / elapsed:5.2f}x  {matches}')
+        workers *= 2
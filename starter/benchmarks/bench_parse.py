@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Benchmark of the csv parse throughput, in rows per second, of the positional
+RowDecoder loader used by NEODatabase.load_data against the previous
+csv.DictReader loader, which built a dict per row and passed it as kwargs to
+both models.
+
+Both loaders fill a dict of names and a dict of dates from the same file,
+and their results are checked to be identical.
+
+Example: python benchmarks/bench_parse.py -f data/neo_data.csv -r 5
+"""
+
+import argparse
+import csv
+import pathlib
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from ingest import load_rows  # noqa: E402
+from models import NearEarthObject, OrbitPath  # noqa: E402
+
+
+def load_dict_rows(filename):
+    """
+    The previous loader, building a dict per row with csv.DictReader
+
+    :param filename: str representing the pathway of the csv file
+    :return: tuple of the dict of names and the dict of dates
+    """
+    neo_name_db, neo_date_db = {}, {}
+
+    with open(filename, 'r') as f:
+        for row in csv.DictReader(f):
+            neo = neo_name_db.get(row["name"])
+            if neo is None:
+                neo = neo_name_db[row["name"]] = NearEarthObject(**row)
+            orbit = OrbitPath(neo=neo, **row)
+
+            neo.update_orbits(orbit)
+            neo_date_db.setdefault(orbit.close_approach_date, []).append(orbit)
+
+    return neo_name_db, neo_date_db
+
+
+def load_positional_rows(filename):
+    """
+    The RowDecoder loader of NEODatabase.load_data
+
+    :param filename: str representing the pathway of the csv file
+    :return: tuple of the dict of names and the dict of dates
+    """
+    neo_name_db, neo_date_db = {}, {}
+
+    with open(filename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        load_rows(reader, next(reader), neo_name_db, neo_date_db)
+
+    return neo_name_db, neo_date_db
+
+
+def signature(neo_name_db, neo_date_db):
+    """
+    :return: tuple describing the loaded data, equal for identical loads
+    """
+    return (
+        [neo.to_record() for neo in neo_name_db.values()],
+        [[(orbit.name, orbit.to_record()) for orbit in orbits]
+         for orbits in neo_date_db.values()]
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Csv parse throughput of the NEODatabase loaders')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        default=f'{PROJECT_ROOT}/data/neo_data.csv',
+        help='Name of input csv data file')
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=3,
+        help='Int representing the number of timed loads, the best is kept')
+    args = parser.parse_args()
+
+    reference = None
+
+    for label, loader in (('DictReader', load_dict_rows),
+                          ('positional', load_positional_rows)):
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            neo_name_db, neo_date_db = loader(args.filename)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        rows = sum(map(len, neo_date_db.values()))
+        if reference is None:
+            reference, reference_time = \
+                signature(neo_name_db, neo_date_db), best
+            matches = 'reference'
+        else:
+            matches = 'match' if signature(neo_name_db, neo_date_db) == \
+                reference else 'MISMATCH'
+
+        print(f'{label:>10}: {best:7.2f}s {rows / best:10,.0f} rows/s '
+              f'speedup {reference_time / best:5.2f}x  {matches}')
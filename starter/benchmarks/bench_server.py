@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Load generator for server.py. Runs concurrent keep-alive clients against a
+running query server and reports the throughput and latency percentiles
+measured by the clients, followed by the server's own /stats.
+
+Example:
+python server.py -f data/neo_data.csv &
+python benchmarks/bench_server.py --clients 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+
+QUERIES = [
+    '/query?date=2020-01-01&number=10',
+    '/query?start_date=2020-01-01&end_date=2020-01-31&number=10'
+    '&return_object=Path',
+    '/query?start_date=2020-01-01&end_date=2020-12-31&number=50'
+    '&return_object=Path&filter=distance:<=:500000',
+    '/query?start_date=2020-01-01&end_date=2020-06-30&number=20'
+    '&filter=is_hazardous:=:True&filter=diameter:>:0.042',
+]
+
+
+async def request(reader, writer, target):
+    """
+    Sends a GET request on an open connection and reads the response
+
+    :return: tuple of the status line and body bytes
+    """
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+
+    status = (await reader.readline()).decode().strip()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode().partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    for count in range(requests):
+        start = time.perf_counter()
+        await request(reader, writer, QUERIES[count % len(QUERIES)])
+        latencies.append(time.perf_counter() - start)
+
+    writer.close()
+
+
+async def main(host, port, clients, requests):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, requests, latencies)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{len(latencies)} requests from {clients} clients in '
+          f'{elapsed:.2f}s: {len(latencies) / elapsed:.0f} requests/s')
+    for percentile in (50, 90, 99):
+        index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+        print(f'  p{percentile}: {latencies[index] * 1000:.2f} ms')
+
+    reader, writer = await asyncio.open_connection(host, port)
+    print('server stats:', json.loads((await request(reader, writer,
+                                                     '/stats'))[1]))
+    writer.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Load generator for the NEO query server')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8303)
+    parser.add_argument('-c', '--clients', type=int, default=8,
+                        help='Int representing the concurrent clients')
+    parser.add_argument('-r', '--requests', type=int, default=100,
+                        help='Int representing the requests per client')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.host, args.port, args.clients, args.requests))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Benchmark suite of the NEODatabase, NEOSearcher and NEOWriter at several
+scales of synthetic data, generated with generate_data.py.
+
+At each scale, and for each search mode (rows, columnar, indexed, mmap), it
+times the load (for mmap, opening the store built beforehand), a single
+date query, a month range query, a year range query with filters, the same
+range projected to NEO and to Path, and the csv export of the range. Each
+query is run several times and the best time is kept. The results are saved
+as json and, with --compare, printed next to a previous run.
+
+Example:
+python benchmarks/bench_suite.py --rows 10000 100000 1000000 -o bench.json
+python benchmarks/bench_suite.py --rows 10000 100000 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from database import NEODatabase  # noqa: E402
+from search import Query, NEOSearcher  # noqa: E402
+from writer import NEOWriter  # noqa: E402
+from store import OrbitStore  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+
+# a dict of search mode to the NEODatabase options enabling it, a True store
+# is replaced by the default store pathway of the csv file
+MODES = {
+    'rows': {},
+    'columnar': {'columnar': True},
+    'indexed': {'indexed': True},
+    'mmap': {'store': True}
+}
+
+# a dict of benchmark name to its query options, dates fall within the
+# default span of generate_data.py
+QUERIES = {
+    'single_date': dict(date='2020-06-15', return_object='Path'),
+    'range_month': dict(start_date='2020-03-01', end_date='2020-03-31',
+                        return_object='Path'),
+    'range_filtered': dict(start_date='2020-01-01', end_date='2020-12-31',
+                           filter=['distance:<=:5000000',
+                                   'is_hazardous:=:True'],
+                           return_object='Path'),
+    'range_neo': dict(start_date='2020-01-01', end_date='2020-06-30',
+                      filter=['diameter:>:0.1'], return_object='NEO'),
+    'range_path': dict(start_date='2020-01-01', end_date='2020-06-30',
+                       filter=['diameter:>:0.1'], return_object='Path'),
+}
+
+# Query options of the csv export benchmark
+EXPORT = dict(start_date='2020-01-01', end_date='2020-03-31',
+              return_object='Path')
+
+
+def best_of(repeat, function):
+    """
+    :param repeat: int representing the number of runs
+    :param function: function to time, without arguments
+    :return: tuple of the best time in seconds and the last return value
+    """
+    best, result = None, None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, result
+
+
+def run_scale(filename, rows, modes, repeat, tmp_dir):
+    """
+    Runs every benchmark on a csv file
+
+    :param filename: str representing the pathway of the csv file
+    :param rows: int representing the number of rows of the csv file
+    :param modes: list of MODES names
+    :param repeat: int representing the number of runs of each query
+    :param tmp_dir: str representing the directory of the exported csv
+    :return: list of dicts, one per benchmark
+    """
+    results = []
+
+    def record(mode, benchmark, seconds, count):
+        results.append({'rows': rows, 'mode': mode, 'benchmark': benchmark,
+                        'seconds': seconds, 'results': count})
+        print(f'{rows:>10} {mode:<9} {benchmark:<15} {seconds * 1000:10.2f} ms'
+              f' {count:>10} results')
+
+    for mode in modes:
+        options = dict(MODES[mode])
+        if options.get('store'):
+            options['store'] = OrbitStore.default_path(filename)
+            # Build the store, or check it is current, outside of the timing
+            NEODatabase(filename=filename, **options).load_data()
+
+        db = NEODatabase(filename=filename, **options)
+        seconds, _ = best_of(1, db.load_data)
+        record(mode, 'load', seconds, db.get_stats().count)
+
+        if db.columnar:
+            seconds, columns = best_of(1, db.get_columns)
+            record(mode, 'build_columns', seconds, len(columns))
+
+        searcher = NEOSearcher(db)
+
+        for benchmark, options in QUERIES.items():
+            query = Query(number=None, **options).build_query()
+            seconds, found = best_of(
+                repeat, lambda: list(searcher.iter_objects(query)))
+            record(mode, benchmark, seconds, len(found))
+
+        export = os.path.join(tmp_dir, 'export.csv')
+        query = Query(number=None, **EXPORT).build_query()
+        seconds, _ = best_of(repeat, lambda: NEOWriter().write(
+            'csv_file', searcher.iter_objects(query), filename=export,
+            return_object='Path'))
+        with open(export) as f:
+            record(mode, 'export_csv', seconds, sum(1 for _ in f) - 1)
+
+    return results
+
+
+def compare(results, previous):
+    """
+    Prints the results next to those of a previous run
+
+    :param results: list of benchmark dicts of this run
+    :param previous: list of benchmark dicts of the previous run
+    :return: None
+    """
+    before = {(result['rows'], result['mode'], result['benchmark']):
+              result['seconds'] for result in previous}
+
+    print(f'\n{"rows":>10} {"mode":<9} {"benchmark":<15} '
+          f'{"before":>10} {"after":>10} {"speedup":>8}')
+
+    for result in results:
+        key = (result['rows'], result['mode'], result['benchmark'])
+        if key not in before:
+            continue
+        print(f'{result["rows"]:>10} {result["mode"]:<9} '
+              f'{result["benchmark"]:<15} {before[key] * 1000:8.2f}ms '
+              f'{result["seconds"] * 1000:8.2f}ms '
+              f'{before[key] / result["seconds"]:7.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark suite of the NEODatabase at several scales')
+    parser.add_argument(
+        '--rows',
+        type=int,
+        nargs='+',
+        default=[10000, 100000],
+        help='Ints representing the number of rows of each scale')
+    parser.add_argument(
+        '--modes',
+        nargs='+',
+        choices=list(MODES),
+        default=list(MODES),
+        help='Search modes to benchmark')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Int representing the number of runs of each query, the best '
+        'is kept')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=303,
+        help='Int seeding the synthetic data')
+    parser.add_argument(
+        '--data_dir',
+        type=str,
+        default=tempfile.gettempdir(),
+        help='Directory of the generated csv files, which are reused by '
+        'later runs with the same rows and seed')
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        default='bench_results.json',
+        help='Pathway of the json results')
+    parser.add_argument(
+        '--compare',
+        type=str,
+        help='Pathway of the json results of a previous run to compare to')
+    args = parser.parse_args()
+
+    results = []
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            filename = os.path.join(args.data_dir,
+                                    f'neo_synthetic_{rows}_{args.seed}.csv')
+            if not os.path.exists(filename):
+                generate(filename, rows, seed=args.seed)
+            results.extend(run_scale(filename, rows, args.modes, args.repeat,
+                                     tmp_dir))
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results saved to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Deterministic generator of synthetic Near Earth Object data, written in the
+csv layout of data/neo_data.csv, for benchmarking at any scale.
+
+The same seed and options always produce the same file. Rows are in close
+approach date order, spread evenly over the days. Each NEO gets an absolute
+magnitude skewed towards small objects, with diameters derived from it for
+albedos of 0.25 and 0.05 as in the NASA data. Only NEOs brighter than
+magnitude 22 can be hazardous. A few NEOs make many approaches and most
+make few. Velocities are log-normal around 12 km/s, and miss distances
+grow denser towards 0.5 au.
+
+Example: python benchmarks/generate_data.py -n 1000000 -o data/neo_1m.csv
+"""
+
+import argparse
+import csv
+import math
+import random
+from datetime import date, timedelta
+
+
+# Columns of data/neo_data.csv, in order
+FIELDNAMES = ['id',
+              'neo_reference_id',
+              'name',
+              'nasa_jpl_url',
+              'absolute_magnitude_h',
+              'estimated_diameter_min_kilometers',
+              'estimated_diameter_max_kilometers',
+              'estimated_diameter_min_meters',
+              'estimated_diameter_max_meters',
+              'estimated_diameter_min_miles',
+              'estimated_diameter_max_miles',
+              'estimated_diameter_min_feet',
+              'estimated_diameter_max_feet',
+              'is_potentially_hazardous_asteroid',
+              'kilometers_per_second',
+              'kilometers_per_hour',
+              'miles_per_hour',
+              'close_approach_date',
+              'close_approach_date_full',
+              'miss_distance_astronomical',
+              'miss_distance_lunar',
+              'miss_distance_kilometers',
+              'miss_distance_miles',
+              'orbiting_body'
+              ]
+
+KM_PER_MILE = 1.609344
+KM_PER_FOOT = 0.0003048
+KM_PER_AU = 149597870.7
+KM_PER_LUNAR_DISTANCE = 384400.0
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def fmt(value):
+    """
+    :param value: float
+    :return: str representing the float with up to 10 significant digits
+    """
+    return f'{value:.10g}'
+
+
+def make_neo(rnd, number):
+    """
+    :param rnd: random.Random generating the NEO
+    :param number: int representing the NEO number, unique per file
+    :return: list of the csv values describing the NEO
+    """
+    neo_id = str(2000000 + number)
+    magnitude = rnd.triangular(15.0, 30.0, 25.0)
+    # Diameter of an asteroid of a given magnitude and albedo
+    diameter_min = 1329.0 / math.sqrt(0.25) * 10 ** (-magnitude / 5)
+    diameter_max = 1329.0 / math.sqrt(0.05) * 10 ** (-magnitude / 5)
+    hazardous = magnitude <= 22.0 and rnd.random() < 0.35
+    designation = f'{1990 + number % 35} ' \
+                  f'{chr(65 + number % 26)}{chr(65 + number // 26 % 25)}' \
+                  f'{number // 650 or ""}'
+
+    return [neo_id,
+            neo_id,
+            f'({designation})',
+            f'http://ssd.jpl.nasa.gov/sbdb.cgi?sstr={neo_id}',
+            f'{magnitude:.2f}',
+            fmt(diameter_min),
+            fmt(diameter_max),
+            fmt(diameter_min * 1000),
+            fmt(diameter_max * 1000),
+            fmt(diameter_min / KM_PER_MILE),
+            fmt(diameter_max / KM_PER_MILE),
+            fmt(diameter_min / KM_PER_FOOT),
+            fmt(diameter_max / KM_PER_FOOT),
+            str(hazardous)]
+
+
+def make_approach(rnd, approach_date):
+    """
+    :param rnd: random.Random generating the approach
+    :param approach_date: date of the approach
+    :return: list of the csv values describing the approach
+    """
+    km_per_second = min(70.0, max(0.5, rnd.lognormvariate(math.log(12.0),
+                                                          0.45)))
+    miss_distance = max(6500.0, 0.5 * KM_PER_AU * math.sqrt(rnd.random()))
+    minutes = rnd.randrange(24 * 60)
+
+    return [fmt(km_per_second),
+            fmt(km_per_second * 3600),
+            fmt(km_per_second * 3600 / KM_PER_MILE),
+            approach_date.isoformat(),
+            f'{approach_date.year}-{MONTHS[approach_date.month - 1]}-'
+            f'{approach_date.day:02d} {minutes // 60:02d}:{minutes % 60:02d}',
+            fmt(miss_distance / KM_PER_AU),
+            fmt(miss_distance / KM_PER_LUNAR_DISTANCE),
+            fmt(miss_distance),
+            fmt(miss_distance / KM_PER_MILE),
+            'Earth']
+
+
+def generate(filename, rows, seed=303, start_date='2020-01-01', days=366,
+             neos=None):
+    """
+    Writes a synthetic csv file of Near Earth Object approaches
+
+    :param filename: str representing the output pathway
+    :param rows: int representing the number of approaches
+    :param seed: int seeding the random generator
+    :param start_date: str representing the date of the first approach
+    :param days: int representing the number of days the approaches span
+    :param neos: int representing the number of NEOs, a sixth of the rows
+    by default
+    :return: None
+    """
+    rnd = random.Random(seed)
+    neos = neos or max(1, rows // 6)
+    neo_rows = [make_neo(rnd, number) for number in range(neos)]
+    start = date.fromisoformat(start_date)
+
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+
+        for row in range(rows):
+            approach_date = start + timedelta(days=row * days // rows)
+            # Squaring skews the choice towards the first NEOs, so a few
+            # make many approaches
+            neo = neo_rows[int(neos * rnd.random() ** 2)]
+            writer.writerow(neo + make_approach(rnd, approach_date))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic Near Earth Object data')
+    parser.add_argument(
+        '-n', '--rows',
+        type=int,
+        default=100000,
+        help='Int representing the number of approaches to generate')
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        required=True,
+        help='Pathway of the csv file to write')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=303,
+        help='Int seeding the random generator, the same seed always '
+        'generates the same file')
+    parser.add_argument(
+        '--start_date',
+        type=str,
+        default='2020-01-01',
+        help='Date of the first approach in YYYY-MM-DD format')
+    parser.add_argument(
+        '--days',
+        type=int,
+        default=366,
+        help='Int representing the number of days the approaches span')
+    parser.add_argument(
+        '--neos',
+        type=int,
+        help='Int representing the number of NEOs, a sixth of the rows by '
+        'default')
+    args = parser.parse_args()
+
+    generate(args.output, args.rows, seed=args.seed,
+             start_date=args.start_date, days=args.days, neos=args.neos)
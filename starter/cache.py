@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+
+class ResultCache(object):
+    """
+    Object holding a least recently used cache of search results.
+
+    Results are keyed on a canonical form of the Query.Selectors without the
+    requested number, so a query asking for fewer results than a cached one,
+    or for any number once a cached one found every match, is answered by
+    slicing the cached results. The cache is bounded by a number of entries
+    and by the bytes of the cached result lists (the results themselves are
+    shared with the database), entries expire after a time to live, and
+    everything is dropped whenever the database version changes. A cache
+    may be shared by searches running in several threads.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=64 * 2 ** 20, ttl=None):
+        """
+        :param max_entries: int representing the max number of cached queries
+        :param max_bytes: int representing the max bytes of cached lists
+        :param ttl: float representing the seconds an entry stays valid,
+        None for no expiry
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, number, version):
+        """
+        :param key: hashable canonical query key
+        :param number: int representing the requested number of results,
+        None for all of them
+        :param version: int representing the current database version
+        :return: list of results or None on a miss
+        """
+        with self.lock:
+            self.validate(version)
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                results, complete, created = entry
+                expired = self.ttl is not None and \
+                    time.monotonic() - created > self.ttl
+
+                if expired:
+                    self.remove(key)
+
+                elif complete or (number is not None and
+                                  number <= len(results)):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return results[:number]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, number, version, results):
+        """
+        :param key: hashable canonical query key
+        :param number: int representing the number of results requested when
+        the results were computed, None for all of them
+        :param version: int representing the database version the results
+        were computed from
+        :param results: list of results
+        :return: None
+        """
+        with self.lock:
+            self.validate(version)
+            size = sys.getsizeof(results)
+            if size > self.max_bytes or self.max_entries < 1:
+                return
+
+            if key in self.entries:
+                self.remove(key)
+
+            complete = number is None or len(results) < number
+            self.entries[key] = (results, complete, time.monotonic())
+            self.bytes += size
+
+            while len(self.entries) > self.max_entries or \
+                    self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        """
+        :param key: hashable canonical query key of a cached entry
+        :return: None
+        """
+        results, _, _ = self.entries.pop(key)
+        self.bytes -= sys.getsizeof(results)
+
+    def clear(self):
+        """
+        Drops every cached entry
+
+        :return: None
+        """
+        self.entries.clear()
+        self.bytes = 0
+
+    def validate(self, version):
+        """
+        Drops every cached entry if the database changed since they were
+        cached
+
+        :param version: int representing the current database version
+        :return: None
+        """
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+
+    def stats(self):
+        """
+        :return: dict of cache size and hit/miss counters
+        """
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
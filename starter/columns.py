@@ -0,0 +1,332 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import chain, compress, repeat
+from operator import and_
+
+from indexes import BitmapIndex, BucketIndex, SortedIndex, bitmap_range, \
+    bitmap_rows
+
+
+class OrbitColumns(object):
+    """
+    Object holding a columnar copy of the OrbitPath data of a NEODatabase.
+
+    Each filterable OrbitPath attribute is stored in a contiguous typed array,
+    with rows ordered by close approach date, so a date range is a single
+    slice of every column. Filters are evaluated over a slice as masks built
+    with map() and the operator functions, which runs the comparison loop in
+    C instead of calling getattr on every OrbitPath instance.
+
+    Optionally, secondary indexes on miss distance, diameter and hazard flag
+    let a selective filter find its matching rows directly, which are then
+    intersected with the date range, instead of scanning the whole range.
+    Whether to use an index is decided by the QueryPlanner.
+
+    Optionally too, bitmap indexes on the same attributes hold the rows of
+    each bucket of values as a bitmap, so filters, and their and, or and not
+    combinations, are evaluated as intersections, unions and complements of
+    bitmaps, and the rows passing them are counted without reading any
+    OrbitPath.
+    """
+
+    # a dict of OrbitPath attribute to the typecode of its column
+    Columns = {
+        "miss_distance_km": 'd',
+        "diameter_min_km": 'd',
+        "km_per_second": 'd',
+        "is_hazardous": 'b'
+    }
+
+    # a dict of OrbitPath attribute to the type of its secondary index
+    Indexes = {
+        "miss_distance_km": SortedIndex,
+        "diameter_min_km": SortedIndex,
+        "is_hazardous": BucketIndex
+    }
+
+    # a dict of OrbitPath attribute to the type of its bitmap index
+    Bitmaps = {
+        "miss_distance_km": BitmapIndex,
+        "diameter_min_km": BitmapIndex,
+        "is_hazardous": BitmapIndex
+    }
+
+    # Number of rows evaluated at a time when streaming a selection
+    BLOCK_SIZE = 4096
+
+    def __init__(self, neo_date_db, date_index):
+        """
+        :param neo_date_db: dict of date string to list of OrbitPaths
+        :param date_index: sorted list of the date strings in neo_date_db
+        """
+        self.orbits = []
+        self.date_ordinal = array('l')
+        self.indexes = {}
+        self.bitmaps = {}
+
+        for attribute, typecode in OrbitColumns.Columns.items():
+            setattr(self, attribute, array(typecode))
+
+        for approach_date in date_index:
+            self.extend(approach_date, neo_date_db[approach_date])
+
+    def __len__(self):
+        return len(self.orbits)
+
+    @staticmethod
+    def to_ordinal(date_str):
+        """
+        :param date_str: str representing a date in YYYY-MM-DD format
+        :return: int representing the proleptic Gregorian ordinal of the date
+        """
+        return date.fromisoformat(date_str).toordinal()
+
+    def extend(self, approach_date, orbits):
+        """
+        Appends the orbits of a date after all existing rows. The date must
+        not be earlier than the last date already stored.
+
+        :param approach_date: str representing the orbits close approach date
+        :param orbits: list of OrbitPaths on the date
+        :return: None
+        """
+        self.orbits.extend(orbits)
+        self.date_ordinal.extend(
+            repeat(OrbitColumns.to_ordinal(approach_date), len(orbits)))
+        self.miss_distance_km.extend(
+            orbit.miss_distance_km for orbit in orbits)
+        self.diameter_min_km.extend(
+            orbit.diameter_min_km for orbit in orbits)
+        self.km_per_second.extend(
+            orbit.km_per_second for orbit in orbits)
+        self.is_hazardous.extend(
+            orbit.is_hazardous for orbit in orbits)
+
+        self.index_rows_from(len(self.orbits) - len(orbits))
+
+    def append(self, orbit, index=True):
+        """
+        Appends a single orbit after all existing rows, if it keeps the rows
+        in date order
+
+        :param orbit: OrbitPath
+        :param index: bool representing if the row is added to the indexes
+        now, otherwise index_rows_from adds it with the rows appended after
+        it
+        :return: bool representing if the orbit was appended
+        """
+        ordinal = OrbitColumns.to_ordinal(orbit.close_approach_date)
+        if self.date_ordinal and ordinal < self.date_ordinal[-1]:
+            return False
+
+        self.orbits.append(orbit)
+        self.date_ordinal.append(ordinal)
+        self.miss_distance_km.append(orbit.miss_distance_km)
+        self.diameter_min_km.append(orbit.diameter_min_km)
+        self.km_per_second.append(orbit.km_per_second)
+        self.is_hazardous.append(orbit.is_hazardous)
+        if index:
+            self.index_row(len(self.orbits) - 1)
+        return True
+
+    def build_indexes(self):
+        """
+        Builds the secondary indexes over the existing rows, after which
+        they are kept current as rows are added
+
+        :return: None
+        """
+        for attribute, index_type in OrbitColumns.Indexes.items():
+            self.indexes[attribute] = index_type(getattr(self, attribute))
+
+    def build_bitmaps(self):
+        """
+        Builds the bitmap indexes over the existing rows, after which they
+        are kept current as rows are added
+
+        :return: None
+        """
+        for attribute, index_type in OrbitColumns.Bitmaps.items():
+            self.bitmaps[attribute] = index_type(getattr(self, attribute))
+
+    def index_row(self, row):
+        """
+        Adds a row to the secondary and bitmap indexes, if they are built
+
+        :param row: int representing the row
+        :return: None
+        """
+        for attribute, index in self.indexes.items():
+            index.add(getattr(self, attribute)[row], row)
+        for attribute, index in self.bitmaps.items():
+            index.add(getattr(self, attribute)[row], row)
+
+    def index_rows_from(self, start):
+        """
+        Adds the rows from start on to the secondary and bitmap indexes, if
+        they are built, in one pass over each index
+
+        :param start: int representing the first row not indexed
+        :return: None
+        """
+        rows = range(start, len(self.orbits))
+        for attribute, index in chain(self.indexes.items(),
+                                      self.bitmaps.items()):
+            index.extend(zip(getattr(self, attribute)[start:], rows))
+
+    def get_rows(self, start_date, end_date):
+        """
+        Finds the slice of rows with a close approach between two dates
+
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :return: tuple of the first row and one past the last row
+        """
+        start = bisect_left(self.date_ordinal,
+                            OrbitColumns.to_ordinal(start_date))
+        end = bisect_right(self.date_ordinal,
+                           OrbitColumns.to_ordinal(end_date))
+        return start, end
+
+    @staticmethod
+    def mask(filters, get_values):
+        """
+        Evaluates filters over the column values of a set of rows
+
+        :param filters: iterable of FilterExpression objects
+        :param get_values: function of an OrbitPath attribute name to the
+        iterable of its values for the rows
+        :return: iterator of bools, one per row, or None without filters
+        """
+        mask = None
+
+        for filter in filters:
+            filter_mask = filter.mask(get_values)
+            mask = filter_mask if mask is None else map(and_, mask,
+                                                        filter_mask)
+
+        return mask
+
+    def select(self, start, end, filters):
+        """
+        Finds the OrbitPaths in a slice of rows that pass every filter
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filters: iterable of FilterExpression objects
+        :return: list of OrbitPaths
+        """
+        mask = OrbitColumns.mask(
+            filters, lambda attribute: getattr(self, attribute)[start:end])
+
+        if mask is None:
+            return self.orbits[start:end]
+
+        return list(compress(self.orbits[start:end], mask))
+
+    def iter_select(self, start, end, filters):
+        """
+        Lazily finds the OrbitPaths in a slice of rows that pass every filter,
+        evaluating the filters one block of rows at a time
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filters: iterable of FilterExpression objects
+        :return: iterator of OrbitPaths
+        """
+        filters = list(filters)
+
+        for block_start in range(start, end, OrbitColumns.BLOCK_SIZE):
+            block_end = min(block_start + OrbitColumns.BLOCK_SIZE, end)
+            yield from self.select(block_start, block_end, filters)
+
+    def index_rows(self, start, end, filter):
+        """
+        Finds the rows in a slice of rows that pass a filter through the
+        secondary index of its attribute
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filter: Filter object on an indexed attribute
+        :return: list of rows in row order
+        """
+        index = self.indexes[filter.attribute]
+        return list(index.get_rows(filter.operation, filter.value, start, end))
+
+    def filter_rows(self, rows, filters):
+        """
+        Evaluates filters on the column values of the given rows only
+
+        :param rows: list of rows in row order
+        :param filters: iterable of FilterExpression objects
+        :return: list of the rows passing every filter
+        """
+        mask = OrbitColumns.mask(
+            filters,
+            lambda attribute: map(getattr(self, attribute).__getitem__, rows))
+
+        if mask is None:
+            return rows
+
+        return list(compress(rows, mask))
+
+    def count(self, start, end, filters):
+        """
+        Counts the rows in a slice of rows that pass every filter, without
+        reading any OrbitPath
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filters: iterable of FilterExpression objects
+        :return: int representing the number of rows
+        """
+        mask = OrbitColumns.mask(
+            filters, lambda attribute: getattr(self, attribute)[start:end])
+
+        if mask is None:
+            return max(0, end - start)
+
+        return sum(mask)
+
+    def has_bitmaps(self, filters):
+        """
+        :param filters: iterable of FilterExpression objects
+        :return: bool representing if every Filter in the filters is on an
+        attribute with a bitmap index
+        """
+        return all(atom.attribute in self.bitmaps
+                   for filter in filters for atom in filter.atoms())
+
+    def bitmap(self, start, end, filters):
+        """
+        Evaluates filters through the bitmap indexes of their attributes
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filters: iterable of FilterExpression objects, on attributes
+        with a bitmap index
+        :return: int bitmap of the rows in the slice passing every filter,
+        bit i set for row start + i
+        """
+        rows = bitmap_range(0, end - start)
+
+        def get_bitmap(filter):
+            return self.bitmaps[filter.attribute].get_bitmap(
+                filter.operation, filter.value, start, end)
+
+        for filter in filters:
+            rows &= filter.bitmap(get_bitmap, rows)
+
+        return rows
+
+    def iter_bitmap(self, bitmap, start, end):
+        """
+        Lazily reads the OrbitPaths of the rows set in a bitmap
+
+        :param bitmap: int bitmap of rows, as returned by bitmap
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :return: iterator of OrbitPaths in row order
+        """
+        return map(self.orbits.__getitem__, bitmap_rows(bitmap, start))
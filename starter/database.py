@@ -1,5 +1,20 @@
+from aggregate import DailySummaries, GroupBy
+from columns import OrbitColumns
+from exceptions import UnsupportedFeature
+from ingest import RowDecoder, load_parallel, load_rows
+from locks import ReadWriteLock
 from models import OrbitPath, NearEarthObject
+from planner import TableStats
+from profiler import profile_stage, profile_trace
+from partitions import PartitionManifest
+from rowindex import RowIndex
+from snapshot import Snapshot
+from store import MappedColumns, MappedDates, MappedNames, OrbitStore, \
+    StoreStats
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
 import csv
+import threading
 
 
 class NEODatabase(object):
@@ -11,16 +26,102 @@ class NEODatabase(object):
     Additionally, all unique instances of a Near Earth Object
     are contained in a dict mapping the Near Earth Object name
     to the NearEarthObject instance.
+
+    The dates of neo_date_db are also kept in a sorted date_index so date
+    ranges can be found with a binary search instead of sorting every key.
+
+    Optionally, a columnar copy of the orbit data (OrbitColumns) is built on
+    demand so filters can be evaluated over typed arrays.
+
+    Statistics of the orbit data (TableStats) used by the QueryPlanner are
+    likewise collected on demand, once per version of the data.
+
+    Alternatively, the data can be opened from a memory-mapped OrbitStore,
+    built from the csv file once. The dicts are then read-only views of the
+    store and searches evaluate filters directly over its columns. A
+    RowIndex works the same way but only holds the searched columns and the
+    offset of each csv row, the results being read from the csv file.
+
+    With a partitioned layout, the csv file is split once into one csv file
+    per year, month or day, and load_data only reads their manifest. The
+    partitions overlapping the date range of each search are then loaded
+    on demand by load_range, and with a maximum number of partitions the
+    least recently used ones are evicted, so the memory held is bounded by
+    the dates searched rather than by the whole file. The aggregates of a
+    NEO only cover its orbits in the loaded partitions.
+
+    The version counter is incremented whenever the data changes, so
+    anything derived from the data, such as cached search results, can
+    tell when it is stale.
+
+    The database can be searched from many threads while orbits are
+    inserted or ingested: writes hold a ReadWriteLock as the writer, and a
+    search holds it as a reader, see reading, so every search sees the data
+    of a single version. The columnar copy, statistics and summaries built
+    on demand by searches are built by one thread at a time.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, snapshot=None, columnar=False, workers=1,
+                 indexed=False, profiler=None, store=None, row_index=None,
+                 partitions=None, period=None, max_partitions=None,
+                 bitmaps=False):
         """
         :param filename: str representing the pathway of the filename
         containing the Near Earth Object data
+        :param snapshot: optional str representing the pathway of a binary
+        snapshot file used to skip csv parsing when the data is unchanged
+        :param columnar: bool representing if searches should use a columnar
+        copy of the orbit data
+        :param workers: int representing the number of processes used to
+        parse the csv file, split into chunks of rows
+        :param indexed: bool representing if the columnar copy keeps
+        secondary indexes on miss distance, diameter and hazard flag,
+        implies columnar
+        :param profiler: optional Profiler timing the load stages
+        :param store: optional str representing the pathway of the OrbitStore
+        file opened instead of loading the data in memory, built from the
+        csv file when missing or stale
+        :param row_index: optional str representing the pathway of the
+        RowIndex file of the csv file, opened instead of loading the data in
+        memory, built when missing or stale
+        :param partitions: optional str representing the pathway of the
+        partition directory of the csv file, built when missing or stale,
+        whose partitions are loaded on demand
+        :param period: optional str representing the GroupBy period of the
+        partitions, year by default
+        :param max_partitions: optional int representing the number of
+        partitions kept loaded, the least recently used evicted first
+        :param bitmaps: bool representing if the columnar copy keeps bitmap
+        indexes on miss distance, diameter and hazard flag, implies columnar
         """
         self.filename = filename
+        self.snapshot = snapshot
         self.neo_name_db = {}
         self.neo_date_db = {}
+        self.date_index = []
+        self.columnar = columnar or indexed or bitmaps
+        self.indexed = indexed
+        self.bitmaps = bitmaps
+        self.columns = None
+        self.stats = None
+        self.summaries = None
+        self.workers = workers
+        self.profiler = profiler
+        self.store = store
+        self.row_index = row_index
+        self.partitions = partitions
+        self.period = period
+        self.max_partitions = max_partitions
+        # PartitionManifest of the partitioned layout, if opened, and the
+        # loaded partitions by key, least recently used first
+        self.manifest = None
+        self.loaded = OrderedDict()
+        # OrbitStore the data is read from, if opened
+        self.mapped = None
+        self.version = 0
+        self.lock = ReadWriteLock()
+        # Held while building the data derived on demand
+        self.build_lock = threading.Lock()
 
     def load_data(self, filename=None):
         """
@@ -30,27 +131,460 @@ class NEODatabase(object):
            - Storing a dict of the Near Earth Object name to the single
            instance of NearEarthObject
 
+        When a snapshot pathway is set, the data is restored from the snapshot
+        if it matches the csv file, otherwise the csv file is parsed and a new
+        snapshot is written. With more than one worker, the csv file is
+        parsed in chunks by a pool of processes and the partial results are
+        merged in file order, matching a serial load.
+
+        When a store pathway is set, the store is opened instead, after
+        building it from the csv file if it is missing or was built from
+        another version of the csv file. Likewise when a row index pathway
+        is set, the row index is opened, after indexing the csv file if
+        needed. When a partition directory is set, only the manifest of the
+        partitions is read, after partitioning the csv file if needed.
+
         :param filename:
         :return:
         """
 
-        if not (filename or self.filename):
+        if not (filename or self.filename or self.store):
             raise Exception('Cannot load data, no filename provided')
 
         filename = filename or self.filename
 
+        if self.partitions:
+            with profile_stage(self.profiler, 'load: manifest'):
+                period = self.period or GroupBy.year.value
+                manifest = PartitionManifest.open(self.partitions, filename,
+                                                  period)
+                if manifest is None:
+                    PartitionManifest.build(self.partitions, filename, period)
+                    manifest = PartitionManifest.open(self.partitions)
+            self.manifest = manifest
+            return
+
+        if self.row_index:
+            with profile_stage(self.profiler, 'load: row index'):
+                row_index = RowIndex.open(self.row_index, filename)
+                if row_index is None:
+                    RowIndex.build(self.row_index, filename)
+                    row_index = RowIndex.open(self.row_index, filename)
+            self.set_store(row_index)
+            return
+
+        if self.store:
+            with profile_stage(self.profiler, 'load: store'):
+                store = OrbitStore.open(self.store, filename)
+
+            if store is None:
+                if not filename:
+                    raise Exception('Cannot load data, no filename provided')
+                self.load_csv(filename)
+                try:
+                    with profile_stage(self.profiler, 'load: store build'):
+                        OrbitStore.build(self.store, filename,
+                                         self.neo_name_db, self.neo_date_db,
+                                         self.date_index)
+                except OSError:
+                    # Without a writable store the parsed data is used
+                    return
+                store = OrbitStore.open(self.store, filename)
+
+            if store is not None:
+                self.set_store(store)
+            return
+
+        snapshot = Snapshot(self.snapshot) if self.snapshot else None
+
+        if snapshot:
+            with profile_stage(self.profiler, 'load: snapshot'):
+                state = snapshot.load(filename)
+                if state is not None:
+                    self.set_state(state)
+            if state is not None:
+                return
+
+        self.load_csv(filename)
+
+        if snapshot:
+            try:
+                with profile_stage(self.profiler, 'load: snapshot save'):
+                    snapshot.save(filename, self.get_state())
+            except OSError:
+                # The snapshot is only a cache, an unwritable location
+                # should not fail the load
+                pass
+
+    def load_csv(self, filename):
+        """
+        Parses the rows of a .csv file into NearEarthObjects and OrbitPaths
+
+        :param filename: str representing the pathway of the csv file
+        :return: None
+        """
         # TODO: Load data from csv file.
         # TODO: Where will the data be stored?
-        with open(filename, 'r') as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                neo = NearEarthObject(**row)
-                orbit = OrbitPath(**row)
-                approach_date = row["close_approach_date"]
-
-                self.neo_name_db.setdefault(neo.name, neo).update_orbits(orbit)
-                self.neo_date_db.setdefault(
-                    approach_date, []).append(
-                    orbit
-                    )
+        with profile_stage(self.profiler, 'load: models'):
+            if self.workers > 1:
+                load_parallel(filename, self.neo_name_db, self.neo_date_db,
+                              self.workers)
+            else:
+                with open(filename, 'r', newline='') as f:
+                    reader = csv.reader(f)
+                    header = next(reader, None)
+                    if header is not None:
+                        reader = profile_trace(self.profiler,
+                                               'load: csv parse', reader)
+                        load_rows(reader, header, self.neo_name_db,
+                                  self.neo_date_db)
+
+        # Dates are indexed once after the bulk load rather than on each row
+        with profile_stage(self.profiler, 'load: date index'):
+            self.date_index = sorted(self.neo_date_db)
+        self.columns = None
+        self.stats = None
+        self.summaries = None
+        self.version += 1
+
+    def load_range(self, start_date=None, end_date=None):
+        """
+        Loads the partitions overlapping a date range that are not loaded
+        yet, then evicts the least recently used partitions outside the
+        range while more than max_partitions are loaded. Does nothing
+        without a partitioned layout.
+
+        :param start_date: optional str representing start date, unbounded
+        if None
+        :param end_date: optional str representing end date, unbounded if
+        None
+        :return: None
+        """
+        if self.manifest is None:
+            return
+
+        with self.lock.write():
+            needed = self.manifest.overlapping(start_date, end_date)
+
+            for partition in needed:
+                if partition.key not in self.loaded:
+                    self.load_partition(partition)
+                self.loaded.move_to_end(partition.key)
+
+            if self.max_partitions is not None:
+                # The partitions of the range were moved last, so they are
+                # evicted last
+                kept = max(self.max_partitions, len(needed))
+                while len(self.loaded) > kept:
+                    self.evict(next(iter(self.loaded)))
+
+    def load_partition(self, partition):
+        """
+        Parses the rows of a partition into the loaded data
+
+        :param partition: PartitionManifest.Partition
+        :return: None
+        """
+        with profile_stage(self.profiler, f'load: partition {partition.key}'):
+            with open(self.manifest.get_file(partition), 'r',
+                      newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is not None:
+                    load_rows(reader, header, self.neo_name_db,
+                              self.neo_date_db)
+
+        self.loaded[partition.key] = partition
+        self.reset_dates()
+
+    def evict(self, key):
+        """
+        Drops the orbits of a loaded partition, and the NEOs left without
+        orbits, recomputing the aggregates of the NEOs that keep orbits
+
+        :param key: str representing the key of a loaded partition
+        :return: None
+        """
+        partition = self.loaded.pop(key)
+        neos = set()
+
+        for approach_date in self.get_dates(partition.start_date,
+                                            partition.end_date):
+            neos.update(orbit.neo for orbit in
+                        self.neo_date_db.pop(approach_date))
+
+        for neo in neos:
+            orbits = [orbit for orbit in neo.orbits if not
+                      partition.start_date <= orbit.close_approach_date <=
+                      partition.end_date]
+            if not orbits:
+                del self.neo_name_db[neo.name]
+                continue
+            neo.orbits = []
+            neo.reset_aggregates()
+            for orbit in orbits:
+                neo.update_orbits(orbit)
+
+        self.reset_dates()
+
+    def reset_dates(self):
+        """
+        Re-indexes the dates after orbits of whole dates are added or dropped
+
+        :return: None
+        """
+        self.date_index = sorted(self.neo_date_db)
+        self.columns = None
+        self.stats = None
+        self.summaries = None
+        self.version += 1
+
+    def reading(self):
+        """
+        Holds the database for the duration of a search, so the search sees
+        the data of a single version: as a reader, alongside other
+        searches, or as the writer with a partitioned layout, whose
+        searches load and evict partitions
+
+        :return: context manager
+        """
+        if self.manifest is not None:
+            return self.lock.write()
+        return self.lock.read()
+
+    def insert(self, neo, orbit, index=True):
+        """
+        Adds an OrbitPath to the database, attaching it to the single
+        NearEarthObject instance with the same name and keeping the
+        date index sorted
+
+        :param neo: NearEarthObject the orbit belongs to
+        :param orbit: OrbitPath to add
+        :param index: bool representing if the orbit is added to the
+        secondary and bitmap indexes now, otherwise the caller adds it with
+        OrbitColumns.index_rows_from before releasing the write lock
+        :return: NearEarthObject instance the orbit was attached to
+        """
+        if self.mapped is not None or self.manifest is not None:
+            # An OrbitStore is read-only, and orbits added to loaded
+            # partitions would be lost on eviction
+            raise UnsupportedFeature
+
+        with self.lock.write():
+            neo = self.neo_name_db.setdefault(neo.name, neo)
+            neo.update_orbits(orbit)
+
+            approach_date = orbit.close_approach_date
+            if approach_date not in self.neo_date_db:
+                self.neo_date_db[approach_date] = []
+                insort(self.date_index, approach_date)
+            self.neo_date_db[approach_date].append(orbit)
+
+            # Orbits arriving in date order are appended to the columnar
+            # copy and the statistics in place, anything earlier needs them
+            # rebuilt on the next search
+            if self.columns is not None and \
+                    not self.columns.append(orbit, index):
+                self.columns = None
+            if self.stats is not None and not self.stats.append(orbit):
+                self.stats = None
+            if self.summaries is not None:
+                self.summaries.add(orbit)
+            self.version += 1
+
+            return neo
+
+    def ingest(self, filename):
+        """
+        Merges the rows of a delta .csv file into the already loaded data.
+        Orbits already present, by NEO name and full close approach date,
+        are skipped and new orbits are attached to the existing
+        NearEarthObject instances, so the cost is proportional to the size
+        of the delta rather than of the loaded data.
+
+        The rows are decoded before the write lock is taken, then merged
+        under it at once, so searches wait for the merge only and see
+        either none or all of the delta.
+
+        Not supported for an OrbitStore or a partitioned layout, where
+        only part of the orbits are loaded to check the delta against.
+
+        :param filename: str representing the pathway of the delta csv file
+        :return: int representing the number of orbits added
+        """
+        if self.mapped is not None or self.manifest is not None:
+            raise UnsupportedFeature
+
+        added = 0
+
+        with open(filename, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            decoder = RowDecoder(header) if header is not None else None
+            rows = [(decoder.name(row), decoder.neo_record(row),
+                     decoder.orbit_record(row))
+                    for row in filter(None, reader)]
+
+        with self.lock.write():
+            # Indexes take the new rows in one merge once all are appended,
+            # inserting them one by one would move the whole index each time
+            columns = self.columns
+            start = len(columns) if columns is not None else 0
+
+            try:
+                for name, neo_record, record in rows:
+                    neo = self.neo_name_db.get(name)
+                    if neo is None:
+                        neo = NearEarthObject.from_record(neo_record)
+
+                    approach_date_full = record[3]
+                    if any(orbit.close_approach_date_full ==
+                           approach_date_full for orbit in neo.orbits):
+                        continue
+
+                    self.insert(neo, OrbitPath.from_record(neo, record),
+                                index=False)
+                    added += 1
+            finally:
+                if columns is not None and self.columns is columns:
+                    columns.index_rows_from(start)
+
+        return added
+
+    def get_dates(self, start_date, end_date):
+        """
+        Finds the dates with recorded orbits between two dates, inclusive.
+        Neither date needs to have recorded orbits itself.
+
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :return: list of date strings in ascending order
+        """
+        start_index = bisect_left(self.date_index, start_date)
+        end_index = bisect_right(self.date_index, end_date)
+        return self.date_index[start_index:end_index]
+
+    def get_columns(self):
+        """
+        Gets the columnar copy of the orbit data, building it if the database
+        is columnar and the data changed since it was last built
+
+        :return: OrbitColumns or None if the database is not columnar
+        """
+        if self.columnar and self.columns is None:
+            with self.build_lock, profile_stage(self.profiler,
+                                                'build columns'):
+                if self.columns is None:
+                    columns = OrbitColumns(self.neo_date_db, self.date_index)
+                    if self.indexed:
+                        columns.build_indexes()
+                    if self.bitmaps:
+                        columns.build_bitmaps()
+                    self.columns = columns
+        return self.columns
+
+    def get_stats(self):
+        """
+        Gets the statistics of the orbit data, collecting them if the data
+        changed since they were last collected
+
+        :return: TableStats
+        """
+        if self.stats is None:
+            with self.build_lock, profile_stage(self.profiler,
+                                                'collect stats'):
+                if self.stats is None and self.mapped is not None:
+                    self.stats = StoreStats(self.mapped)
+                elif self.stats is None:
+                    self.stats = TableStats(self.neo_date_db,
+                                            self.date_index,
+                                            self.neo_name_db)
+        return self.stats
+
+    def get_summaries(self):
+        """
+        Gets the daily summaries of the orbit data, collecting them if the
+        data changed since they were last collected. The summaries of an
+        OrbitStore are collected from its columns, without building any
+        OrbitPath instance.
+
+        :return: DailySummaries
+        """
+        if self.summaries is None:
+            with self.build_lock, profile_stage(self.profiler,
+                                                'collect summaries'):
+                if self.summaries is None:
+                    self.summaries = DailySummaries(
+                        self.date_index, self.get_day
+                        if self.mapped is None else self.get_mapped_day)
+        return self.summaries
+
+    def get_day(self, approach_date):
+        """
+        :param approach_date: str representing a date with recorded orbits
+        :return: tuple of the lists of the miss distances, hazard flags and
+        NEO names of the orbits of the date
+        """
+        orbits = self.neo_date_db[approach_date]
+        return ([orbit.miss_distance_km for orbit in orbits],
+                [orbit.is_hazardous for orbit in orbits],
+                [orbit.name for orbit in orbits])
+
+    def get_mapped_day(self, approach_date):
+        """
+        :param approach_date: str representing a date with recorded orbits
+        :return: tuple of the slices of the miss distance, hazard flag and
+        NEO row columns of the OrbitStore for the date
+        """
+        sections = self.mapped.sections
+        position = bisect_left(self.date_index, approach_date)
+        start, end = self.mapped.date_start[position:position + 2]
+        return (sections['orbit.miss_distance_km'][start:end],
+                sections['orbit.is_hazardous'][start:end],
+                sections['orbit.neo_row'][start:end])
+
+    def get_state(self):
+        """
+        :return: dict of the loaded data, as stored in a snapshot
+        """
+        return {
+            'neo_name_db': self.neo_name_db,
+            'neo_date_db': self.neo_date_db
+        }
+
+    def set_state(self, state):
+        """
+        Replaces the loaded data with a state restored from a snapshot
+
+        :param state: dict of the loaded data, as returned by get_state
+        :return: None
+        """
+        self.neo_name_db = state['neo_name_db']
+        self.neo_date_db = state['neo_date_db']
+        self.date_index = sorted(self.neo_date_db)
+        self.columns = None
+        self.stats = None
+        self.summaries = None
+        self.version += 1
+
+    def set_store(self, store):
+        """
+        Replaces the loaded data with the data of an OrbitStore, searched
+        through its mapped columns
+
+        :param store: OrbitStore or RowIndex
+        :return: None
+        """
+        self.mapped = store
+        self.neo_name_db = MappedNames(store)
+        self.neo_date_db = MappedDates(store)
+        self.date_index = store.dates
+        self.columnar = True
+        self.columns = MappedColumns(store)
+        if self.indexed:
+            self.columns.build_indexes()
+        if self.bitmaps:
+            self.columns.build_bitmaps()
+        self.stats = None
+        self.summaries = None
+        self.version += 1
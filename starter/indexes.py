@@ -0,0 +1,426 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, groupby, repeat
+from functools import reduce
+from operator import eq, gt, lt, le, ge, methodcaller, or_
+import re
+
+# Translation of the binary digits of a bitmap to a mask of 0 and 1 bytes
+DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+# Set digit of a bitmap, searched for in sparse bitmaps
+ONE = re.compile('1')
+
+
+class SortedIndex(object):
+    """
+    Object holding a secondary index over a numeric column of OrbitColumns.
+
+    The row numbers of the column are kept sorted by their value, next to
+    the sorted values, so the rows matching a range filter are a single
+    slice found with a binary search.
+    """
+
+    def __init__(self, column):
+        """
+        :param column: array of the column values, indexed by row
+        """
+        rows = sorted(range(len(column)), key=column.__getitem__)
+        self.rows = array('l', rows)
+        self.values = array('d', map(column.__getitem__, rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, value, row):
+        """
+        Indexes the value of a new row
+
+        :param value: float representing the column value of the row
+        :param row: int representing the row
+        :return: None
+        """
+        position = bisect_right(self.values, value)
+        self.values.insert(position, value)
+        self.rows.insert(position, row)
+
+    def extend(self, pairs):
+        """
+        Indexes the values of many new rows at once. The new rows are sorted
+        and merged into the index in a single pass, copying the runs of
+        indexed rows between them, instead of inserted one at a time.
+
+        :param pairs: iterable of tuples of the column value and the row
+        :return: None
+        """
+        values, rows = array('d'), array('l')
+        start = 0
+
+        for value, row in sorted(pairs):
+            position = bisect_right(self.values, value, start)
+            values.extend(self.values[start:position])
+            rows.extend(self.rows[start:position])
+            values.append(value)
+            rows.append(row)
+            start = position
+
+        values.extend(self.values[start:])
+        rows.extend(self.rows[start:])
+        self.values, self.rows = values, rows
+
+    def lookup(self, operation, value):
+        """
+        Finds the positions in the index of the rows passing a filter
+
+        :param operation: operator function of the filter
+        :param value: filter value
+        :return: tuple of the first and one past the last position, or None
+        if the operation cannot use the index
+        """
+        if operation is lt:
+            return 0, bisect_left(self.values, value)
+        if operation is le:
+            return 0, bisect_right(self.values, value)
+        if operation is gt:
+            return bisect_right(self.values, value), len(self.values)
+        if operation is ge:
+            return bisect_left(self.values, value), len(self.values)
+        if operation is eq:
+            return (bisect_left(self.values, value),
+                    bisect_right(self.values, value))
+        return None
+
+    def count(self, operation, value):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :return: int representing the number of rows passing the filter,
+        or None if the operation cannot use the index
+        """
+        positions = self.lookup(operation, value)
+        if positions is None:
+            return None
+        return max(0, positions[1] - positions[0])
+
+    def get_rows(self, operation, value, start, end):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :param start: int representing the first row of the date range
+        :param end: int representing one past the last row of the date range
+        :return: list of the rows in the date range passing the filter,
+        in row order
+        """
+        first, last = self.lookup(operation, value)
+        return sorted(row for row in self.rows[first:last]
+                      if start <= row < end)
+
+
+class BucketIndex(object):
+    """
+    Object holding a secondary index over a column with few distinct values,
+    such as the hazard flag, as a list of rows per value.
+    """
+
+    def __init__(self, column):
+        """
+        :param column: array of the column values, indexed by row
+        """
+        self.buckets = {}
+        for row, value in enumerate(column):
+            self.add(value, row)
+
+    def add(self, value, row):
+        """
+        Indexes the value of a new row
+
+        :param value: column value of the row
+        :param row: int representing the row
+        :return: None
+        """
+        self.buckets.setdefault(value, array('l')).append(row)
+
+    def extend(self, pairs):
+        """
+        Indexes the values of many new rows
+
+        :param pairs: iterable of tuples of the column value and the row
+        :return: None
+        """
+        for value, row in pairs:
+            self.add(value, row)
+
+    def count(self, operation, value):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :return: int representing the number of rows passing the filter,
+        or None if the operation cannot use the index
+        """
+        if operation is not eq:
+            return None
+        return len(self.buckets.get(value, ()))
+
+    def get_rows(self, operation, value, start, end):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :param start: int representing the first row of the date range
+        :param end: int representing one past the last row of the date range
+        :return: array of the rows in the date range passing the filter,
+        in row order
+        """
+        rows = self.buckets.get(value, array('l'))
+        return rows[bisect_left(rows, start):bisect_left(rows, end)]
+
+
+def bitmap_range(start, end):
+    """
+    :param start: int representing the first bit
+    :param end: int representing one past the last bit
+    :return: int bitmap with the bits from start to end set
+    """
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def bitmap_rows(bitmap, start):
+    """
+    Lazily finds the rows set in a bitmap of a slice of rows
+
+    :param bitmap: int bitmap, bit i set for row start + i
+    :param start: int representing the first row of the slice
+    :return: iterator of the rows in row order
+    """
+    # Least significant digit, the first row, first
+    digits = format(bitmap, 'b')[::-1] if bitmap else ''
+
+    # Searching for the set digits is faster than masking every row while
+    # fewer than about a quarter of the rows are set
+    if bitmap.bit_count() * 4 < len(digits):
+        return map(start.__add__, map(methodcaller('start'),
+                                      ONE.finditer(digits)))
+
+    return compress(range(start, start + len(digits)),
+                    digits.encode().translate(DIGITS))
+
+
+def bitmap_from_rows(rows, start, end):
+    """
+    :param rows: iterable of rows within a slice of rows
+    :param start: int representing the first row of the slice
+    :param end: int representing one past the last row of the slice
+    :return: int bitmap of the rows, bit i set for row start + i
+    """
+    digits = bytearray(b'0') * (end - start)
+    for row in rows:
+        digits[end - 1 - row] = 49
+    return int(digits, 2) if digits else 0
+
+
+class ChunkedBitmap(object):
+    """
+    Object holding a bitmap of rows split into chunks of CHUNK_ROWS rows,
+    each an int bitmap of the rows of its chunk, 0 for a chunk without
+    rows. Setting the bit of a new row copies a single chunk, rather than
+    the bitmap of every row, and the bitmap of a slice of rows is joined
+    from the chunks it overlaps only.
+    """
+
+    # Number of rows of a chunk, as a power of 2
+    CHUNK_BITS = 16
+    CHUNK_ROWS = 1 << CHUNK_BITS
+
+    __slots__ = ('chunks',)
+
+    def __init__(self, rows=()):
+        """
+        :param rows: iterable of the rows set, in row order
+        """
+        bits = ChunkedBitmap.CHUNK_BITS
+        self.chunks = []
+
+        for chunk, chunk_rows in groupby(rows, key=lambda row: row >> bits):
+            first = chunk << bits
+            self.chunks.extend(repeat(0, chunk - len(self.chunks)))
+            self.chunks.append(bitmap_from_rows(
+                chunk_rows, first, first + ChunkedBitmap.CHUNK_ROWS))
+
+    def add(self, row):
+        """
+        Sets the bit of a row
+
+        :param row: int representing the row
+        :return: None
+        """
+        chunk = row >> ChunkedBitmap.CHUNK_BITS
+        if chunk >= len(self.chunks):
+            self.chunks.extend(repeat(0, chunk + 1 - len(self.chunks)))
+        self.chunks[chunk] |= 1 << (row & (ChunkedBitmap.CHUNK_ROWS - 1))
+
+    def get(self, start, end):
+        """
+        :param start: int representing the first row of a slice of rows
+        :param end: int representing one past the last row of the slice
+        :return: int bitmap of the rows set in the slice, bit i set for row
+        start + i
+        """
+        if end <= start:
+            return 0
+
+        bits = ChunkedBitmap.CHUNK_BITS
+        first = start >> bits
+        chunks = self.chunks[first:((end - 1) >> bits) + 1]
+        if len(chunks) == 1:
+            bitmap = chunks[0]
+        else:
+            size = ChunkedBitmap.CHUNK_ROWS // 8
+            bitmap = int.from_bytes(b''.join(
+                chunk.to_bytes(size, 'little') for chunk in chunks), 'little')
+
+        return (bitmap >> (start - (first << bits))) & \
+            bitmap_range(0, end - start)
+
+    @staticmethod
+    def union(bitmaps, start, end):
+        """
+        :param bitmaps: list of ChunkedBitmaps
+        :param start: int representing the first row of a slice of rows
+        :param end: int representing one past the last row of the slice
+        :return: int bitmap of the rows set in any of the bitmaps in the
+        slice, bit i set for row start + i
+        """
+        if len(bitmaps) == 1:
+            return bitmaps[0].get(start, end)
+
+        # The chunks are merged first, so the slice is joined only once
+        bits = ChunkedBitmap.CHUNK_BITS
+        union = ChunkedBitmap()
+        union.chunks = [0] * (start >> bits) + [
+            reduce(or_, (bitmap.chunks[chunk] for bitmap in bitmaps
+                         if chunk < len(bitmap.chunks)), 0)
+            for chunk in range(start >> bits, ((end - 1) >> bits) + 1)]
+        return union.get(start, end)
+
+
+class BitmapIndex(object):
+    """
+    Object holding a bitmap index over a column of OrbitColumns.
+
+    The values of the column are split into equi-depth buckets, or one
+    bucket per value for columns with few distinct values such as the hazard
+    flag, and each bucket keeps the ChunkedBitmap of its rows with the min
+    and max value of its rows. A filter is the union of the bitmaps of the
+    buckets whose every value passes it, and of the rows passing it in the
+    buckets it splits, which are the only rows compared, within the chunks
+    of the date range. Bitmaps of filters are then combined with the
+    bitwise operators, which run over whole machine words in C.
+    """
+
+    # Number of buckets of a column with many distinct values
+    BUCKETS = 64
+
+    def __init__(self, column):
+        """
+        :param column: array of the column values, indexed by row
+        """
+        self.column = column
+        values = sorted(column)
+        distinct = sorted(set(values))
+
+        if len(distinct) <= BitmapIndex.BUCKETS:
+            self.bounds = distinct
+        else:
+            step = (len(values) - 1) / BitmapIndex.BUCKETS
+            self.bounds = sorted({values[round(bucket * step)]
+                                  for bucket in range(BitmapIndex.BUCKETS)})
+
+        self.bitmaps = [ChunkedBitmap() for _ in self.bounds]
+        self.lows = [None] * len(self.bounds)
+        self.highs = [None] * len(self.bounds)
+        rows = {}
+
+        for row, value in enumerate(column):
+            rows.setdefault(self.get_bucket(value), []).append(row)
+
+        for bucket, bucket_rows in rows.items():
+            self.bitmaps[bucket] = ChunkedBitmap(bucket_rows)
+            self.lows[bucket] = min(map(column.__getitem__, bucket_rows))
+            self.highs[bucket] = max(map(column.__getitem__, bucket_rows))
+
+    def get_bucket(self, value):
+        """
+        :param value: column value
+        :return: int representing the bucket of the value, the first and
+        last buckets holding the values below and above every bound
+        """
+        return max(bisect_right(self.bounds, value) - 1, 0)
+
+    def add(self, value, row):
+        """
+        Indexes the value of a new row
+
+        :param value: column value of the row
+        :param row: int representing the row
+        :return: None
+        """
+        if not self.bounds:
+            self.bounds.append(value)
+            self.bitmaps.append(ChunkedBitmap())
+            self.lows.append(value)
+            self.highs.append(value)
+
+        bucket = self.get_bucket(value)
+        self.bitmaps[bucket].add(row)
+        if self.lows[bucket] is None or value < self.lows[bucket]:
+            self.lows[bucket] = value
+        if self.highs[bucket] is None or value > self.highs[bucket]:
+            self.highs[bucket] = value
+
+    def extend(self, pairs):
+        """
+        Indexes the values of many new rows
+
+        :param pairs: iterable of tuples of the column value and the row
+        :return: None
+        """
+        for value, row in pairs:
+            self.add(value, row)
+
+    def get_bitmap(self, operation, value, start, end):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :param start: int representing the first row of the date range
+        :param end: int representing one past the last row of the date range
+        :return: int bitmap of the rows in the date range passing the
+        filter, bit i set for row start + i
+        """
+        whole, split = [], []
+
+        for rows, low, high in zip(self.bitmaps, self.lows, self.highs):
+            if low is None:
+                continue
+            if operation is eq:
+                passing = low == high == value
+                none = not low <= value <= high
+            else:
+                # Range filters pass every value between two passing values
+                passing = operation(low, value) and operation(high, value)
+                none = not operation(low, value) and \
+                    not operation(high, value)
+            if passing:
+                whole.append(rows)
+            elif not none:
+                split.append(rows)
+
+        bitmap = ChunkedBitmap.union(whole, start, end) if whole else 0
+
+        for rows in split:
+            candidates = list(bitmap_rows(rows.get(start, end), start))
+            bitmap |= bitmap_from_rows(compress(candidates, map(
+                operation, map(self.column.__getitem__, candidates),
+                repeat(value))), start, end)
+
+        return bitmap
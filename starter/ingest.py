@@ -0,0 +1,234 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
+from models import OrbitPath, NearEarthObject
+import csv
+import gc
+import io
+import os
+import sys
+
+
+class RowDecoder(object):
+    """
+    Object converting positional csv rows to NearEarthObject and OrbitPath
+    records.
+
+    The position of every column used by the models is resolved once from
+    the header, so a row is read with a single itemgetter call per model
+    instead of building a dict per row, and each value is converted to its
+    type once. The records match those of NearEarthObject.parse_record and
+    OrbitPath.parse_record.
+    """
+
+    NeoColumns = ('id', 'neo_reference_id', 'name', 'nasa_jpl_url',
+                  'absolute_magnitude_h', 'estimated_diameter_min_kilometers',
+                  'estimated_diameter_max_kilometers',
+                  'is_potentially_hazardous_asteroid')
+
+    OrbitColumns = ('kilometers_per_second', 'kilometers_per_hour',
+                    'close_approach_date', 'close_approach_date_full',
+                    'miss_distance_kilometers')
+
+    def __init__(self, header):
+        """
+        :param header: list of csv column names
+        """
+        positions = {column: position for position, column in
+                     enumerate(header)}
+        missing = [column for column in self.NeoColumns + self.OrbitColumns
+                   if column not in positions]
+        if missing:
+            raise ValueError(f'Missing csv columns: {", ".join(missing)}')
+
+        self.name = itemgetter(positions['name'])
+        self.neo_columns = itemgetter(*map(positions.__getitem__,
+                                           self.NeoColumns))
+        self.orbit_columns = itemgetter(*map(positions.__getitem__,
+                                             self.OrbitColumns))
+
+    def neo_record(self, row):
+        """
+        :param row: list of csv values
+        :return: tuple of the typed NearEarthObject fields
+        """
+        (neo_id, neo_reference_id, name, nasa_jpl_url, abs_magnitude_h,
+         diameter_min_km, diameter_max_km,
+         is_hazardous) = self.neo_columns(row)
+        return (neo_id, neo_reference_id, sys.intern(name), nasa_jpl_url,
+                float(abs_magnitude_h), float(diameter_min_km),
+                float(diameter_max_km), is_hazardous == "True")
+
+    def orbit_record(self, row):
+        """
+        :param row: list of csv values
+        :return: tuple of the typed OrbitPath fields
+        """
+        (km_per_second, km_per_hour, approach_date, approach_date_full,
+         miss_distance_km) = self.orbit_columns(row)
+        return (float(km_per_second), float(km_per_hour),
+                sys.intern(approach_date), approach_date_full,
+                float(miss_distance_km))
+
+
+@contextmanager
+def paused_gc():
+    """
+    Pauses the cyclic garbage collector while building or unpickling
+    millions of objects, none of which can be garbage yet. The collector is
+    only enabled again if it was enabled on entry, so a caller that
+    disabled it keeps it disabled.
+
+    :return: context manager
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def load_rows(rows, header, neo_name_db, neo_date_db):
+    """
+    Instantiates the NearEarthObjects and OrbitPaths of csv rows into a
+    dict of names and a dict of dates, attaching every orbit to the single
+    NearEarthObject instance with the same name. A NearEarthObject record
+    is only decoded for the first row of each name, and the garbage
+    collector is paused for the duration of the load.
+
+    :param rows: iterable of lists of csv values, as read by csv.reader
+    :param header: list of csv column names
+    :param neo_name_db: dict of NEO name to NearEarthObject, updated in place
+    :param neo_date_db: dict of date to list of OrbitPaths, updated in place
+    :return: None
+    """
+    decoder = RowDecoder(header)
+    get_name, neo_record = decoder.name, decoder.neo_record
+    orbit_record, from_record = decoder.orbit_record, OrbitPath.from_record
+
+    with paused_gc():
+        # Blank lines are read as empty rows, skipped like csv.DictReader
+        for row in filter(None, rows):
+            name = get_name(row)
+            neo = neo_name_db.get(name)
+            if neo is None:
+                neo = neo_name_db[name] = NearEarthObject.from_record(
+                    neo_record(row))
+            orbit = from_record(neo, orbit_record(row))
+
+            neo.update_orbits(orbit)
+            neo_date_db.setdefault(orbit.close_approach_date,
+                                   []).append(orbit)
+
+
+def split_chunks(filename, chunks):
+    """
+    Splits a csv file into byte ranges that start and end on row boundaries.
+    Rows are assumed not to contain quoted newlines, which holds for the
+    Near Earth Object data.
+
+    :param filename: str representing the pathway of the csv file
+    :param chunks: int representing the number of ranges to split into
+    :return: tuple of the list of header column names and a list of
+    (start, end) byte offsets
+    """
+    size = os.path.getsize(filename)
+
+    with open(filename, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        data_start = f.tell()
+
+        boundaries = [data_start]
+        for chunk in range(1, chunks):
+            offset = max(data_start + (size - data_start) * chunk // chunks,
+                         boundaries[-1])
+            # Move to the start of the next row, unless already on one
+            f.seek(offset - 1)
+            f.readline()
+            boundaries.append(f.tell())
+        boundaries.append(size)
+
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:])
+              if start < end]
+    return header, ranges
+
+
+def parse_chunk(filename, header, start, end):
+    """
+    Parses the rows in a byte range of a csv file into records. Run in a
+    worker process. Plain tuples are returned rather than model instances
+    because they are much cheaper to send back to the parent process.
+
+    :param filename: str representing the pathway of the csv file
+    :param header: list of csv column names
+    :param start: int representing the byte offset of the first row
+    :param end: int representing the byte offset past the last row
+    :return: tuple of a dict of NEO name to NearEarthObject record, in order
+    of first appearance, and a list of (NEO name, OrbitPath record) in row
+    order
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start).decode('utf-8')
+
+    neo_records, orbit_records = {}, []
+    decoder = RowDecoder(header)
+
+    for row in filter(None, csv.reader(io.StringIO(data, newline=''))):
+        name = decoder.name(row)
+        if name not in neo_records:
+            neo_records[name] = decoder.neo_record(row)
+        orbit_records.append((name, decoder.orbit_record(row)))
+
+    return neo_records, orbit_records
+
+
+def merge_chunk(neo_name_db, neo_date_db, chunk):
+    """
+    Instantiates the records of a parsed chunk into the databases. Chunks
+    must be merged in file order for the result to match a serial load.
+
+    :param neo_name_db: dict of NEO name to NearEarthObject, updated in place
+    :param neo_date_db: dict of date to list of OrbitPaths, updated in place
+    :param chunk: tuple of NEO records and orbit records, as returned by
+    parse_chunk
+    :return: None
+    """
+    neo_records, orbit_records = chunk
+
+    for name, record in neo_records.items():
+        if name not in neo_name_db:
+            neo_name_db[name] = NearEarthObject.from_record(record)
+
+    for name, record in orbit_records:
+        neo = neo_name_db[name]
+        orbit = OrbitPath.from_record(neo, record)
+
+        neo.update_orbits(orbit)
+        neo_date_db.setdefault(orbit.close_approach_date, []).append(orbit)
+
+
+def load_parallel(filename, neo_name_db, neo_date_db, workers):
+    """
+    Loads a csv file by parsing byte range chunks in a pool of worker
+    processes and merging their records in file order
+
+    :param filename: str representing the pathway of the csv file
+    :param neo_name_db: dict of NEO name to NearEarthObject, updated in place
+    :param neo_date_db: dict of date to list of OrbitPaths, updated in place
+    :param workers: int representing the number of worker processes
+    :return: None
+    """
+    header, ranges = split_chunks(filename, workers)
+    if not ranges:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(parse_chunk,
+                              *zip(*[(filename, header, start, end)
+                                     for start, end in ranges]))
+
+        for chunk in chunks:
+            merge_chunk(neo_name_db, neo_date_db, chunk)
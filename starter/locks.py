@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+import threading
+
+
+class ReadWriteLock(object):
+    """
+    Object representing a lock held either by any number of readers at a
+    time or by a single writer, used to let searches of a NEODatabase run
+    from many threads while new orbits are ingested.
+
+    Waiting writers go first: once a writer waits, new readers wait behind
+    it, so a steady stream of searches cannot starve ingestion. Both sides
+    are reentrant within a thread, and the thread holding the write lock
+    may also read, so methods holding the lock can call each other.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.writes = 0
+        self.waiting_writers = 0
+        # Number of read locks held by the current thread
+        self.local = threading.local()
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the lock as a reader for the duration of a with block
+
+        :return: context manager
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the lock as the writer for the duration of a with block
+
+        :return: context manager
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def acquire_read(self):
+        """
+        :return: None
+        """
+        depth = getattr(self.local, 'depth', 0)
+
+        if depth:
+            self.local.depth = depth + 1
+            return
+
+        if self.writer is threading.current_thread():
+            # Reading within a write, not counted as a reader
+            self.local.counted = False
+        else:
+            with self.condition:
+                while self.writer is not None or self.waiting_writers:
+                    self.condition.wait()
+                self.readers += 1
+            self.local.counted = True
+        self.local.depth = 1
+
+    def release_read(self):
+        """
+        :return: None
+        """
+        self.local.depth -= 1
+        if self.local.depth or not self.local.counted:
+            return
+
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        """
+        :return: None
+        """
+        thread = threading.current_thread()
+
+        with self.condition:
+            if self.writer is thread:
+                self.writes += 1
+                return
+            if getattr(self.local, 'depth', 0):
+                # Upgrading would deadlock with another upgrading reader
+                raise RuntimeError('cannot write while holding a read lock')
+
+            self.waiting_writers += 1
+            while self.writer is not None or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = thread
+            self.writes = 1
+
+    def release_write(self):
+        """
+        :return: None
+        """
+        with self.condition:
+            self.writes -= 1
+            if not self.writes:
+                self.writer = None
+                self.condition.notify_all()
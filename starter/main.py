@@ -18,30 +18,101 @@ csvfile with name 'neo_neo_data' For example:
 
 Output options: Required.
 - display: prints to stdout
-- csv_file: exports data to a csv
+- csv_file: exports data to a csv, results.csv unless set with --output_file
+(use - for stdout, and --gzip or a .gz suffix to compress)
 
 Filters options: Optional. Input as: option:operation:value . For example:
 - diameter:>=:0.042
 - is_hazardous:[=]:bool
 - diameter:[>=|=|<=]:float
 - distance:[>=|=|<=]:float
+- distance:between:float:float
+- closest_distance|approaches|max_speed:[>=|=|<=]:float, on the aggregates of
+each NEO over all its orbits
+Filters combine with and, or, not and parentheses into expressions, e.g.
+"distance:between:50000:900000 and (is_hazardous:=:True or diameter:>:1)".
+Every --filter expression must pass.
+
+Aggregation options: Optional, --group_by day|month|year returns a summary of
+the approaches found in each period instead: the number of approaches and of
+hazardous approaches, the distinct NEOs and the min, mean and max miss
+distance. --by_hazard also splits each period by hazard flag. For example:
+main.py display --start_date 2020-01-01 --end_date 2020-12-31 --group_by month
+
+Sort options: Optional, --sort_by distance|diameter|speed|date returns the
+first results in ascending order of the field instead of date order, or with
+--descending in descending order, e.g. the 20 closest approaches of a decade:
+main.py display -n 20 -r Path --start_date 2010-01-01 --end_date 2019-12-31 \
+--sort_by distance
+NEO results are the distinct NEOs, each ranked by its best approach.
+
+Count: Optional, --count prints the number of results instead of writing
+them. With --bitmap, bitmap indexes on miss distance, diameter and hazard flag
+answer filters and their combinations as bitmap intersections and unions, and
+orbit counts without reading any OrbitPath, e.g. the hazardous approaches
+closer than the Moon in 2020:
+main.py display --count -r Path --start_date 2020-01-01 --end_date 2020-12-31 \
+--filter "is_hazardous:=:True" "distance:<:384400" --bitmap
 
 Return objects options: Optional, defaults to NEO if not specified.
-- NEO
+- NEO (distinct NEOs, in the order they are found)
 - Path
 
 Filename: Optional, used for specifying a filename for a csv to load data from.
 By default project looks for a csv in: data/neo_data.csv.
+
+Append: Optional, names of delta csv files whose new orbits are merged into
+the loaded data, e.g. --append new_approaches.csv
+
+Snapshot: Optional. The parsed data is cached in a binary snapshot next to the
+csv file (e.g. data/neo_data.csv.snapshot) and reused while the csv file is
+unchanged. Use --snapshot to choose another pathway or --no-snapshot to
+always parse the csv file.
+
+Store: Optional, --mmap opens the data from a fixed-width binary store next to
+the csv file (e.g. data/neo_data.csv.store), built from the csv file once and
+memory-mapped, so opening is near-instant and processes share one copy of
+the data. Use --store to choose another pathway.
+
+Lazy: Optional, --lazy indexes the csv file once into a sidecar file (e.g.
+data/neo_data.csv.rowindex) holding the byte offset of every row and the
+searched columns only. Searches run over the index and the objects returned
+are read from the csv file, the most recently used ones kept in a bounded
+cache.
+
+Partition: Optional, --partition year|month|day splits the csv file once into
+one csv file per period in a directory next to it (e.g.
+data/neo_data.csv.partitions) with a manifest, and loads only the partitions
+overlapping the dates searched. --max_partitions evicts the least recently
+used partitions beyond that number.
+
+Explain: Optional, --explain prints the query plan chosen from statistics of
+the data (access path and filter order) with the estimated and actual rows
+of each stage.
+
+Profile: Optional, --profile prints the wall and CPU time, rows in and out and
+peak memory of each stage of the run (loading, each step of the search and
+writing) with the number of objects loaded; --profile=trace.json writes
+them as a json trace instead.
 """
 
 import argparse
+import gc
 import pathlib
 import sys
 from datetime import datetime
+from itertools import chain
 
 from exceptions import UnsupportedFeature
 from database import NEODatabase
+from aggregate import GroupBy
+from ordering import SortBy
+from profiler import Profiler, profile_stage
 from search import Query, NEOSearcher
+from snapshot import Snapshot
+from partitions import PartitionManifest
+from rowindex import RowIndex
+from store import OrbitStore
 from writer import OutputFormat, NEOWriter
 
 PROJECT_ROOT = pathlib.Path(__file__).parent.absolute()
@@ -78,6 +149,25 @@ def verify_output_choice(choice):
     return options[options.index(choice)]
 
 
+def verify_number(number_str):
+    """
+    Function that validates the number of results is a non-negative int
+
+    :param number_str:  String representing the max number of results
+    :return: int:       Int representing the max number of results
+    """
+    try:
+        number = int(number_str)
+    except ValueError:
+        number = -1
+
+    if number < 0:
+        error_message = f'Not a valid number: "{number_str}"'
+        raise argparse.ArgumentTypeError(error_message)
+
+    return number
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Near Earth Objects (NEOs) Database')
@@ -105,7 +195,7 @@ if __name__ == '__main__':
         help='YYYY-MM-DD format to find NEOs up to the end date')
     parser.add_argument(
         '-n', '--number',
-        type=int,
+        type=verify_number,
         help='Int representing max number of NEOs to return')
     parser.add_argument(
         '-f', '--filename',
@@ -117,9 +207,123 @@ if __name__ == '__main__':
         help='Select filter options with filter value: '
         'is_hazardous:[=]:bool, '
         'diameter:[>=|=|<=]:float, '
-        'distance:[>=|=|<=]:float.'
+        'distance:[>=|=|<=]:float, '
+        '[diameter|distance]:between:float:float, '
+        '[closest_distance|approaches|max_speed]:[>=|=|<=]:float on the '
+        'aggregates of each NEO over all its orbits. '
         'Input as: [option:operation:value] '
-        'e.g. diameter:>=:0.042')
+        'e.g. diameter:>=:0.042, combined with and, or, not and '
+        'parentheses into expressions, all of which must pass')
+    parser.add_argument(
+        '-g', '--group_by',
+        choices=GroupBy.list(),
+        help='Summarize the approaches found by day, month or year instead '
+        'of returning them')
+    parser.add_argument(
+        '--by_hazard',
+        action='store_true',
+        help='With --group_by, also summarize the approaches of each period '
+        'by hazard flag')
+    parser.add_argument(
+        '--sort_by', '--sort-by',
+        choices=SortBy.list(),
+        help='Return the first results in ascending order of miss distance, '
+        'diameter, speed or date')
+    parser.add_argument(
+        '--descending',
+        action='store_true',
+        help='With --sort_by, return the first results in descending order')
+    parser.add_argument(
+        '--count',
+        action='store_true',
+        help='Print the number of results, ignoring -n, instead of writing '
+        'them')
+    parser.add_argument(
+        '-o', '--output_file',
+        type=str,
+        default='results.csv',
+        help='Pathway of the csv_file output, "-" for stdout. '
+        'Defaults to results.csv')
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        help='Gzip compress the csv_file output, implied by a .gz '
+        'output_file')
+    parser.add_argument(
+        '--append',
+        nargs='+',
+        help='Names of delta csv data files merged into the loaded data, '
+        'skipping orbits already present')
+    parser.add_argument(
+        '--columnar',
+        action='store_true',
+        help='Evaluate filters over a columnar, array-backed copy of the '
+        'orbit data. Faster for wide date ranges')
+    parser.add_argument(
+        '--explain',
+        action='store_true',
+        help='Print the query plan chosen from the data statistics, with the '
+        'estimated and actual rows of each stage')
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='-',
+        metavar='TRACE',
+        help='Print the time, rows and peak memory of each stage of the run, '
+        'or with --profile=TRACE write them to the json file TRACE')
+    parser.add_argument(
+        '--index',
+        action='store_true',
+        help='Keep sorted secondary indexes on miss distance, diameter and '
+        'hazard flag over the columnar copy, so selective filters skip the '
+        'date range scan. Implies --columnar')
+    parser.add_argument(
+        '--bitmap',
+        action='store_true',
+        help='Keep bitmap indexes on miss distance, diameter and hazard flag '
+        'over the columnar copy, so filters and their combinations are '
+        'evaluated as bitmap intersections and unions. Implies --columnar')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Int representing the number of processes used to parse the '
+        'input csv file')
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        help='Pathway of the binary snapshot used to skip csv parsing on '
+        'repeat runs. Defaults to the input csv filename with a .snapshot '
+        'suffix')
+    parser.add_argument(
+        '--no-snapshot',
+        action='store_true',
+        help='Always parse the input csv file, bypassing the snapshot')
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Open the data from a memory-mapped binary store built from the '
+        'input csv file once, searched without loading it in memory')
+    parser.add_argument(
+        '--store',
+        type=str,
+        help='Pathway of the binary store, implies --mmap. Defaults to the '
+        'input csv filename with a .store suffix')
+    parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Search a sidecar index of the row offsets and searched columns '
+        'of the input csv file, reading only the results from the csv file')
+    parser.add_argument(
+        '--partition',
+        choices=GroupBy.list(),
+        help='Split the input csv file once into one csv file per year, month '
+        'or day, loading only the partitions overlapping the dates searched')
+    parser.add_argument(
+        '--max_partitions', '--max-partitions',
+        type=int,
+        help='With --partition, the number of partitions kept loaded, the '
+        'least recently used evicted first')
 
     args = parser.parse_args()
     var_args = vars(args)
@@ -130,38 +334,97 @@ if __name__ == '__main__':
     else:
         filename = f'{PROJECT_ROOT}/data/neo_data.csv'
 
-    db = NEODatabase(filename=filename)
+    if args.no_snapshot:
+        snapshot = None
+    else:
+        snapshot = args.snapshot or Snapshot.default_path(filename)
+
+    store = None
+    if args.mmap or args.store:
+        store = args.store or OrbitStore.default_path(filename)
+
+    row_index = RowIndex.default_path(filename) if args.lazy else None
+    partitions = PartitionManifest.default_path(filename) \
+        if args.partition else None
+
+    profiler = Profiler() if args.profile else None
+
+    db = NEODatabase(filename=filename, snapshot=snapshot,
+                     columnar=args.columnar, workers=args.workers,
+                     indexed=args.index, profiler=profiler, store=store,
+                     row_index=row_index, partitions=partitions,
+                     period=args.partition,
+                     max_partitions=args.max_partitions,
+                     bitmaps=args.bitmap)
 
     try:
         db.load_data()
+        for delta_filename in args.append or []:
+            db.ingest(delta_filename)
+    except UnsupportedFeature as e:
+        print('Unsupported Feature; Append unsuccessful')
+        sys.exit()
     except FileNotFoundError as e:
-        print(f'File {var_args.get("filename")} not found')
+        print(f'File {e.filename} not found')
         sys.exit()
     except Exception as e:
         print(Exception)
         sys.exit()
 
+    if profiler:
+        profiler.count('neos', len(db.neo_name_db))
+        profiler.count('orbits', db.get_stats().count)
+        profiler.count('objects', len(gc.get_objects()))
+
     # Build Query
     query_selectors = Query(**var_args).build_query()
 
     # Get Results
     try:
-        results = NEOSearcher(db).get_objects(query_selectors)
+        searcher = NEOSearcher(db, explain=args.explain, profiler=profiler)
+        if args.count:
+            plan, count = searcher.count_planned(query_selectors)
+        else:
+            plan, results = searcher.iter_planned(query_selectors)
+            # The first result is peeked at to report an empty search, as
+            # get_objects does, without materializing the others
+            first = next(results, None)
+            if first is None:
+                print("NO MATCHES FOUND")
+            else:
+                results = chain([first], results)
     except UnsupportedFeature as e:
         print('Unsupported Feature; Write unsuccessful')
         sys.exit()
 
     # Output Results
-    try:
-        result = NEOWriter().write(
-            data=results,
-            format=args.output,
-        )
-    except Exception as e:
-        print('Write unsuccessful')
-        sys.exit()
+    if args.count:
+        print(f'count = {count}')
+        result = None
+    else:
+        try:
+            with profile_stage(profiler, 'write'):
+                result = NEOWriter().write(
+                    data=results,
+                    format=args.output,
+                    filename=args.output_file,
+                    compress=args.gzip,
+                    return_object='Summary' if args.group_by
+                    else args.return_object
+                )
+        except Exception as e:
+            print('Write unsuccessful')
+            sys.exit()
+
+    if args.explain and plan is not None:
+        print(plan.describe())
+
+    if profiler and args.profile == '-':
+        print(profiler.describe())
+    elif profiler:
+        profiler.save(args.profile)
 
     if result:
         print('Write successful.')
-    else:
+    elif not args.count:
         print('Write unsuccessful.')
@@ -1,28 +1,78 @@
+import sys
+
+
 class NearEarthObject(object):
     """
     Object containing data describing a Near Earth Object and it's orbits.
 
+    Instances use __slots__ and their fields are converted to their types
+    once, when the csv row is parsed. The name is interned so every
+    OrbitPath of the Near Earth Object shares a single string.
+
+    Aggregates of the orbits (closest miss distance and its date, first and
+    last approach dates and max velocity) are kept up to date as orbits are
+    added, so they can be filtered on without reading the orbits.
+
     # TODO: You may be adding instance methods to NearEarthObject
     to help you implement search and output data.
     """
 
+    __slots__ = ('id', 'neo_reference_id', 'name', 'nasa_jpl_url',
+                 'abs_magnitude_h', 'diameter_min_km', 'diameter_max_km',
+                 'is_hazardous', 'orbits', 'closest_miss_km',
+                 'closest_approach_date', 'first_approach_date',
+                 'last_approach_date', 'max_km_per_second', '__weakref__')
+
     def __init__(self, **kwargs):
         """
         :param kwargs:    dict of attributes about a given Near Earth Object,
         only a subset of attributes used
         """
-        self.id = kwargs["id"]
-        self.neo_reference_id = kwargs["neo_reference_id"]
-        self.name = kwargs["name"]
-        self.nasa_jpl_url = kwargs["nasa_jpl_url"]
-        self.abs_magnitude_h = kwargs["absolute_magnitude_h"]
-        self.diameter_min_km = float(kwargs[
-                               "estimated_diameter_min_kilometers"])
-        self.diameter_max_km = float(kwargs[
-                               "estimated_diameter_max_kilometers"])
-        self.is_hazardous = kwargs["is_potentially_hazardous_asteroid"]
+        (self.id, self.neo_reference_id, self.name, self.nasa_jpl_url,
+         self.abs_magnitude_h, self.diameter_min_km, self.diameter_max_km,
+         self.is_hazardous) = NearEarthObject.parse_record(kwargs)
         self.orbits = []
-        self.miss_distances_km = []
+        self.reset_aggregates()
+
+    @staticmethod
+    def parse_record(row):
+        """
+        Converts the csv columns describing a Near Earth Object to a record
+
+        :param row: dict of csv column name to value
+        :return: tuple of the typed NearEarthObject fields
+        """
+        return (row["id"],
+                row["neo_reference_id"],
+                sys.intern(row["name"]),
+                row["nasa_jpl_url"],
+                float(row["absolute_magnitude_h"]),
+                float(row["estimated_diameter_min_kilometers"]),
+                float(row["estimated_diameter_max_kilometers"]),
+                row["is_potentially_hazardous_asteroid"] == "True")
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        :param record: tuple of the typed NearEarthObject fields,
+        as returned by parse_record
+        :return: NearEarthObject without any orbits
+        """
+        neo = cls.__new__(cls)
+        (neo.id, neo.neo_reference_id, neo.name, neo.nasa_jpl_url,
+         neo.abs_magnitude_h, neo.diameter_min_km, neo.diameter_max_km,
+         neo.is_hazardous) = record
+        neo.orbits = []
+        neo.reset_aggregates()
+        return neo
+
+    def to_record(self):
+        """
+        :return: tuple of the typed NearEarthObject fields
+        """
+        return (self.id, self.neo_reference_id, self.name, self.nasa_jpl_url,
+                self.abs_magnitude_h, self.diameter_min_km,
+                self.diameter_max_km, self.is_hazardous)
 
     def __str__(self):
         orbit_dates = self.get_orbit_dates(self.orbits)
@@ -38,6 +88,32 @@ class NearEarthObject(object):
                        f'miss distances(km) = {miss_distances}\n'
         return neo_contents
 
+    def reset_aggregates(self):
+        """
+        Clears the aggregates of the orbits, for a NEO without any orbits
+
+        :return: None
+        """
+        self.closest_miss_km = None
+        self.closest_approach_date = None
+        self.first_approach_date = None
+        self.last_approach_date = None
+        self.max_km_per_second = None
+
+    @property
+    def approach_count(self):
+        """
+        :return: int representing the number of orbits of the NEO
+        """
+        return len(self.orbits)
+
+    @property
+    def miss_distances_km(self):
+        """
+        :return: list of miss distances for each of the NEO orbits
+        """
+        return self.get_miss_distances(self.orbits)
+
     def update_orbits(self, orbit):
         """
         Adds an orbit path information to a Near Earth Object list of orbits
@@ -48,6 +124,25 @@ class NearEarthObject(object):
         # TODO: How do we connect orbits back to the Near Earth Object?
         self.orbits.append(orbit)
 
+        approach_date = orbit.close_approach_date
+
+        if self.closest_miss_km is None or \
+                orbit.miss_distance_km < self.closest_miss_km:
+            self.closest_miss_km = orbit.miss_distance_km
+            self.closest_approach_date = approach_date
+
+        if self.first_approach_date is None or \
+                approach_date < self.first_approach_date:
+            self.first_approach_date = approach_date
+
+        if self.last_approach_date is None or \
+                approach_date > self.last_approach_date:
+            self.last_approach_date = approach_date
+
+        if self.max_km_per_second is None or \
+                orbit.km_per_second > self.max_km_per_second:
+            self.max_km_per_second = orbit.km_per_second
+
     @staticmethod
     def get_orbit_dates(orbits):
         """
@@ -80,27 +175,87 @@ class NearEarthObject(object):
 class OrbitPath(object):
     """
     Object containing data describing a Near Earth Object orbit.
+
+    The attributes describing the Near Earth Object itself (id, name,
+    diameters and hazard flag) are not copied into every orbit, they are
+    read from the NearEarthObject instance the orbit references.
     """
 
-    def __init__(self, **kwargs):
+    __slots__ = ('neo', 'km_per_second', 'km_per_hour',
+                 'close_approach_date', 'close_approach_date_full',
+                 'miss_distance_km', '__weakref__')
+
+    def __init__(self, neo=None, **kwargs):
         """
+        :param neo: NearEarthObject the orbit belongs to, created from kwargs
+        if not provided
         :param kwargs:    dict of attributes about a given orbit,
         only a subset of attributes used
         """
+        self.neo = neo if neo is not None else NearEarthObject(**kwargs)
+        (self.km_per_second, self.km_per_hour, self.close_approach_date,
+         self.close_approach_date_full,
+         self.miss_distance_km) = OrbitPath.parse_record(kwargs)
+
+    @staticmethod
+    def parse_record(row):
+        """
+        Converts the csv columns describing an orbit to a record
+
+        :param row: dict of csv column name to value
+        :return: tuple of the typed OrbitPath fields
+        """
+        return (float(row["kilometers_per_second"]),
+                float(row["kilometers_per_hour"]),
+                sys.intern(row["close_approach_date"]),
+                row["close_approach_date_full"],
+                float(row["miss_distance_kilometers"]))
+
+    @classmethod
+    def from_record(cls, neo, record):
+        """
+        :param neo: NearEarthObject the orbit belongs to
+        :param record: tuple of the typed OrbitPath fields,
+        as returned by parse_record
+        :return: OrbitPath
+        """
+        orbit = cls.__new__(cls)
+        orbit.neo = neo
+        (orbit.km_per_second, orbit.km_per_hour, orbit.close_approach_date,
+         orbit.close_approach_date_full, orbit.miss_distance_km) = record
+        return orbit
+
+    def to_record(self):
+        """
+        :return: tuple of the typed OrbitPath fields
+        """
+        return (self.km_per_second, self.km_per_hour,
+                self.close_approach_date, self.close_approach_date_full,
+                self.miss_distance_km)
+
+    @property
+    def id(self):
+        return self.neo.id
+
+    @property
+    def neo_reference_id(self):
+        return self.neo.neo_reference_id
+
+    @property
+    def name(self):
+        return self.neo.name
+
+    @property
+    def diameter_min_km(self):
+        return self.neo.diameter_min_km
+
+    @property
+    def diameter_max_km(self):
+        return self.neo.diameter_max_km
 
-        self.id = kwargs["id"]
-        self.neo_reference_id = kwargs["neo_reference_id"]
-        self.name = kwargs["name"]
-        self.km_per_second = kwargs["kilometers_per_second"]
-        self.km_per_hour = kwargs["kilometers_per_hour"]
-        self.close_approach_date = kwargs["close_approach_date"]
-        self.close_approach_date_full = kwargs["close_approach_date_full"]
-        self.diameter_min_km = float(kwargs[
-                               "estimated_diameter_min_kilometers"])
-        self.diameter_max_km = float(kwargs[
-                               "estimated_diameter_max_kilometers"])
-        self.is_hazardous = kwargs["is_potentially_hazardous_asteroid"]
-        self.miss_distance_km = float(kwargs["miss_distance_kilometers"])
+    @property
+    def is_hazardous(self):
+        return self.neo.is_hazardous
 
     def __str__(self):
         orbit_contents = f'name = {self.name}\n' + \
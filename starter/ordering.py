@@ -0,0 +1,173 @@
+from bisect import bisect_left
+from enum import Enum
+from heapq import heapify, heappush, heapreplace, nsmallest
+from itertools import islice
+
+from columns import OrbitColumns
+
+# Number of index rows read by the first block of a sorted index scan
+FIRST_BLOCK_SIZE = 64
+
+
+class SortBy(Enum):
+    """
+    Enum representing supported orderings of the OrbitPaths found by a
+    search.
+    """
+    distance = 'distance'
+    diameter = 'diameter'
+    speed = 'speed'
+    date = 'date'
+
+    @staticmethod
+    def list():
+        """
+        :return: list of string representations of SortBy enums
+        """
+        return list(map(lambda sort_by: sort_by.value, SortBy))
+
+    @property
+    def attribute(self):
+        """
+        :return: str representing the OrbitPath attribute sorted on
+        """
+        return {'distance': 'miss_distance_km',
+                'diameter': 'diameter_min_km',
+                'speed': 'km_per_second',
+                'date': 'close_approach_date'}[self.value]
+
+    def get_key(self, descending=False):
+        """
+        :param descending: bool representing if the largest values come
+        first
+        :return: function of an OrbitPath to a number, smaller for the
+        OrbitPaths coming first
+        """
+        if self is SortBy.date:
+            ordinals = {}
+
+            def value(orbit):
+                approach_date = orbit.close_approach_date
+                ordinal = ordinals.get(approach_date)
+                if ordinal is None:
+                    ordinal = ordinals[approach_date] = \
+                        OrbitColumns.to_ordinal(approach_date)
+                return ordinal
+        else:
+            attribute = self.attribute
+
+            def value(orbit):
+                return getattr(orbit, attribute)
+
+        if descending:
+            return lambda orbit: -value(orbit)
+        return value
+
+
+def top_k(orbits, number, key, unique=False):
+    """
+    Finds the first OrbitPaths, or the first distinct NEOs of the OrbitPaths,
+    in the order of a key, keeping at most number of them at a time in a
+    bounded heap. Ties keep the order of the stream.
+
+    A NEO is ranked by the best key of its OrbitPaths, so with unique the
+    heap holds one entry per NEO, updated when a better OrbitPath of a NEO
+    already in the heap is found.
+
+    :param orbits: iterable of OrbitPaths
+    :param number: int representing the number of results, None for all of
+    them
+    :param key: function of an OrbitPath to a number, smaller first
+    :param unique: bool representing if the results are the distinct NEOs
+    :return: list of OrbitPaths, or of NearEarthObjects if unique, in order
+    """
+    if number is None:
+        results = sorted(orbits, key=key)
+        if not unique:
+            return results
+        return list(dict.fromkeys(orbit.neo for orbit in results))
+
+    if number <= 0:
+        return []
+
+    if not unique:
+        return nsmallest(number, orbits, key=key)
+
+    # Max heap of the kept entries by (key, arrival), the worst on top
+    heap, entries = [], {}
+
+    for sequence, orbit in enumerate(orbits):
+        value = key(orbit)
+        # An orbit arriving later is worse than the worst entry of a full
+        # heap unless its key is smaller
+        if len(heap) == number and -value <= heap[0][0]:
+            continue
+
+        neo = orbit.neo
+        entry = entries.get(neo)
+
+        if entry is not None:
+            if -value > entry[0]:
+                heap[heap.index(entry)] = entries[neo] = \
+                    [-value, -sequence, neo]
+                heapify(heap)
+        elif len(heap) < number:
+            entries[neo] = [-value, -sequence, neo]
+            heappush(heap, entries[neo])
+        else:
+            entries[neo] = [-value, -sequence, neo]
+            del entries[heapreplace(heap, entries[neo])[2]]
+
+    return [neo for _, _, neo in sorted(heap, reverse=True)]
+
+
+def iter_index_order(index, descending=False):
+    """
+    Lazily finds the rows of a sorted index in the order of their values,
+    rows with equal values in row order
+
+    :param index: SortedIndex
+    :param descending: bool representing if the largest values come first
+    :return: iterator of rows
+    """
+    rows, values = index.rows, index.values
+
+    if not descending:
+        yield from rows
+        return
+
+    end = len(values)
+    while end > 0:
+        start = bisect_left(values, values[end - 1], 0, end)
+        yield from rows[start:end]
+        end = start
+
+
+def iter_index_sorted(columns, rows, start, end, filters):
+    """
+    Lazily finds the OrbitPaths in a slice of rows of an OrbitColumns that
+    pass every filter, in the order of a sorted index. The rows of the
+    index are read one block at a time, the rows outside the slice dropped
+    and the filters evaluated on the column values of the rest, so only the
+    OrbitPaths produced are read. Blocks start small and double up to
+    OrbitColumns.BLOCK_SIZE, as few rows are usually needed.
+
+    :param columns: OrbitColumns
+    :param rows: iterator of the rows in index order, as returned by
+    iter_index_order
+    :param start: int representing the first row
+    :param end: int representing one past the last row
+    :param filters: list of FilterExpression objects
+    :return: iterator of OrbitPaths
+    """
+    size = FIRST_BLOCK_SIZE
+
+    while True:
+        block = list(islice(rows, size))
+        if not block:
+            return
+        size = min(size * 2, OrbitColumns.BLOCK_SIZE)
+        block = [row for row in block if start <= row < end]
+        if filters:
+            block = columns.filter_rows(block, filters)
+        yield from map(columns.orbits.__getitem__, block)
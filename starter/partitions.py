@@ -0,0 +1,177 @@
+from collections import OrderedDict, namedtuple
+import csv
+import json
+import os
+
+from aggregate import GroupBy
+from store import OrbitStore
+
+
+class PartitionManifest(object):
+    """
+    Object representing a time-partitioned layout of a csv file of Near
+    Earth Object data: one csv file per year, month or day of close
+    approach, in a directory next to the csv file, with a small json
+    manifest recording the date range and number of rows of each partition.
+
+    The manifest is built by a single pass over the csv file, and rebuilt
+    when the csv file changes. A NEODatabase then loads only the partitions
+    overlapping the date range of each query.
+    """
+
+    # Bump whenever the layout of the partitions changes
+    VERSION = 1
+
+    MANIFEST = 'manifest.json'
+
+    # Number of partition files kept open at a time while building
+    OPEN_FILES = 64
+
+    Partition = namedtuple(
+        'Partition',
+        ['key', 'file', 'start_date', 'end_date', 'rows']
+        )
+
+    def __init__(self, path, manifest):
+        """
+        :param path: str representing the pathway of the partition directory
+        :param manifest: dict of the manifest
+        """
+        self.path = path
+        self.period = manifest['period']
+        self.source = manifest['source']
+        self.partitions = [PartitionManifest.Partition(**partition)
+                           for partition in manifest['partitions']]
+
+    @staticmethod
+    def default_path(filename):
+        """
+        :param filename: str representing the pathway of the source csv file
+        :return: str representing the default partition directory pathway
+        """
+        return f'{filename}.partitions'
+
+    @classmethod
+    def build(cls, path, filename, period=GroupBy.year.value):
+        """
+        Splits a csv file into one csv file per period and writes their
+        manifest, replacing any previous partitions
+
+        :param path: str representing the pathway of the partition directory
+        :param filename: str representing the pathway of the csv file
+        :param period: str representing the GroupBy period of a partition
+        :return: None
+        """
+        length = GroupBy(period).length
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith('.csv') or name == cls.MANIFEST:
+                os.remove(os.path.join(path, name))
+
+        # Least recently written partition files are closed first, and
+        # reopened for appending when written again
+        files, writers, partitions = OrderedDict(), {}, {}
+
+        try:
+            with open(filename, 'r', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None) or []
+                position = header.index('close_approach_date')
+
+                for row in filter(None, reader):
+                    approach_date = row[position]
+                    key = approach_date[:length]
+                    writer = writers.get(key)
+
+                    if writer is None:
+                        created = key not in partitions
+                        files[key] = open(os.path.join(path, f'{key}.csv'),
+                                          'w' if created else 'a',
+                                          newline='')
+                        writer = writers[key] = csv.writer(files[key])
+                        if created:
+                            writer.writerow(header)
+                            partitions[key] = {
+                                'key': key, 'file': f'{key}.csv', 'rows': 0,
+                                'start_date': approach_date,
+                                'end_date': approach_date}
+                        if len(files) > cls.OPEN_FILES:
+                            closed, partition_file = files.popitem(last=False)
+                            partition_file.close()
+                            del writers[closed]
+                    else:
+                        files.move_to_end(key)
+
+                    writer.writerow(row)
+                    partition = partitions[key]
+                    partition['rows'] += 1
+                    partition['start_date'] = min(partition['start_date'],
+                                                  approach_date)
+                    partition['end_date'] = max(partition['end_date'],
+                                                approach_date)
+        finally:
+            for partition_file in files.values():
+                partition_file.close()
+
+        manifest = {
+            'version': cls.VERSION,
+            'period': period,
+            'source': OrbitStore.source_key(filename),
+            'partitions': [partitions[key] for key in sorted(partitions)]
+        }
+        tmp_path = os.path.join(path, f'{cls.MANIFEST}.tmp')
+
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+        os.replace(tmp_path, os.path.join(path, cls.MANIFEST))
+
+    @classmethod
+    def open(cls, path, filename=None, period=None):
+        """
+        Reads the manifest of a partition directory
+
+        :param path: str representing the pathway of the partition directory
+        :param filename: optional str representing the pathway of the source
+        csv file, the partitions must have been built from its current
+        version if it exists
+        :param period: optional str representing the GroupBy period the
+        partitions must have
+        :return: PartitionManifest or None if the manifest is missing,
+        unreadable or stale
+        """
+        try:
+            with open(os.path.join(path, cls.MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(manifest, dict) or \
+                manifest.get('version') != cls.VERSION or \
+                (period and manifest.get('period') != period) or \
+                (filename and os.path.exists(filename) and
+                 manifest.get('source') != OrbitStore.source_key(filename)):
+            return None
+
+        return cls(path, manifest)
+
+    def get_file(self, partition):
+        """
+        :param partition: PartitionManifest.Partition
+        :return: str representing the pathway of the csv file of a partition
+        """
+        return os.path.join(self.path, partition.file)
+
+    def overlapping(self, start_date=None, end_date=None):
+        """
+        Finds the partitions with close approaches between two dates
+
+        :param start_date: optional str representing start date, unbounded
+        if None
+        :param end_date: optional str representing end date, unbounded if
+        None
+        :return: list of PartitionManifest.Partition in date order
+        """
+        return [partition for partition in self.partitions
+                if (start_date is None or partition.end_date >= start_date)
+                and (end_date is None or partition.start_date <= end_date)]
@@ -0,0 +1,564 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from operator import attrgetter, eq, ge, gt, le, lt
+
+from indexes import BitmapIndex, ChunkedBitmap, SortedIndex
+
+
+class ColumnStats(object):
+    """
+    Object holding the statistics of a numeric OrbitPath attribute: its
+    min and max, number of distinct values and an equi-depth histogram,
+    used to estimate the fraction of rows passing a filter.
+    """
+
+    # Number of buckets of the equi-depth histogram
+    BUCKETS = 64
+
+    def __init__(self, values):
+        """
+        :param values: iterable of the attribute values of every row
+        """
+        values = sorted(values)
+        self.count = len(values)
+        self.min = values[0] if values else None
+        self.max = values[-1] if values else None
+        self.distinct = sum(1 for previous, value in zip(values, values[1:])
+                            if previous != value) + bool(values)
+
+        # Bucket boundaries: the value at every 1/BUCKETS quantile
+        step = (self.count - 1) / ColumnStats.BUCKETS
+        self.bounds = [values[round(bucket * step)]
+                       for bucket in range(ColumnStats.BUCKETS + 1)] \
+            if values else []
+
+    def fraction_below(self, value, inclusive=False):
+        """
+        Estimates the fraction of rows below a value by interpolating within
+        the histogram bucket holding the value
+
+        :param value: float representing the value
+        :param inclusive: bool representing if rows equal to the value count
+        :return: float between 0 and 1
+        """
+        if not self.count:
+            return 0.0
+
+        if inclusive:
+            position = bisect_right(self.bounds, value)
+        else:
+            position = bisect_left(self.bounds, value)
+
+        if position == 0:
+            return 0.0
+        if position == len(self.bounds):
+            return 1.0
+
+        low, high = self.bounds[position - 1], self.bounds[position]
+        return (position - 1 + (value - low) / (high - low)) / \
+            ColumnStats.BUCKETS
+
+    def selectivity(self, operation, value):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :return: float representing the estimated fraction of rows passing
+        the filter
+        """
+        if operation is lt:
+            return self.fraction_below(value)
+        if operation is le:
+            return self.fraction_below(value, inclusive=True)
+        if operation is gt:
+            return 1.0 - self.fraction_below(value, inclusive=True)
+        if operation is ge:
+            return 1.0 - self.fraction_below(value)
+        if operation is eq:
+            if not self.count or not self.min <= value <= self.max:
+                return 0.0
+            return max(self.fraction_below(value, inclusive=True) -
+                       self.fraction_below(value), 1.0 / self.distinct)
+        return 1.0
+
+
+class FlagStats(object):
+    """
+    Object holding the statistics of a bool OrbitPath attribute, the share
+    of rows where it is True.
+    """
+
+    def __init__(self, values):
+        """
+        :param values: iterable of the attribute values of every row
+        """
+        self.count = 0
+        self.true = 0
+        for value in values:
+            self.count += 1
+            self.true += value
+
+    @property
+    def ratio(self):
+        """
+        :return: float representing the share of rows where the flag is True
+        """
+        return self.true / self.count if self.count else 0.0
+
+    def selectivity(self, operation, value):
+        """
+        :param operation: operator function of the filter
+        :param value: filter value
+        :return: float representing the estimated fraction of rows passing
+        the filter
+        """
+        try:
+            return sum(share for flag, share in ((True, self.ratio),
+                                                 (False, 1.0 - self.ratio))
+                       if operation(flag, value))
+        except TypeError:
+            return 1.0
+
+
+class TableStats(object):
+    """
+    Object holding the statistics of the orbit data of a NEODatabase: the
+    number of orbits per date, kept as running totals over the sorted dates
+    so the rows of any date range are counted with a binary search, and the
+    statistics of every filterable attribute, of the orbits or of the NEO
+    aggregates, collected the first time a filter on the attribute is
+    planned.
+
+    Orbits appended in date order are counted in place, while the
+    statistics of the attributes are kept until the orbits outgrow them by
+    STALE_FRACTION, as estimates need not be exact.
+    """
+
+    # Fraction of orbits appended after which the statistics are recollected
+    STALE_FRACTION = 0.1
+
+    # a dict of OrbitPath attribute to the type of its statistics
+    Columns = {
+        "miss_distance_km": ColumnStats,
+        "diameter_min_km": ColumnStats,
+        "is_hazardous": FlagStats
+    }
+
+    # a dict of NearEarthObject aggregate to the type of its statistics
+    NeoColumns = {
+        "closest_miss_km": ColumnStats,
+        "approach_count": ColumnStats,
+        "max_km_per_second": ColumnStats
+    }
+
+    def __init__(self, neo_date_db, date_index, neo_name_db=None):
+        """
+        :param neo_date_db: dict of date string to list of OrbitPaths
+        :param date_index: sorted list of the date strings in neo_date_db
+        :param neo_name_db: dict of NEO name to NearEarthObject, used for
+        the statistics of the NEO aggregates
+        """
+        self.neo_date_db = neo_date_db
+        self.neo_name_db = neo_name_db or {}
+        self.dates = list(date_index)
+        self.date_totals = array('l', accumulate(
+            (len(neo_date_db[approach_date]) for approach_date in self.dates),
+            initial=0))
+        self.collected = self.count
+        self.columns = {}
+
+    @property
+    def count(self):
+        """
+        :return: int representing the number of orbits
+        """
+        return self.date_totals[-1]
+
+    def count_rows(self, start_date, end_date):
+        """
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :return: int representing the number of orbits between the dates,
+        inclusive
+        """
+        start = bisect_left(self.dates, start_date)
+        end = bisect_right(self.dates, end_date)
+        return self.date_totals[end] - self.date_totals[start] \
+            if end > start else 0
+
+    def append(self, orbit):
+        """
+        Counts a single orbit added after all existing orbits, if it keeps
+        them in date order and the statistics are not stale
+
+        :param orbit: OrbitPath
+        :return: bool representing if the orbit was counted
+        """
+        approach_date = orbit.close_approach_date
+        if self.dates and approach_date < self.dates[-1] or \
+                self.count >= self.collected * (1 + TableStats.STALE_FRACTION):
+            return False
+
+        if not self.dates or approach_date != self.dates[-1]:
+            self.dates.append(approach_date)
+            self.date_totals.append(self.count)
+        self.date_totals[-1] += 1
+        return True
+
+    def get_column(self, attribute):
+        """
+        :param attribute: str representing the OrbitPath attribute or
+        NearEarthObject aggregate
+        :return: ColumnStats or FlagStats of the attribute, or None if it
+        has no statistics
+        """
+        if attribute not in self.columns:
+            stats_type = TableStats.Columns.get(attribute) or \
+                TableStats.NeoColumns.get(attribute)
+            if stats_type is None:
+                return None
+            self.columns[attribute] = stats_type(self.get_values(attribute))
+        return self.columns[attribute]
+
+    def get_values(self, attribute):
+        """
+        :param attribute: str representing the OrbitPath attribute or
+        NearEarthObject aggregate
+        :return: iterable of the values of the attribute for every orbit, or
+        for every NEO with orbits
+        """
+        if attribute in TableStats.Columns:
+            rows = chain.from_iterable(map(self.neo_date_db.__getitem__,
+                                           self.dates))
+        else:
+            rows = (neo for neo in self.neo_name_db.values() if neo.orbits)
+        return map(attrgetter(attribute), rows)
+
+    def selectivity(self, filter):
+        """
+        :param filter: Filter object
+        :return: float representing the estimated fraction of orbits, or
+        NEOs for a filter on NEO aggregates, passing the filter
+        """
+        stats = self.get_column(filter.attribute)
+        if stats is None:
+            return 1.0
+        return stats.selectivity(filter.operation, filter.value)
+
+
+class PlanStep(object):
+    """
+    Object representing a stage of a Plan, with the number of rows it is
+    estimated to produce and, once the plan is traced, the actual number.
+    """
+
+    def __init__(self, label, estimated):
+        """
+        :param label: str describing the stage
+        :param estimated: float representing the estimated rows produced
+        """
+        self.label = label
+        self.estimated = estimated
+        self.actual = None
+
+    def trace(self, results):
+        """
+        Counts the rows produced by the stage as they are consumed
+
+        :param results: iterable of the stage results
+        :return: iterator of the same results
+        """
+        self.actual = 0
+        return map(self.count, results)
+
+    def count(self, result):
+        """
+        :param result: row produced by the stage
+        :return: the same row
+        """
+        self.actual += 1
+        return result
+
+
+class Plan(object):
+    """
+    Object representing how a query is evaluated: the access path, the
+    filter evaluated through an index, or the filters evaluated through
+    bitmap indexes, if any, the remaining filters in
+    evaluation order, the filters on NEO aggregates, and the stages with
+    their estimated rows.
+    """
+
+    # Access paths
+    ROWS = 'date scan'
+    COLUMNS = 'column scan'
+    INDEX = 'index lookup'
+    SORTED = 'sorted index scan'
+    BITMAP = 'bitmap index'
+
+    def __init__(self, access, filters, index_filter=None):
+        """
+        :param access: str representing the access path
+        :param filters: list of the FilterExpression objects evaluated while
+        scanning, in evaluation order
+        :param index_filter: Filter object evaluated through an index
+        """
+        self.access = access
+        self.filters = filters
+        self.index_filter = index_filter
+        # FilterExpression objects evaluated through bitmap indexes
+        self.bitmap_filters = []
+        # FilterExpression objects on NEO aggregates, in evaluation order
+        self.neo_filters = []
+        self.steps = []
+
+    def add_step(self, label, estimated):
+        """
+        :param label: str describing the stage
+        :param estimated: float representing the estimated rows produced
+        :return: PlanStep
+        """
+        step = PlanStep(label, estimated)
+        self.steps.append(step)
+        return step
+
+    def describe(self):
+        """
+        :return: str representing the plan, one line per stage
+        """
+        lines = [f'Plan: {self.access}']
+
+        for step in self.steps:
+            actual = '-' if step.actual is None else step.actual
+            lines.append(f'  {step.label:<48} estimated '
+                         f'{step.estimated:>10.0f}  actual {actual:>10}')
+
+        return '\n'.join(lines)
+
+
+class QueryPlanner(object):
+    """
+    Object choosing how to evaluate a query from the statistics of a
+    NEODatabase.
+
+    Filters are ordered cheapest-first by their rank, (selectivity - 1) /
+    cost, so filters that drop many rows for little work run first. On a
+    columnar database with indexes, the most selective indexed filter is
+    evaluated through its index when reading its matches costs less than
+    scanning the date range, and the first results of a query sorted on an
+    indexed attribute are read in the order of its index when that is
+    expected to read fewer rows than scanning the date range. With bitmap
+    indexes, the filters are all evaluated as bitmaps when that costs less
+    than both.
+    """
+
+    # a dict of OrbitPath attribute to the relative cost of reading it from
+    # an OrbitPath, attributes of the NEO are read through the reference
+    Costs = {
+        "miss_distance_km": 1.0,
+        "diameter_min_km": 1.5,
+        "is_hazardous": 1.5
+    }
+
+    # Relative cost of reading a row matched by an index, which is gathered
+    # and sorted back in row order, against scanning a row
+    INDEX_COST = 4.0
+
+    # Relative cost of combining the bucket bitmaps of a filter, per row of
+    # the bitmap chunks read, against scanning a row
+    BITMAP_COST = 0.02
+
+    def __init__(self, db):
+        """
+        :param db: NEODatabase to plan queries against
+        """
+        self.db = db
+
+    def plan(self, start_date, end_date, filters, number, neo_filters=(),
+             unique=False):
+        """
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :param filters: iterable of FilterExpression objects on orbits
+        :param number: int representing the number of requested results,
+        None for all of them
+        :param neo_filters: iterable of FilterExpression objects on NEO
+        aggregates
+        :param unique: bool representing if the results are the distinct
+        NEOs of the orbits found
+        :return: Plan
+        """
+        stats = self.db.get_stats()
+        columns = self.db.get_columns()
+        rows = stats.count_rows(start_date, end_date)
+
+        selectivity = {filter: filter.selectivity(stats)
+                       for filter in filters}
+        filters = sorted(selectivity, key=lambda filter: (
+            (selectivity[filter] - 1) / QueryPlanner.cost(filter)))
+
+        index_filter, index_rows = self.choose_index(columns, filters, rows,
+                                                     stats.count)
+
+        scan_cost = rows * sum(map(QueryPlanner.cost, filters))
+        index_cost = scan_cost if index_filter is None else \
+            index_rows * stats.count / rows * QueryPlanner.INDEX_COST
+        bitmap_cost = QueryPlanner.bitmap_cost(columns, filters, rows,
+                                               stats.count)
+
+        if bitmap_cost is not None and bitmap_cost < index_cost:
+            plan = Plan(Plan.BITMAP, [])
+            plan.bitmap_filters = filters
+            estimated = rows
+            for filter in filters:
+                estimated *= selectivity[filter]
+            plan.add_step('bitmap index ' + ' and '.join(map(str, filters)),
+                          estimated)
+        elif index_filter is not None:
+            filters.remove(index_filter)
+            plan = Plan(Plan.INDEX, filters, index_filter)
+            estimated = plan.add_step(f'index lookup {index_filter}',
+                                      index_rows).estimated
+        elif columns is not None:
+            plan = Plan(Plan.COLUMNS, filters)
+            estimated = plan.add_step(
+                f'column scan {start_date}..{end_date}', rows).estimated
+        else:
+            plan = Plan(Plan.ROWS, filters)
+            estimated = plan.add_step(
+                f'date scan {start_date}..{end_date}', rows).estimated
+
+        for filter in plan.filters:
+            estimated *= selectivity[filter]
+            plan.add_step(f'filter {filter}', estimated)
+
+        if unique:
+            # Expected number of distinct NEOs among the orbits, if orbits
+            # are spread evenly over the NEOs
+            neos = len(self.db.neo_name_db)
+            if neos:
+                estimated = neos * (1.0 - (1.0 - 1.0 / neos) ** estimated)
+            plan.add_step('unique NEOs', estimated)
+
+        plan.neo_filters = sorted(neo_filters, key=lambda filter: (
+            filter.selectivity(stats)))
+        for filter in plan.neo_filters:
+            estimated *= filter.selectivity(stats)
+            plan.add_step(f'NEO filter {filter}', estimated)
+
+        if number is not None:
+            plan.add_step(f'limit {number}', min(number, estimated))
+
+        return plan
+
+    def plan_sorted(self, start_date, end_date, filters, number, attribute,
+                    neo_filters=()):
+        """
+        Plans reading the first results of a query sorted on an attribute in
+        the order of the sorted index of the attribute. The rows read are
+        estimated from the fraction of the rows of the database that are in
+        the date range and pass the filters.
+
+        :param start_date: str representing start date
+        :param end_date: str representing end date
+        :param filters: iterable of FilterExpression objects on orbits
+        :param number: int representing the number of requested results,
+        None for all of them
+        :param attribute: str representing the OrbitPath attribute sorted on
+        :param neo_filters: iterable of FilterExpression objects on NEO
+        aggregates
+        :return: Plan, or None if the attribute has no sorted index or
+        scanning the date range is expected to be cheaper
+        """
+        columns = self.db.get_columns()
+        if number is None or columns is None or \
+                not isinstance(columns.indexes.get(attribute), SortedIndex):
+            return None
+
+        stats = self.db.get_stats()
+        rows = stats.count_rows(start_date, end_date)
+        matches = rows
+        for filter in chain(filters, neo_filters):
+            matches *= filter.selectivity(stats)
+        if not matches:
+            return None
+
+        # Matches are assumed spread evenly over the index
+        estimated = min(stats.count, number * stats.count / matches)
+        if estimated * QueryPlanner.INDEX_COST >= rows:
+            return None
+
+        plan = Plan(Plan.SORTED, list(filters))
+        plan.neo_filters = list(neo_filters)
+        plan.add_step(f'sorted index scan {attribute}', estimated)
+        plan.add_step(f'limit {number}', number)
+        return plan
+
+    @staticmethod
+    def cost(filter):
+        """
+        :param filter: FilterExpression object
+        :return: float representing the relative cost of evaluating the
+        filter on a row, assuming every Filter in it is evaluated
+        """
+        return sum(QueryPlanner.Costs.get(atom.attribute, 1.0)
+                   for atom in filter.atoms())
+
+    @staticmethod
+    def bitmap_cost(columns, filters, rows, count):
+        """
+        Estimates the cost of evaluating filters through bitmap indexes: the
+        bucket bitmaps of every Filter are read over the chunks of rows
+        overlapping the date range, and about one bucket of the rows in the
+        date range is compared
+
+        :param columns: OrbitColumns or None
+        :param filters: list of FilterExpression objects
+        :param rows: int representing the number of rows in the date range
+        :param count: int representing the number of rows in the database
+        :return: float representing the relative cost, or None if the
+        filters cannot all be evaluated through bitmap indexes
+        """
+        if columns is None or not columns.bitmaps or not filters or \
+                not columns.has_bitmaps(filters):
+            return None
+
+        atoms = sum(1 for filter in filters for _ in filter.atoms())
+        chunk_rows = min(count, rows + ChunkedBitmap.CHUNK_ROWS)
+        return atoms * (chunk_rows * QueryPlanner.BITMAP_COST +
+                        rows / BitmapIndex.BUCKETS)
+
+    @staticmethod
+    def choose_index(columns, filters, rows, count):
+        """
+        Finds the indexed filter with the fewest matches, if reading them
+        costs less than scanning the date range. Every match of the index is
+        read, then the matches outside the date range are dropped.
+
+        :param columns: OrbitColumns or None
+        :param filters: list of FilterExpression objects, only single
+        Filters can use an index
+        :param rows: int representing the number of rows in the date range
+        :param count: int representing the number of rows in the database
+        :return: tuple of the Filter and its estimated matches in the date
+        range, or None and None
+        """
+        if columns is None or not columns.indexes or not count:
+            return None, None
+
+        best, best_matches = None, None
+
+        for filter in filters:
+            index = columns.indexes.get(filter.attribute)
+            if index is None:
+                continue
+            matches = index.count(filter.operation, filter.value)
+            if matches is not None and (best is None or
+                                        matches < best_matches):
+                best, best_matches = filter, matches
+
+        if best is None or best_matches * QueryPlanner.INDEX_COST >= rows:
+            return None, None
+
+        # Matches are assumed spread evenly over the dates
+        return best, best_matches * rows / count
@@ -0,0 +1,290 @@
+from contextlib import contextmanager, nullcontext
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak memory is not reported
+    resource = None
+
+
+class Stage(object):
+    """
+    Object holding the measurements of a stage of a run: its calls, wall
+    time excluding nested stages, wall and CPU time including them, rows
+    produced and consumed, and peak memory of the process at its end.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: str representing the stage
+        """
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.total = None
+        self.cpu = None
+        self.rows_in = None
+        self.rows_out = None
+        self.peak_memory = None
+        # Stage producing the rows this stage consumes, if traced
+        self.source = None
+
+    def to_dict(self):
+        """
+        :return: dict of the stage measurements, times in seconds and
+        memory in bytes
+        """
+        return {
+            'stage': self.name,
+            'calls': self.calls,
+            'wall_s': self.wall,
+            'total_s': self.total,
+            'cpu_s': self.cpu,
+            'rows_in': self.source.rows_out if self.source else self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_memory_bytes': self.peak_memory
+        }
+
+
+class Profiler(object):
+    """
+    Object instrumenting the stages of a run: loading, searching and
+    writing, and every step of the lazy search pipeline.
+
+    Coarse stages are timed with the stage() context manager, which records
+    wall and CPU time and peak memory, then calls the hooks. Pipeline steps
+    are timed with trace(), which wraps an iterator and records the time
+    spent producing its rows and their number. Self wall times exclude the
+    time spent in nested stages and steps, so they add up to the run time.
+
+    Components take an optional profiler and only instrument themselves when
+    one is given, so a run without a profiler is unchanged.
+    """
+
+    def __init__(self, hooks=()):
+        """
+        :param hooks: iterable of functions called with the Profiler and the
+        Stage whenever a coarse stage ends
+        """
+        self.stages = {}
+        self.counters = {}
+        self.hooks = list(hooks)
+        self.started = time.perf_counter()
+        # Start time and time spent in nested stages of the running stages
+        self.running = []
+        # Last step traced in the running stage
+        self.last_step = None
+
+    def add_hook(self, hook):
+        """
+        :param hook: function called with the Profiler and the Stage whenever
+        a coarse stage ends
+        :return: None
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        :param hook: function previously added
+        :return: None
+        """
+        self.hooks.remove(hook)
+
+    def get_stage(self, name):
+        """
+        :param name: str representing the stage
+        :return: Stage, created on first use
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        return stage
+
+    def count(self, name, value):
+        """
+        Records a counter, such as a number of objects
+
+        :param name: str representing the counter
+        :param value: int representing its value
+        :return: None
+        """
+        self.counters[name] = value
+
+    def enter(self):
+        """
+        Starts timing a stage or a step
+
+        :return: None
+        """
+        self.running.append([time.perf_counter(), 0.0])
+
+    def exit(self, stage):
+        """
+        Stops timing the last started stage or step, adding the time not
+        spent in nested ones to it
+
+        :param stage: Stage being timed
+        :return: float representing the elapsed seconds, including nested
+        stages and steps
+        """
+        start, nested = self.running.pop()
+        elapsed = time.perf_counter() - start
+        stage.wall += elapsed - nested
+        if self.running:
+            self.running[-1][1] += elapsed
+        return elapsed
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Times a coarse stage of the run, then calls the hooks. The steps
+        traced when the stage starts form a new pipeline.
+
+        :param name: str representing the stage
+        :param rows_in: optional int representing the rows the stage consumes
+        :return: context manager of the Stage
+        """
+        stage = self.get_stage(name)
+        stage.calls += 1
+        if rows_in is not None:
+            stage.rows_in = (stage.rows_in or 0) + rows_in
+        self.last_step = None
+        cpu = time.process_time()
+        self.enter()
+
+        try:
+            yield stage
+        finally:
+            stage.total = (stage.total or 0.0) + self.exit(stage)
+            stage.cpu = (stage.cpu or 0.0) + time.process_time() - cpu
+            stage.peak_memory = Profiler.peak_memory()
+            for hook in self.hooks:
+                hook(self, stage)
+
+    def trace(self, name, iterable, rows_in=None):
+        """
+        Times a step of a lazy pipeline, consuming the rows of the step
+        traced before it in the same stage
+
+        :param name: str representing the step
+        :param iterable: iterable of the rows the step produces
+        :param rows_in: optional int representing the rows the step consumes,
+        when it is the first step of its pipeline
+        :return: iterator of the same rows
+        """
+        stage = self.get_stage(name)
+        stage.calls += 1
+        stage.rows_out = stage.rows_out or 0
+        if rows_in is not None:
+            stage.rows_in = (stage.rows_in or 0) + rows_in
+        stage.source = self.last_step
+        self.last_step = stage
+        return self.iter_traced(stage, iter(iterable))
+
+    def iter_traced(self, stage, iterator):
+        """
+        :param stage: Stage of the step
+        :param iterator: iterator of the rows the step produces
+        :return: iterator of the same rows
+        """
+        enter, exit = self.enter, self.exit
+
+        while True:
+            enter()
+            try:
+                row = next(iterator)
+            except StopIteration:
+                exit(stage)
+                return
+            exit(stage)
+            stage.rows_out += 1
+            yield row
+
+    @staticmethod
+    def peak_memory():
+        """
+        :return: int representing the peak resident memory of the process in
+        bytes, or None if unknown
+        """
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports bytes, Linux and the BSDs kilobytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def summary(self):
+        """
+        :return: dict of the total time, counters and stage measurements
+        """
+        return {
+            'total_s': time.perf_counter() - self.started,
+            'peak_memory_bytes': Profiler.peak_memory(),
+            'counters': dict(self.counters),
+            'stages': [stage.to_dict() for stage in self.stages.values()]
+        }
+
+    def describe(self):
+        """
+        :return: str representing the summary as a table, one line per stage
+        """
+        summary = self.summary()
+        lines = [f'{"stage":<44} {"calls":>6} {"self ms":>10} '
+                 f'{"total ms":>10} {"cpu ms":>10} {"rows in":>10} '
+                 f'{"rows out":>10} {"peak MB":>9}']
+
+        for stage in summary['stages']:
+            cells = [stage['calls'], stage['wall_s'] * 1000,
+                     stage['total_s'] and stage['total_s'] * 1000,
+                     stage['cpu_s'] and stage['cpu_s'] * 1000,
+                     stage['rows_in'], stage['rows_out'],
+                     stage['peak_memory_bytes'] and
+                     stage['peak_memory_bytes'] / 2 ** 20]
+            lines.append(f'{stage["stage"][:44]:<44} ' + ' '.join(
+                f'{"-" if cell is None else format(cell, spec):>{width}}'
+                for cell, spec, width in zip(
+                    cells, ('d', '.2f', '.2f', '.2f', 'd', 'd', '.1f'),
+                    (6, 10, 10, 10, 10, 10, 9))))
+
+        lines.append(f'total {summary["total_s"] * 1000:.2f} ms, ' + ', '.join(
+            f'{name} {value}' for name, value in summary['counters'].items()))
+        return '\n'.join(lines)
+
+    def save(self, filename):
+        """
+        Writes the summary as a json trace
+
+        :param filename: str representing the output pathway
+        :return: None
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def profile_stage(profiler, name, rows_in=None):
+    """
+    :param profiler: optional Profiler
+    :param name: str representing the stage
+    :param rows_in: optional int representing the rows the stage consumes
+    :return: context manager timing the stage with the profiler, or doing
+    nothing without one
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, rows_in)
+
+
+def profile_trace(profiler, name, iterable, rows_in=None):
+    """
+    :param profiler: optional Profiler
+    :param name: str representing the step
+    :param iterable: iterable of the rows the step produces
+    :param rows_in: optional int representing the rows the step consumes
+    :return: iterable of the same rows, timed with the profiler or left
+    untouched without one
+    """
+    if profiler is None:
+        return iterable
+    return profiler.trace(name, iterable, rows_in)
@@ -0,0 +1,194 @@
+from array import array
+from itertools import accumulate, groupby
+import csv
+
+from columns import OrbitColumns
+from models import NearEarthObject, OrbitPath
+from store import OrbitStore
+
+
+class RowIndex(OrbitStore):
+    """
+    Object representing a sidecar index of a csv file of Near Earth Object
+    data, opened with mmap like an OrbitStore.
+
+    The index holds the byte offset of every csv row and only the columns
+    needed to search: the close approach date, the NEO name and the
+    filterable values, in the OrbitStore layout. It is built by a single
+    pass over the csv file without building any NearEarthObject or OrbitPath
+    instance, and is rebuilt when the csv file changes.
+
+    Searches run over the indexed columns, and the NearEarthObject and
+    OrbitPath instances of the results are built from the csv rows, read
+    by seeking to their offsets. The csv rows are assumed not to contain
+    quoted newlines, which holds for the Near Earth Object data.
+    """
+
+    MAGIC = b'NEOROWIX'
+
+    # Bump whenever the layout of the sections changes
+    VERSION = 1
+
+    # a dict of indexed orbit attribute to its csv column
+    KeyColumns = {
+        'close_approach_date': 'close_approach_date',
+        'name': 'name',
+        'miss_distance_km': 'miss_distance_kilometers',
+        'km_per_second': 'kilometers_per_second',
+        'diameter_min_km': 'estimated_diameter_min_kilometers',
+        'is_hazardous': 'is_potentially_hazardous_asteroid'
+    }
+
+    def __init__(self, buffer, directory, cache_size=None):
+        """
+        :param buffer: mmap of the index file
+        :param directory: dict of the index directory
+        :param cache_size: optional int representing the number of most
+        recently used NEOs kept built
+        """
+        super().__init__(buffer, directory, cache_size)
+        self.header = directory['header']
+        self.file = None
+
+    @staticmethod
+    def default_path(filename):
+        """
+        :param filename: str representing the pathway of the source csv file
+        :return: str representing the default index pathway for the file
+        """
+        return f'{filename}.rowindex'
+
+    @classmethod
+    def build(cls, path, filename):
+        """
+        Writes the index of a csv file, replacing any previous index
+        atomically
+
+        :param path: str representing the pathway of the index file
+        :param filename: str representing the pathway of the csv file
+        :return: None
+        """
+        offsets = array('q')
+        dates, neo_rows = [], array('i')
+        miss_distance, speed = array('d'), array('d')
+        diameter, hazardous = array('d'), array('b')
+        names, neos = [], {}
+
+        with open(filename, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8')]))
+            positions = [header.index(column)
+                         for column in cls.KeyColumns.values()]
+            lines = RowIndex.iter_lines(f, offsets)
+
+            for row in csv.reader(lines):
+                approach_date, name, *values = map(row.__getitem__, positions)
+                neo_row = neos.get(name)
+                if neo_row is None:
+                    neo_row = neos[name] = len(names)
+                    names.append(name)
+
+                dates.append(approach_date)
+                neo_rows.append(neo_row)
+                miss_distance.append(float(values[0]))
+                speed.append(float(values[1]))
+                diameter.append(float(values[2]))
+                hazardous.append(values[3] == 'True')
+
+        # Orbit records are in date order, csv order within a date
+        order = sorted(range(len(dates)), key=dates.__getitem__)
+        records = array('i', [0]) * len(order)
+        for record, row in enumerate(order):
+            records[row] = record
+
+        date_index = [approach_date for approach_date, _ in
+                      groupby(map(dates.__getitem__, order))]
+        counts = [sum(1 for _ in rows) for _, rows in
+                  groupby(map(dates.__getitem__, order))]
+
+        # Orbit records of each NEO in csv order
+        neo_orbits = [[] for _ in names]
+        for row, neo_row in enumerate(neo_rows):
+            neo_orbits[neo_row].append(records[row])
+
+        closest = array('d', (min(map(miss_distance.__getitem__, rows))
+                              for rows in neo_orbits))
+        fastest = array('d', (max(map(speed.__getitem__, rows))
+                              for rows in neo_orbits))
+
+        columns = {
+            'date.ordinal': array('q', map(OrbitColumns.to_ordinal,
+                                           date_index)),
+            'date.start': array('q', accumulate(counts, initial=0)),
+            'orbit.date_ordinal': array('q', (
+                ordinal for ordinal, count in zip(
+                    map(OrbitColumns.to_ordinal, date_index), counts)
+                for _ in range(count))),
+            'orbit.offset': array('q', map(offsets.__getitem__, order)),
+            'orbit.neo_row': array('i', map(neo_rows.__getitem__, order)),
+            'neo.orbit_start': array('q', accumulate(map(len, neo_orbits),
+                                                     initial=0)),
+            'neo.orbits': array('i', (record for rows in neo_orbits
+                                      for record in rows)),
+            'neo.closest_miss_km': closest,
+            'neo.max_km_per_second': fastest
+        }
+        for attribute, values in (('miss_distance_km', miss_distance),
+                                  ('km_per_second', speed),
+                                  ('diameter_min_km', diameter),
+                                  ('is_hazardous', hazardous)):
+            columns[f'orbit.{attribute}'] = array(
+                values.typecode, map(values.__getitem__, order))
+
+        cls.write(path, filename, len(names), len(dates), columns,
+                  {'neo.name': names}, header=header)
+
+    @staticmethod
+    def iter_lines(f, offsets):
+        """
+        Helper function to read the lines of a binary file, recording the
+        byte offset of each. Blank lines are skipped, as csv rows are, so
+        the offsets stay aligned with the rows read from the lines.
+
+        :param f: binary file positioned at the first line
+        :param offsets: array the offset of every line is appended to
+        :return: iterator of the decoded lines
+        """
+        offset = f.tell()
+
+        for line in f:
+            if line.strip(b'\r\n'):
+                offsets.append(offset)
+                yield line.decode('utf-8')
+            offset += len(line)
+
+    def read_row(self, record):
+        """
+        Reads the csv row of an orbit record
+
+        :param record: int representing the orbit record
+        :return: dict of csv column name to value
+        """
+        if self.file is None:
+            self.file = open(self.directory['source']['path'], 'rb')
+
+        self.file.seek(self.sections['orbit.offset'][record])
+        line = self.file.readline().decode('utf-8')
+        return dict(zip(self.header, next(csv.reader([line]))))
+
+    def read_neo(self, row):
+        """
+        Builds the NearEarthObject of a NEO record with all its orbits from
+        their csv rows
+
+        :param row: int representing the NEO record
+        :return: NearEarthObject
+        """
+        neo = None
+
+        for record in self.get_orbit_rows(row):
+            csv_row = self.read_row(record)
+            if neo is None:
+                neo = NearEarthObject(**csv_row)
+            neo.update_orbits(OrbitPath(neo=neo, **csv_row))
+
+        return neo
@@ -1,11 +1,19 @@
-from operator import eq, gt, lt, le, ge
+from abc import ABC, abstractmethod
+from operator import and_, attrgetter, eq, gt, lt, le, ge, not_, or_
 from datetime import datetime as dt
 
 from collections import namedtuple
+from functools import reduce
+from itertools import chain, islice, repeat
 from enum import Enum
+import re
 
+from aggregate import Aggregator, GroupBy
 from exceptions import UnsupportedFeature
 from models import NearEarthObject, OrbitPath
+from ordering import SortBy, iter_index_order, iter_index_sorted, top_k
+from planner import Plan, QueryPlanner
+from profiler import profile_stage, profile_trace
 
 
 class DateSearch(Enum):
@@ -28,11 +36,18 @@ class Query(object):
     Object representing the desired search query operation to build.
     The Query uses the Selectors to structure the query information into
     a format the NEOSearcher can use for date search.
+
+    With group_by, the query is an aggregation: the approaches found are
+    summarized by day, month or year, and with by_hazard by hazard flag.
+    With sort_by, the first results are those with the smallest, or with
+    descending the largest, miss distance, diameter, speed or date.
     """
 
     Selectors = namedtuple(
         'Selectors',
-        ['date_search', 'number', 'filters', 'return_object']
+        ['date_search', 'number', 'filters', 'return_object', 'group_by',
+         'by_hazard', 'sort_by', 'descending'],
+        defaults=(None, False, None, False)
         )
     DateSearch = namedtuple(
         'DateSearch',
@@ -51,6 +66,10 @@ class Query(object):
         self.number = kwargs.get("number", 0)
         self.filters = kwargs.get("filter", None)
         self.return_object = kwargs.get("return_object", "NEO")
+        self.group_by = kwargs.get("group_by", None)
+        self.by_hazard = kwargs.get("by_hazard", False)
+        self.sort_by = kwargs.get("sort_by", None)
+        self.descending = kwargs.get("descending", False)
         self.date_search = {}
 
     def build_query(self):
@@ -65,6 +84,17 @@ class Query(object):
         if self.return_object not in self.ReturnObjects:
             raise UnsupportedFeature
 
+        if self.group_by and self.group_by not in GroupBy.list():
+            raise UnsupportedFeature
+
+        if self.sort_by and (self.sort_by not in SortBy.list() or
+                             self.group_by):
+            raise UnsupportedFeature
+
+        if self.number is not None and (not isinstance(self.number, int) or
+                                        self.number < 0):
+            raise UnsupportedFeature
+
         if self.date:
             self.date_search["type"] = DateSearch.equals.value
             self.date_search["date"] = self.date
@@ -84,17 +114,157 @@ class Query(object):
             self.date_search,
             self.number,
             self.filters,
-            self.return_object
+            self.return_object,
+            self.group_by or None,
+            bool(self.by_hazard),
+            self.sort_by or None,
+            bool(self.descending)
             )
 
         return query
 
 
-class Filter(object):
+class FilterExpression(ABC):
+    """
+    Base of the filter expressions: a single Filter, or the FilterAnd,
+    FilterOr and FilterNot combinations of other expressions.
+
+    An expression is evaluated in one of four ways:
+    - compiled, with the other filters of a query, into a single predicate
+    function over OrbitPaths, so each candidate is tested in one call
+    - as a mask over the column values of OrbitColumns rows
+    - as a bitmap of OrbitColumns rows, combined from the bitmap indexes
+    - stage by stage with stream, to count the rows passing each filter
+    """
+
+    # OrbitPath attribute an index on could evaluate the expression,
+    # only set for a single Filter
+    attribute = None
+
+    @abstractmethod
+    def atoms(self):
+        """
+        :return: iterator of the Filter objects in the expression
+        """
+
+    @abstractmethod
+    def predicate(self):
+        """
+        :return: function of a result, OrbitPath or NearEarthObject, to
+        bool, true for the results passing the expression
+        """
+
+    @abstractmethod
+    def mask(self, get_values):
+        """
+        :param get_values: function of an OrbitPath attribute name to the
+        iterable of its values for the candidate rows
+        :return: iterator of bools, one per candidate row
+        """
+
+    @abstractmethod
+    def bitmap(self, get_bitmap, rows):
+        """
+        :param get_bitmap: function of a Filter to the int bitmap of the
+        candidate rows passing it
+        :param rows: int bitmap of the candidate rows
+        :return: int bitmap of the candidate rows passing the expression
+        """
+
+    @abstractmethod
+    def selectivity(self, stats):
+        """
+        :param stats: TableStats of the database
+        :return: float representing the estimated fraction of orbits passing
+        the expression, assuming the filters are independent
+        """
+
+    @abstractmethod
+    def key(self):
+        """
+        :return: hashable canonical form of the expression
+        """
+
+    @staticmethod
+    def all_of(predicates):
+        """
+        Composes predicates into one, true when all of them are. The
+        predicates are tested in order and stop at the first one failing.
+
+        :param predicates: list of functions of a result to bool
+        :return: function of a result to bool
+        """
+        if not predicates:
+            return lambda result: True
+
+        def both(first, second):
+            return lambda result: first(result) and second(result)
+
+        return reduce(both, predicates)
+
+    @staticmethod
+    def any_of(predicates):
+        """
+        Composes predicates into one, true when any of them is. The
+        predicates are tested in order and stop at the first one passing.
+
+        :param predicates: list of functions of a result to bool
+        :return: function of a result to bool
+        """
+        def either(first, second):
+            return lambda result: first(result) or second(result)
+
+        return reduce(either, predicates)
+
+    @staticmethod
+    def compile(filters):
+        """
+        Compiles filters into a single predicate function, true for the
+        results passing all of them. The filters are tested in order and
+        stop at the first one failing.
+
+        :param filters: list of FilterExpression objects
+        :return: function of a result to bool
+        """
+        return FilterExpression.all_of([filter.predicate()
+                                        for filter in filters])
+
+    @staticmethod
+    def select(filters, results):
+        """
+        Lazily applies filters onto a stream of results in a single pass,
+        with their compiled predicate
+
+        :param filters: list of FilterExpression objects
+        :param results: iterable of OrbitPath results
+        :return: iterator of the results passing every filter
+        """
+        return filter(FilterExpression.compile(filters), results)
+
+    def stream(self, results):
+        """
+        Function that lazily applies the expression onto a stream of results
+
+        :param results: iterable of OrbitPath results
+        :return: iterator of the results passing the expression
+        """
+        return FilterExpression.select([self], results)
+
+
+class Filter(FilterExpression):
     """
     Object representing optional filter options to be used in the date search
     for Near Earth Objects. Each filter is one of Filter.Operators provided
     with a field to filter on a value.
+
+    Filters are written as field:operation:value, or field:between:low:high
+    for an inclusive range, and combined with and, or, not and parentheses
+    into a filter expression, e.g.
+    "distance:between:50000:900000 and (is_hazardous:=:True or diameter:>:1)"
+
+    Filters on Filter.NeoOptions, e.g. closest_distance:<:50000, test the
+    aggregates of a NearEarthObject over all its orbits instead of a single
+    orbit.
     """
 
     # a dict of filter name to equivalent properties of NearEarthObjects
@@ -105,6 +275,14 @@ class Filter(object):
         "distance": "miss_distance_km"
     }
 
+    # a dict of filter name to aggregates of NearEarthObjects over all their
+    # orbits, filtered on per NEO rather than per orbit
+    NeoOptions = {
+        "closest_distance": "closest_miss_km",
+        "approaches": "approach_count",
+        "max_speed": "max_km_per_second"
+    }
+
     # a dict of operator symbol to an Operators method
     Operators = {
         "=": eq,
@@ -126,60 +304,154 @@ class Filter(object):
         self.operation = operation
         self.value = value
 
+    @property
+    def attribute(self):
+        """
+        :return: str representing the OrbitPath or NearEarthObject attribute
+        filtered on
+        """
+        return Filter.Options.get(self.field) or \
+            Filter.NeoOptions[self.field]
+
+    @property
+    def symbol(self):
+        """
+        :return: str representing the operator symbol of the filter
+        """
+        return next(symbol for symbol, function in Filter.Operators.items()
+                    if function is self.operation)
+
+    def __str__(self):
+        return f'{self.field} {self.symbol} {self.value}'
+
+    def atoms(self):
+        yield self
+
+    def predicate(self):
+        get_value = attrgetter(self.attribute)
+        operation, value = self.operation, self.value
+        return lambda result: operation(get_value(result), value)
+
+    def mask(self, get_values):
+        values = get_values(self.attribute)
+        return map(self.operation, values, repeat(self.value))
+
+    def bitmap(self, get_bitmap, rows):
+        return get_bitmap(self)
+
+    def selectivity(self, stats):
+        return stats.selectivity(self)
+
+    def key(self):
+        return self.field, self.symbol, repr(self.value)
+
     @staticmethod
     def create_filter_options(filter_options):
         """
         Class function that transforms filter options raw input into filters
 
-        :param input: list in format:
+        :param input: list of filter expressions, e.g.
         ["filter_option:operation:value_of_option", ...]
 
-        :return: dict of filter names to Filter objects
+        :return: list of FilterExpression objects, all of which must pass.
+        Ranges and expressions joined by and at the top level are split into
+        separate filters, so they can be ordered and indexed on their own.
         """
 
         # TODO: return a defaultdict of filters with key of NearEarthObject
         # or OrbitPath and value of empty list or list of Filters
 
-        filters = {}
+        filters = []
 
         for filter_option in filter_options:
-            params = filter_option.split(":")
+            expression = FilterParser(filter_option).parse()
+            if isinstance(expression, FilterAnd):
+                filters.extend(expression.terms)
+            else:
+                filters.append(expression)
 
-            if len(params) != 3:
-                print("Malformed filter parameters.")
+        return filters
+
+    @staticmethod
+    def split_levels(filters):
+        """
+        Separates the filters on orbits from the filters on NEO aggregates
+
+        :param filters: list of FilterExpression objects
+        :return: tuple of the list of orbit filters and the list of NEO
+        filters
+        """
+        orbit_filters, neo_filters = [], []
+
+        for filter in filters:
+            levels = {atom.field in Filter.NeoOptions
+                      for atom in filter.atoms()}
+            if len(levels) > 1:
+                print("Filter expressions cannot mix NEO and orbit fields.")
                 raise UnsupportedFeature
+            (neo_filters if True in levels else orbit_filters).append(filter)
 
-            filter_name = params[0]
-            operator = params[1]
-            value = params[2]
+        return orbit_filters, neo_filters
 
-            if filter_name in Filter.Options:
+    @staticmethod
+    def create_filter(filter_option):
+        """
+        Transforms a single field:operation:value filter into a Filter, or a
+        field:between:low:high range into a FilterAnd of two Filters
 
-                value = Filter.convert_value_type(value, filter_name)
-                operator_function = Filter.Operators.get(operator, None)
+        :param filter_option: str representing the filter
+        :return: Filter or FilterAnd
+        """
+        params = filter_option.split(":")
 
-                if operator_function is None:
-                    print("Filter operator not found.")
-                    raise UnsupportedFeature
+        if len(params) == 4 and params[1] == "between":
+            filter_name, _, low, high = params
+            return FilterAnd([
+                Filter.create_filter(f'{filter_name}:>=:{low}'),
+                Filter.create_filter(f'{filter_name}:<=:{high}')
+            ])
 
-                filters[Filter.Options[filter_name]] = \
-                    Filter(filter_name, None, operator_function, value)
+        if len(params) != 3:
+            print("Malformed filter parameters.")
+            raise UnsupportedFeature
 
-            else:
-                print("Filter name not found.")
-                raise UnsupportedFeature
+        filter_name = params[0]
+        operator = params[1]
+        value = params[2]
 
-        return filters
+        if filter_name not in Filter.Options and \
+                filter_name not in Filter.NeoOptions:
+            print("Filter name not found.")
+            raise UnsupportedFeature
+
+        value = Filter.convert_value_type(value, filter_name)
+        operator_function = Filter.Operators.get(operator, None)
+
+        if operator_function is None:
+            print("Filter operator not found.")
+            raise UnsupportedFeature
+
+        return Filter(filter_name, None, operator_function, value)
 
     @staticmethod
     def convert_value_type(value, filter_name):
-        if filter_name != "is_hazardous":
+        """
+        :param value: str representing the filter value
+        :param filter_name: str representing the field filtered on
+        :return: bool for is_hazardous, float otherwise
+        """
+        if filter_name == "is_hazardous":
             try:
-                value = float(value)
-            except:
-                print("value is not a number")
+                return {"true": True, "false": False}[value.lower()]
+            except KeyError:
+                print("value is not True or False")
+                raise UnsupportedFeature
 
-        return value
+        try:
+            return float(value)
+        except ValueError:
+            print("value is not a number")
+            raise UnsupportedFeature
 
     def apply(self, results):
         """
@@ -194,13 +466,211 @@ class Filter(object):
 
         for result in results:
             self.object = result
-            if self.operation(getattr(self.object, Filter.Options[self.field]),
+            if self.operation(getattr(self.object, self.attribute),
                               self.value):
                 filtered_results.append(result)
 
         return filtered_results
 
 
+class FilterAnd(FilterExpression):
+    """
+    Object representing filter expressions that must all pass.
+    """
+
+    def __init__(self, terms):
+        """
+        :param terms: list of FilterExpression objects
+        """
+        self.terms = terms
+
+    def __str__(self):
+        return '(' + ' and '.join(map(str, self.terms)) + ')'
+
+    def atoms(self):
+        return chain.from_iterable(term.atoms() for term in self.terms)
+
+    def predicate(self):
+        return FilterExpression.all_of([term.predicate()
+                                        for term in self.terms])
+
+    def mask(self, get_values):
+        return reduce(lambda mask, term: map(and_, mask,
+                                             term.mask(get_values)),
+                      self.terms[1:], self.terms[0].mask(get_values))
+
+    def bitmap(self, get_bitmap, rows):
+        return reduce(and_, (term.bitmap(get_bitmap, rows)
+                             for term in self.terms))
+
+    def selectivity(self, stats):
+        selectivity = 1.0
+        for term in self.terms:
+            selectivity *= term.selectivity(stats)
+        return selectivity
+
+    def key(self):
+        return 'and', tuple(sorted(term.key() for term in self.terms))
+
+
+class FilterOr(FilterExpression):
+    """
+    Object representing filter expressions of which at least one must pass.
+    """
+
+    def __init__(self, terms):
+        """
+        :param terms: list of FilterExpression objects
+        """
+        self.terms = terms
+
+    def __str__(self):
+        return '(' + ' or '.join(map(str, self.terms)) + ')'
+
+    def atoms(self):
+        return chain.from_iterable(term.atoms() for term in self.terms)
+
+    def predicate(self):
+        return FilterExpression.any_of([term.predicate()
+                                        for term in self.terms])
+
+    def mask(self, get_values):
+        return reduce(lambda mask, term: map(or_, mask,
+                                             term.mask(get_values)),
+                      self.terms[1:], self.terms[0].mask(get_values))
+
+    def bitmap(self, get_bitmap, rows):
+        return reduce(or_, (term.bitmap(get_bitmap, rows)
+                            for term in self.terms))
+
+    def selectivity(self, stats):
+        rejected = 1.0
+        for term in self.terms:
+            rejected *= 1.0 - term.selectivity(stats)
+        return 1.0 - rejected
+
+    def key(self):
+        return 'or', tuple(sorted(term.key() for term in self.terms))
+
+
+class FilterNot(FilterExpression):
+    """
+    Object representing a filter expression that must not pass.
+    """
+
+    def __init__(self, term):
+        """
+        :param term: FilterExpression object
+        """
+        self.term = term
+
+    def __str__(self):
+        return f'not {self.term}'
+
+    def atoms(self):
+        return self.term.atoms()
+
+    def predicate(self):
+        predicate = self.term.predicate()
+        return lambda result: not predicate(result)
+
+    def mask(self, get_values):
+        return map(not_, self.term.mask(get_values))
+
+    def bitmap(self, get_bitmap, rows):
+        return rows & ~self.term.bitmap(get_bitmap, rows)
+
+    def selectivity(self, stats):
+        return 1.0 - self.term.selectivity(stats)
+
+    def key(self):
+        return 'not', self.term.key()
+
+
+class FilterParser(object):
+    """
+    Object parsing a filter expression with the grammar:
+
+    expression := term ('or' term)*
+    term       := factor ('and' factor)*
+    factor     := 'not' factor | '(' expression ')' | filter
+    filter     := field:operation:value | field:between:low:high
+    """
+
+    def __init__(self, text):
+        """
+        :param text: str representing the filter expression
+        """
+        self.tokens = re.findall(r'\(|\)|[^\s()]+', text)
+        self.position = 0
+
+    def peek(self):
+        """
+        :return: str representing the next token, lowercased if a keyword,
+        or None at the end of the expression
+        """
+        if self.position == len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        return token.lower() if token.lower() in ('and', 'or', 'not') \
+            else token
+
+    def take(self):
+        """
+        :return: str representing the next token, which is consumed
+        """
+        token = self.peek()
+        if token is None:
+            print("Malformed filter parameters.")
+            raise UnsupportedFeature
+        self.position += 1
+        return token
+
+    def parse(self):
+        """
+        :return: FilterExpression of the whole text
+        """
+        expression = self.parse_expression()
+        if self.peek() is not None:
+            print("Malformed filter parameters.")
+            raise UnsupportedFeature
+        return expression
+
+    def parse_expression(self):
+        terms = [self.parse_term()]
+        while self.peek() == 'or':
+            self.take()
+            terms.append(self.parse_term())
+        return terms[0] if len(terms) == 1 else FilterOr(terms)
+
+    def parse_term(self):
+        factors = [self.parse_factor()]
+        while self.peek() == 'and':
+            self.take()
+            factors.append(self.parse_factor())
+        if len(factors) == 1:
+            return factors[0]
+        # Ranges are flattened into the conjunction they appear in
+        return FilterAnd(list(chain.from_iterable(
+            factor.terms if isinstance(factor, FilterAnd) else [factor]
+            for factor in factors)))
+
+    def parse_factor(self):
+        token = self.take()
+        if token == 'not':
+            return FilterNot(self.parse_factor())
+        if token == '(':
+            expression = self.parse_expression()
+            if self.take() != ')':
+                print("Malformed filter parameters.")
+                raise UnsupportedFeature
+            return expression
+        if token in (')', 'and', 'or'):
+            print("Malformed filter parameters.")
+            raise UnsupportedFeature
+        return Filter.create_filter(token)
+
+
 class NEOSearcher(object):
     """
     Object with date search functionality on Near Earth Objects
@@ -208,12 +678,20 @@ class NEOSearcher(object):
     the query specifications, determines how to perform the search.
     """
 
-    def __init__(self, db):
+    def __init__(self, db, cache=None, explain=False, profiler=None):
         """
         :param db: NEODatabase holding the NearEarthObject instances
         and their OrbitPath instances
+        :param cache: optional ResultCache used to memoize query results
+        :param explain: bool representing if the rows produced by each stage
+        of the query plan are counted, bypassing the cache
+        :param profiler: optional Profiler timing each stage of the search
         """
         self.db = db
+        self.cache = cache
+        self.planner = QueryPlanner(db)
+        self.explain = explain
+        self.profiler = profiler
         # TODO: What kind of an instance variable can we use to connect
         # DateSearch to how we do search?
         self.date_search_type = DateSearch.list()
@@ -228,83 +706,477 @@ class NEOSearcher(object):
         objects in the query.return_object
         specified.
 
+        The search holds the database for reading, see
+        NEODatabase.reading, so it is safe while other threads ingest.
+
         :param query: Query.Selectors object with query information
-        :return: Dataset of NearEarthObjects or OrbitalPaths
+        :return: Dataset of NearEarthObjects or OrbitalPaths, or of Summaries
+        for an aggregation query
         """
-        # TODO: This is a generic method that will need to understand,
-        # using DateSearch, how to implement search
-        # TODO: Write instance methods that get_objects can use to implement
-        # the two types of DateSearch your project
-        # TODO: needs to support that then your filters can be applied to.
-        # Remember to return the number specified in
-        # TODO: the Query.Selectors as well as in the return_type
-        # from Query.Selectors
+        with self.db.reading():
+            results = list(self.iter_objects(query))
 
-        results = []
+        if len(results) == 0:
+            print("NO MATCHES FOUND")
+
+        return results
+
+    def iter_objects(self, query):
+        """
+        Lazy search interface behind get_objects. The search runs as a
+        pipeline of iterators: dates, then their orbits, then each filter,
+        then, when query.return_object is NEO, the projection to the
+        distinct NEOs in the order they are found, then the filters on NEO
+        aggregates, then the requested number. Nothing is evaluated until
+        the results are consumed, and consuming stops as soon as the
+        requested number of results is produced.
+
+        The QueryPlanner orders the filters cheapest-first. When the database
+        is columnar, the filters are evaluated as masks over blocks of the
+        date range slice of its OrbitColumns instead, or, when the planner
+        finds a selective indexed filter, on the rows matched by its index,
+        or, with bitmap indexes, as bitmaps whose set rows are the only ones
+        read. iter_planned returns the plan along with the results.
+
+        With a cache, results are looked up by the canonical form of the
+        query first, and a miss is evaluated in full and cached.
+
+        With a profiler, every filter is evaluated as a stage of its own, as
+        when explaining, so each stage is timed separately.
+
+        An aggregation query is answered by aggregate instead, and a sorted
+        query by sort.
+
+        While other threads write to the database, the results must be
+        consumed within NEODatabase.reading, as get_objects does.
+
+        :param query: Query.Selectors object with query information
+        :return: iterator of NearEarthObjects or OrbitalPaths, or of
+        Summaries for an aggregation query
+        """
+        return self.iter_planned(query)[1]
+
+    def iter_planned(self, query):
+        """
+        Lazy search interface returning the plan of the search along with
+        its results, see iter_objects. The plan is built for each search
+        rather than kept on the searcher, so searches from several threads
+        do not share it. When explaining, its actual rows are counted as
+        the results are consumed.
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan, or None for results served from the
+        cache or merged from the daily summaries, and the iterator of
+        results
+        """
+        if self.cache is None or self.explain:
+            with profile_stage(self.profiler, 'search: plan'):
+                return self.search(query)
+
+        with profile_stage(self.profiler, 'search: cache'):
+            key = NEOSearcher.get_cache_key(query)
+            results = self.cache.get(key, query.number, self.db.version)
+            if results is None:
+                plan, results = self.search(query)
+                results = list(results)
+                self.cache.put(key, query.number, self.db.version, results)
+                return plan, iter(results)
+
+        return None, iter(results)
+
+    def search(self, query):
+        """
+        Builds the lazy search pipeline for a query, see iter_objects
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan and the iterator of NearEarthObjects or
+        OrbitalPaths
+        """
+        if query.group_by:
+            plan, results = self.aggregate(query)
+            return plan, iter(results)
+        if query.sort_by:
+            plan, results = self.sort(query)
+            return plan, iter(results)
+
+        start_date, end_date = self.get_date_range(query)
+        query_db = self.db.neo_date_db
+        query_number = query.number
+
+        filters = []
+        if query.filters:
+            filters = Filter.create_filter_options(query.filters)
+        filters, neo_filters = Filter.split_levels(filters)
+        unique = query.return_object == 'NEO'
+
+        plan = self.planner.plan(start_date, end_date, filters, query_number,
+                                 neo_filters=neo_filters, unique=unique)
+        trace = self.trace
+        staged = self.explain or self.profiler is not None
+
+        if plan.access == Plan.ROWS:
+            date_list = NEOSearcher.get_date_list(self.db,
+                                                  start_date,
+                                                  end_date)
+            results = trace(plan.steps[0],
+                            NEOSearcher.iter_results(query_db, date_list),
+                            name=plan.access)
+
+            if staged:
+                for step, filter in zip(plan.steps[1:], plan.filters):
+                    results = trace(step, filter.stream(results))
+            elif plan.filters:
+                results = FilterExpression.select(plan.filters, results)
+
+        else:
+            columns = self.db.get_columns()
+            start, end = columns.get_rows(start_date, end_date)
+
+            if plan.access == Plan.INDEX:
+                results = profile_trace(
+                    self.profiler, f'search: {plan.access} and filters',
+                    self.iter_indexed(columns, start, end, plan))
+            elif plan.access == Plan.BITMAP:
+                with profile_stage(self.profiler, f'search: {plan.access}'):
+                    bitmap = columns.bitmap(start, end, plan.bitmap_filters)
+                if self.explain:
+                    plan.steps[0].actual = bitmap.bit_count()
+                results = profile_trace(
+                    self.profiler, 'search: read rows',
+                    columns.iter_bitmap(bitmap, start, end))
+            else:
+                if self.explain:
+                    plan.steps[0].actual = end - start
+                results = columns.iter_select(start, end, plan.filters)
+                if self.explain and plan.filters:
+                    # The filters are evaluated together, only the rows
+                    # passing all of them are counted
+                    results = plan.steps[len(plan.filters)].trace(results)
+                results = profile_trace(
+                    self.profiler, f'search: {plan.access} and filters',
+                    results, end - start)
+
+        steps = iter(plan.steps[1 + len(plan.filters):])
+
+        if unique:
+            results = trace(next(steps), NEOSearcher.iter_unique(
+                map(attrgetter('neo'), results)))
+
+        if plan.neo_filters:
+            if staged:
+                for step, filter in zip(steps, plan.neo_filters):
+                    results = trace(step, NEOSearcher.iter_neo_filtered(
+                        [filter], results, unique))
+            else:
+                results = NEOSearcher.iter_neo_filtered(plan.neo_filters,
+                                                        results, unique)
+
+        results = islice(results, query_number)
+        if query_number is not None:
+            results = trace(plan.steps[-1], results, name='limit')
+
+        return plan, results
+
+    def count(self, query):
+        """
+        Counts the results of a query, ignoring query.number.
+
+        Orbit results filtered on orbit attributes only are counted over the
+        columnar copy when the database is columnar: through the bitmap
+        indexes when the QueryPlanner chooses them, as the number of bits
+        set, or over the column values otherwise, so no OrbitPath is read.
+        Other queries are counted as their results are streamed.
+
+        :param query: Query.Selectors object with query information
+        :return: int representing the number of results
+        """
+        return self.count_planned(query)[1]
 
+    def count_planned(self, query):
+        """
+        Counts the results of a query, see count, returning the plan of the
+        count along with it
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan, or None, and the int representing the
+        number of results
+        """
+        with self.db.reading():
+            return self.count_results(query)
+
+    def count_results(self, query):
+        """
+        Counts the results of a query, see count
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan, or None, and the int representing the
+        number of results
+        """
+        filters = Filter.create_filter_options(query.filters or [])
+        filters, neo_filters = Filter.split_levels(filters)
+
+        if query.return_object == 'Path' and not neo_filters and \
+                not query.group_by:
+            start_date, end_date = self.get_date_range(query)
+            columns = self.db.get_columns()
+            plan = self.planner.plan(start_date, end_date, filters, None)
+
+            if columns is not None and plan.access != Plan.INDEX:
+                start, end = columns.get_rows(start_date, end_date)
+                with profile_stage(self.profiler, 'search: count'):
+                    if plan.access == Plan.BITMAP:
+                        count = columns.bitmap(
+                            start, end, plan.bitmap_filters).bit_count()
+                    else:
+                        count = columns.count(start, end, plan.filters)
+                if self.explain:
+                    plan.steps[-1].actual = count
+                return plan, count
+
+        plan, results = self.iter_planned(
+            query._replace(number=None, sort_by=None))
+        return plan, sum(1 for _ in results)
+
+    def aggregate(self, query):
+        """
+        Answers an aggregation query with the Summaries of the approaches of
+        each period of query.group_by, and of each hazard flag with
+        query.by_hazard, in period order.
+
+        Without filters, the Summaries are merged from the daily summaries
+        of the database, collected once, so no OrbitPath is read. With
+        filters, the orbits passing them are streamed from the search
+        pipeline and added to their group in a single pass.
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan of the orbit search, or None without
+        filters, and the list of Summaries, up to query.number of them
+        """
+        aggregator = Aggregator(query.group_by, query.by_hazard)
+        plan = None
+
+        if query.filters:
+            plan, orbits = self.search(query._replace(
+                number=None, return_object='Path', group_by=None))
+            with profile_stage(self.profiler, 'search: aggregate'):
+                aggregator.add_orbits(orbits)
+        else:
+            start_date, end_date = self.get_date_range(query)
+            summaries = self.db.get_summaries()
+            with profile_stage(self.profiler, 'search: aggregate'):
+                aggregator.add_days(summaries,
+                                    self.db.get_dates(start_date, end_date))
+
+        return plan, list(islice(aggregator.results(), query.number))
+
+    def sort(self, query):
+        """
+        Answers a query sorted on query.sort_by with its first query.number
+        results, the distinct NEOs of the sorted orbits when
+        query.return_object is NEO, each ranked by its best orbit.
+
+        When the QueryPlanner finds reading the sorted index of the
+        attribute cheaper, the orbits are read in index order and the first
+        ones passing the filters are returned. Otherwise the orbits passing
+        the filters are streamed from the search pipeline through a bounded
+        heap of query.number results, so only those are kept in memory.
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the Plan and the list of NearEarthObjects or
+        OrbitalPaths in sorted order
+        """
+        sort_by = SortBy(query.sort_by)
+        unique = query.return_object == 'NEO'
+        start_date, end_date = self.get_date_range(query)
+
+        filters = Filter.create_filter_options(query.filters or [])
+        filters, neo_filters = Filter.split_levels(filters)
+
+        plan = self.planner.plan_sorted(start_date, end_date, filters,
+                                        query.number, sort_by.attribute,
+                                        neo_filters=neo_filters)
+
+        if plan is None:
+            plan, orbits = self.search(query._replace(
+                number=None, return_object='Path', sort_by=None))
+            step = plan.add_step(
+                f'top {query.number} by {sort_by.value}',
+                plan.steps[-1].estimated if query.number is None
+                else query.number)
+            with profile_stage(self.profiler, 'search: top k'):
+                results = top_k(orbits, query.number,
+                                sort_by.get_key(query.descending), unique)
+            step.actual = len(results) if self.explain else None
+            return plan, results
+
+        columns = self.db.get_columns()
+        start, end = columns.get_rows(start_date, end_date)
+        rows = iter_index_order(columns.indexes[sort_by.attribute],
+                                query.descending)
+        if self.explain:
+            rows = plan.steps[0].trace(rows)
+        results = profile_trace(
+            self.profiler, f'search: {plan.access} and filters',
+            iter_index_sorted(columns, rows, start, end, plan.filters))
+
+        if unique:
+            results = NEOSearcher.iter_unique(map(attrgetter('neo'), results))
+        if plan.neo_filters:
+            results = NEOSearcher.iter_neo_filtered(plan.neo_filters,
+                                                    results, unique)
+
+        return plan, list(self.trace(plan.steps[-1],
+                                     islice(results, query.number),
+                                     name='limit'))
+
+    def get_date_range(self, query):
+        """
+        Helper function to get the dates searched by a query, loading the
+        partitions of the dates when the database is partitioned, or every
+        partition when the query filters on NEO aggregates, which cover all
+        the orbits of a NEO
+
+        :param query: Query.Selectors object with query information
+        :return: tuple of the start date and end date strings
+        """
         query_date_search_type = query.date_search.get("type", "")
         query_start_date = query.date_search.get("start_date", None)
         query_end_date = query.date_search.get("end_date", None)
         query_date = query.date_search.get("date", None)
-        query_db = self.db.neo_date_db
-        query_name_db = self.db.neo_name_db
-        query_number = query.number
 
         query_type_index = self.date_search_type.index(query_date_search_type)
 
         if query_type_index == 0:
+            start_date, end_date = query_start_date, query_end_date
+        elif query_type_index == 1:
+            start_date = end_date = query_date
 
-            if ((query_start_date in query_db) and
-               (query_end_date in query_db)):
+        filters = Filter.create_filter_options(query.filters or [])
+        if Filter.split_levels(filters)[1]:
+            self.db.load_range()
+        else:
+            self.db.load_range(start_date, end_date)
 
-                date_list = NEOSearcher.get_date_list(query_db,
-                                                      query_start_date,
-                                                      query_end_date)
-                results = NEOSearcher.get_results(query_db, date_list)
+        if query_type_index == 1 and query_date not in self.db.neo_date_db:
+            print("date not found in database")
+            raise UnsupportedFeature
 
-            else:
-                print("one or both dates not found in database")
-                raise UnsupportedFeature
+        return start_date, end_date
 
-        elif query_type_index == 1:
-            results = query_db.get(query_date, None)
-            if results is None:
-                print("date not found in database")
-                raise UnsupportedFeature
+    @staticmethod
+    def iter_unique(neos):
+        """
+        Helper function to lazily drop the NEOs already produced, keeping
+        the order in which they are first found
 
-        if query.filters:
-            filters = Filter.create_filter_options(query.filters)
+        :param neos: iterable of NearEarthObjects
+        :return: iterator of distinct NearEarthObjects
+        """
+        seen = set()
+        add = seen.add
 
-            for filter in filters.values():
-                results = filter.apply(results)
+        for neo in neos:
+            if neo not in seen:
+                add(neo)
+                yield neo
 
-        results = results[:query_number]
+    @staticmethod
+    def iter_neo_filtered(neo_filters, results, unique):
+        """
+        Helper function to lazily apply filters on NEO aggregates, to the
+        NEOs themselves or to the NEO of each orbit
+
+        :param neo_filters: list of FilterExpression objects
+        :param results: iterable of NearEarthObjects if unique, otherwise
+        of OrbitPaths
+        :param unique: bool representing if the results are NEOs
+        :return: iterator of the results passing every filter
+        """
+        if unique:
+            return FilterExpression.select(neo_filters, results)
 
-        if query.return_object == 'NEO':
-            results = list(map(lambda
-                               orbit: query_name_db[orbit.name],
-                               results))
+        predicate = FilterExpression.compile(neo_filters)
+        return (orbit for orbit in results if predicate(orbit.neo))
 
-        if len(results) == 0:
-            print("NO MATCHES FOUND")
+    def iter_indexed(self, columns, start, end, plan):
+        """
+        Lazily finds the OrbitPaths in a slice of rows of an OrbitColumns
+        through the index of plan.index_filter, evaluating the remaining
+        filters on the matched rows only
+
+        :param columns: OrbitColumns with secondary indexes
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param plan: Plan with an index lookup access path
+        :return: iterator of OrbitPaths
+        """
+        rows = columns.index_rows(start, end, plan.index_filter)
+        if self.explain:
+            plan.steps[0].actual = len(rows)
+
+        if self.explain:
+            for step, filter in zip(plan.steps[1:], plan.filters):
+                rows = columns.filter_rows(rows, [filter])
+                step.actual = len(rows)
+        else:
+            rows = columns.filter_rows(rows, plan.filters)
 
-        return results
+        yield from map(columns.orbits.__getitem__, rows)
+
+    def trace(self, step, results, name=None):
+        """
+        Helper function to count the rows produced by a stage of a plan when
+        explaining, and to time the stage when profiling
+
+        :param step: PlanStep of the stage
+        :param results: iterable of the stage results
+        :param name: optional str naming the stage in the profile, its label
+        by default
+        :return: iterable of the same results
+        """
+        if self.explain:
+            results = step.trace(results)
+        if self.profiler is None:
+            return results
+        return self.profiler.trace(f'search: {name or step.label}', results)
+
+    @staticmethod
+    def get_cache_key(query):
+        """
+        Helper function to build the canonical form of a query, ignoring the
+        requested number, the order of the filters and how their values
+        are written
+
+        :param query: Query.Selectors object with query information
+        :return: tuple
+        """
+        date_search = query.date_search
+        filters = Filter.create_filter_options(query.filters or [])
+
+        return (date_search.get("type"),
+                date_search.get("date"),
+                date_search.get("start_date"),
+                date_search.get("end_date"),
+                tuple(sorted(filter.key() for filter in filters)),
+                query.return_object,
+                query.group_by,
+                query.by_hazard,
+                query.sort_by,
+                query.descending)
 
     @staticmethod
     def get_date_list(db, start_date, end_date):
         """
-        Helper function to get a range of dates in the database.
+        Helper function to get a range of dates in the database. The dates
+        are found by binary search on the sorted date index of the database,
+        so the start and end dates need not have any recorded orbits.
 
-        :param db: NEODatabase object that uses date strings as keys
+        :param db: NEODatabase object with a sorted date index
         :param start_date: str representing start date
         :param end_date: str representing end date
         :return: list of date strings
         """
-        date_list = sorted(db)
-        start_index = date_list.index(start_date)
-        end_index = date_list.index(end_date)
-        date_list = date_list[start_index:end_index+1]
-        return date_list
+        return db.get_dates(start_date, end_date)
 
     @staticmethod
     def get_results(db, date_list):
@@ -323,3 +1195,14 @@ class NEOSearcher(object):
                 results.append(orbit)
 
         return results
+
+    @staticmethod
+    def iter_results(db, date_list):
+        """
+        Helper function to lazily get the OrbitPaths found on given dates
+
+        :param db: NEODatabase object that uses date strings as keys
+        :param date_list: list of date strings
+        :return: iterator of OrbitPaths
+        """
+        return chain.from_iterable(map(db.get, date_list))
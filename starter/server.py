@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Script to run the Near Earth Object database as a long-running query server.
+
+The NEODatabase is loaded once and kept resident, then queries are answered
+over HTTP on localhost by an asyncio server handling concurrent clients.
+Searches run on a pool of threads, each holding the database as a reader,
+so a slow search does not hold up the other connections or /stats.
+
+You can run from the commandline with: server.py [args]
+Example: server.py -f data/neo_data.csv --port 8303
+
+Endpoints:
+- GET /query with the same options as main.py as query parameters, e.g.
+/query?date=2020-01-01&number=10&return_object=Path&filter=distance:>=:50000
+Dates are given with date, or start_date and end_date, the filter parameter
+may be repeated and format selects json (default) or csv results. With
+group_by=day|month|year (and by_hazard=true) the summaries of each period
+are returned instead, and sort_by=distance|diameter|speed|date (and
+descending=true) returns the first results in sorted order. With
+count=true only the number of results is returned, as {"count": n}.
+- GET /stats returns the number of queries served, throughput, latency
+percentiles and result cache counters in json, and with --profile the time
+and rows of each stage of the queries.
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import json
+import pathlib
+import sys
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from aggregate import GroupBy
+from cache import ResultCache
+from exceptions import UnsupportedFeature
+from database import NEODatabase
+from profiler import Profiler, profile_stage
+from search import Query, NEOSearcher
+from snapshot import Snapshot
+from partitions import PartitionManifest
+from rowindex import RowIndex
+from store import OrbitStore
+from writer import NEOWriter
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.absolute()
+
+
+class QueryStats(object):
+    """
+    Object recording the number of queries served and their latencies.
+    """
+
+    # Number of most recent query latencies kept for percentiles
+    WINDOW = 10000
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.queries = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=QueryStats.WINDOW)
+
+    def record(self, latency, error=False):
+        """
+        :param latency: float representing the query latency in seconds
+        :param error: bool representing if the query failed
+        :return: None
+        """
+        self.queries += 1
+        self.errors += error
+        self.latencies.append(latency)
+
+    def summary(self):
+        """
+        :return: dict of query counts, throughput and latency percentiles
+        in milliseconds
+        """
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        percentiles = {}
+
+        for percentile in (50, 90, 99, 100):
+            if latencies:
+                index = min(len(latencies) - 1,
+                            len(latencies) * percentile // 100)
+                percentiles[f'p{percentile}'] = latencies[index] * 1000
+            else:
+                percentiles[f'p{percentile}'] = None
+
+        return {
+            'queries': self.queries,
+            'errors': self.errors,
+            'uptime_s': uptime,
+            'queries_per_s': self.queries / uptime if uptime else 0.0,
+            'latency_ms': percentiles
+        }
+
+
+class NEOServer(object):
+    """
+    Object serving NEOSearcher queries over HTTP against a resident
+    NEODatabase.
+    """
+
+    # a dict of response content type per supported format
+    Formats = {
+        'json': 'application/json',
+        'csv': 'text/csv'
+    }
+
+    def __init__(self, db, host='127.0.0.1', port=8303, cache=None,
+                 profiler=None, threads=4):
+        """
+        :param db: loaded NEODatabase to answer queries from
+        :param host: str representing the interface to listen on
+        :param port: int representing the port to listen on, 0 for any
+        :param cache: optional ResultCache shared by all queries
+        :param profiler: optional Profiler timing the stages of every query,
+        its hooks are called at the end of each query
+        :param threads: int representing the number of searches run at a
+        time, a single one with a profiler, which times one stage at a time
+        """
+        self.db = db
+        self.profiler = profiler
+        self.searcher = NEOSearcher(db, cache=cache, profiler=profiler)
+        self.host = host
+        self.port = port
+        self.stats = QueryStats()
+        self.server = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1 if profiler is not None else threads,
+            thread_name_prefix='neo-search')
+
+    async def start(self):
+        """
+        Starts listening for clients
+
+        :return: asyncio Server
+        """
+        self.server = await asyncio.start_server(self.handle, self.host,
+                                                 self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        """
+        Starts listening for clients and serves them until cancelled
+
+        :return: None
+        """
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """
+        Serves the HTTP requests of a single client connection, keeping the
+        connection open between requests unless the client closes it
+
+        :param reader: asyncio StreamReader of the connection
+        :param writer: asyncio StreamWriter of the connection
+        :return: None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                method, target, version = \
+                    request_line.decode('latin-1').split()
+                status, content_type, body = await self.route(method,
+                                                              target)
+
+                keep_alive = (version == 'HTTP/1.1' and
+                              headers.get('connection', '').lower() != 'close')
+
+                writer.write(
+                    f'{version} {status}\r\n'
+                    f'Content-Type: {content_type}\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}'
+                    f'\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def route(self, method, target):
+        """
+        :param method: str representing the HTTP method
+        :param target: str representing the request path and query string
+        :return: tuple of the HTTP status, content type and body bytes
+        """
+        url = urlsplit(target)
+
+        if method != 'GET':
+            return '405 Method Not Allowed', 'text/plain', b'GET only\n'
+
+        if url.path == '/query':
+            # The latency includes the wait for a free search thread, the
+            # stats are recorded here as they are not shared with threads
+            start = time.perf_counter()
+            response = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.query, parse_qs(url.query))
+            self.stats.record(time.perf_counter() - start,
+                              error=response[0] != '200 OK')
+            return response
+
+        if url.path == '/stats':
+            summary = self.stats.summary()
+            if self.searcher.cache is not None:
+                summary['cache'] = self.searcher.cache.stats()
+            if self.profiler is not None:
+                summary['profile'] = self.profiler.summary()
+            body = json.dumps(summary).encode()
+            return '200 OK', 'application/json', body
+
+        return '404 Not Found', 'text/plain', b'Not found\n'
+
+    def query(self, params):
+        """
+        Answers a search query, on a search thread. The results are
+        serialized within the read lock of the database, so they come from
+        a single version of its data.
+
+        :param params: dict of query parameter to list of values
+        :return: tuple of the HTTP status, content type and body bytes
+        """
+        try:
+            output = params.get('format', ['json'])[0]
+            if output not in NEOServer.Formats:
+                raise UnsupportedFeature
+
+            query_options = {
+                option: values[0] for option, values in params.items()
+                if option in ('date', 'start_date', 'end_date',
+                              'return_object', 'group_by', 'sort_by')
+            }
+            for flag in ('by_hazard', 'descending'):
+                if flag in params:
+                    query_options[flag] = \
+                        params[flag][0].lower() in ('true', '1')
+            if 'number' in params:
+                query_options['number'] = int(params['number'][0])
+            else:
+                query_options['number'] = None
+            if 'filter' in params:
+                query_options['filter'] = params['filter']
+
+            query_selectors = Query(**query_options).build_query()
+            with self.db.reading(), profile_stage(self.profiler, 'query'):
+                if params.get('count', ['false'])[0].lower() in ('true', '1'):
+                    results = [self.searcher.count(query_selectors)]
+                    body = NEOServer.serialize_count(results[0], output)
+                else:
+                    results = self.searcher.iter_objects(query_selectors)
+                    body = NEOServer.serialize(results, output)
+
+        except (UnsupportedFeature, ValueError, TypeError):
+            return '400 Bad Request', 'text/plain', b'Unsupported query\n'
+
+        return '200 OK', NEOServer.Formats[output], body
+
+    @staticmethod
+    def serialize(results, output):
+        """
+        :param results: iterable of NearEarthObject or OrbitPath results
+        :param output: str representing the format, json or csv
+        :return: bytes of the serialized results
+        """
+        neo_writer = NEOWriter()
+        rows = [neo_writer.get_row(result) for result in results]
+
+        if output == 'json':
+            return json.dumps(rows).encode()
+
+        buffer = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+    @staticmethod
+    def serialize_count(count, output):
+        """
+        :param count: int representing the number of results
+        :param output: str representing the format, json or csv
+        :return: bytes of the serialized count
+        """
+        if output == 'json':
+            return json.dumps({'count': count}).encode()
+        return f'count\n{count}\n'.encode()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Near Earth Objects (NEOs) Database query server')
+    parser.add_argument(
+        '-f', '--filename',
+        type=str,
+        help='Name of input csv data file')
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help='Interface to listen on, localhost by default')
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        default=8303,
+        help='Port to listen on')
+    parser.add_argument(
+        '--columnar',
+        action='store_true',
+        help='Evaluate filters over a columnar, array-backed copy of the '
+        'orbit data')
+    parser.add_argument(
+        '--index',
+        action='store_true',
+        help='Keep sorted secondary indexes on miss distance, diameter and '
+        'hazard flag over the columnar copy, so selective filters skip the '
+        'date range scan. Implies --columnar')
+    parser.add_argument(
+        '--bitmap',
+        action='store_true',
+        help='Keep bitmap indexes on miss distance, diameter and hazard flag '
+        'over the columnar copy, so filters and their combinations are '
+        'evaluated as bitmap intersections and unions. Implies --columnar')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Int representing the number of processes used to parse the '
+        'input csv file')
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=128,
+        help='Int representing the max number of cached query results, '
+        '0 to disable the cache')
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        help='Float representing the seconds a cached query result stays '
+        'valid')
+    parser.add_argument(
+        '--no-snapshot',
+        action='store_true',
+        help='Always parse the input csv file, bypassing the snapshot')
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Open the data from a memory-mapped binary store built from the '
+        'input csv file once, shared by every server on the same file')
+    parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Search a sidecar index of the row offsets and searched columns '
+        'of the input csv file, reading only the results from the csv file')
+    parser.add_argument(
+        '--partition',
+        choices=GroupBy.list(),
+        help='Split the input csv file once into one csv file per year, month '
+        'or day, loading only the partitions overlapping the dates searched')
+    parser.add_argument(
+        '--max_partitions', '--max-partitions',
+        type=int,
+        help='With --partition, the number of partitions kept loaded, the '
+        'least recently used evicted first')
+    parser.add_argument(
+        '-t', '--threads',
+        type=int,
+        default=4,
+        help='Int representing the number of searches run at a time')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time the stages of every query, reported by /stats, running '
+        'one search at a time')
+
+    args = parser.parse_args()
+
+    filename = args.filename or f'{PROJECT_ROOT}/data/neo_data.csv'
+    snapshot = None if args.no_snapshot else Snapshot.default_path(filename)
+
+    store = OrbitStore.default_path(filename) if args.mmap else None
+    row_index = RowIndex.default_path(filename) if args.lazy else None
+    partitions = PartitionManifest.default_path(filename) \
+        if args.partition else None
+
+    db = NEODatabase(filename=filename, snapshot=snapshot,
+                     columnar=args.columnar, workers=args.workers,
+                     indexed=args.index, store=store, row_index=row_index,
+                     partitions=partitions, period=args.partition,
+                     max_partitions=args.max_partitions,
+                     bitmaps=args.bitmap)
+
+    try:
+        db.load_data()
+    except FileNotFoundError as e:
+        print(f'File {filename} not found')
+        sys.exit()
+
+    # Build the columnar copy up front rather than on the first query
+    db.get_columns()
+
+    cache = ResultCache(max_entries=args.cache_size, ttl=args.cache_ttl)
+    profiler = Profiler() if args.profile else None
+    server = NEOServer(db, host=args.host, port=args.port, cache=cache,
+                       profiler=profiler, threads=args.threads)
+    print(f'Serving {filename} on http://{args.host}:{args.port}')
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
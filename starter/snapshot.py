@@ -0,0 +1,119 @@
+import hashlib
+import os
+import pickle
+
+from ingest import paused_gc
+
+
+class Snapshot(object):
+    """
+    Object representing a persistent binary snapshot of a loaded NEODatabase.
+
+    The snapshot file holds two pickles written back to back: a small header
+    describing the source csv file (path, size, mtime and content hash) and
+    the database state itself. On load the header is compared against the
+    current source file, so the state is only unpickled when the csv file is
+    unchanged. Any mismatch or unreadable snapshot is treated as a cache miss
+    and the caller is expected to parse the csv file and save a new snapshot.
+    """
+
+    # Bump whenever the pickled database state changes shape
+    VERSION = 3
+
+    # Block size used when hashing the source file
+    HASH_BLOCK_SIZE = 1 << 20
+
+    def __init__(self, path):
+        """
+        :param path: str representing the pathway of the snapshot file
+        """
+        self.path = str(path)
+        self._source = (None, None)
+
+    @staticmethod
+    def default_path(filename):
+        """
+        :param filename: str representing the pathway of the source csv file
+        :return: str representing the default snapshot pathway for the file
+        """
+        return f'{filename}.snapshot'
+
+    @staticmethod
+    def source_key(filename):
+        """
+        Builds the key identifying a specific version of the source csv file
+
+        :param filename: str representing the pathway of the source csv file
+        :return: dict of the file path, size, mtime and content hash
+        """
+        stat = os.stat(filename)
+        digest = hashlib.sha1()
+
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(Snapshot.HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+
+        return {
+            'path': os.path.abspath(filename),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': digest.hexdigest()
+        }
+
+    def _header(self, filename):
+        """
+        Builds the snapshot header for the source csv file, reusing the key
+        computed by a previous load so a miss followed by a save only hashes
+        the file once
+
+        :param filename: str representing the pathway of the source csv file
+        :return: dict of the snapshot version and source key
+        """
+        if self._source[0] != filename:
+            self._source = (filename, Snapshot.source_key(filename))
+
+        return {'version': Snapshot.VERSION, 'source': self._source[1]}
+
+    def load(self, filename):
+        """
+        Loads the database state stored for the source csv file
+
+        :param filename: str representing the pathway of the source csv file
+        :return: dict of the database state or None if the snapshot is missing
+        or stale
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        header = self._header(filename)
+
+        try:
+            with open(self.path, 'rb') as f:
+                if pickle.load(f) != header:
+                    return None
+
+                with paused_gc():
+                    return pickle.load(f)
+
+        except (OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            return None
+
+    def save(self, filename, state):
+        """
+        Writes the database state for the source csv file, replacing any
+        previous snapshot atomically
+
+        :param filename: str representing the pathway of the source csv file
+        :param state: dict of the database state
+        :return: None
+        """
+        header = self._header(filename)
+        tmp_path = f'{self.path}.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, self.path)
+        self._source = (None, None)
@@ -0,0 +1,558 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from datetime import date
+from itertools import compress, repeat
+from operator import sub
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import weakref
+
+from columns import OrbitColumns
+from models import NearEarthObject, OrbitPath
+from planner import TableStats
+
+
+class OrbitStore(object):
+    """
+    Object representing a read-only binary file of the orbit and NEO data,
+    opened with mmap.
+
+    The file holds fixed-width sections, each a column of one typed value
+    or one padded utf-8 string per record: the orbits in close approach
+    date order, the NEOs in order of first appearance, the rows of the
+    orbits of each NEO and the first row of each date. A json directory of
+    the sections, with the csv file the store was built from, is written at
+    the end and located through a fixed-size prefix.
+
+    Opening maps the file and reads the directory only, so it takes the
+    same time whatever the size of the file. Columns are read through
+    memoryviews of the mapping, so processes opening the same store share
+    the operating system page cache instead of each holding a copy of the
+    data. NearEarthObject and OrbitPath instances are only built for the
+    rows a search returns. The most recently used NEOs, with their orbits,
+    are kept in a bounded cache, and an instance is reused for as long as
+    anything references it, so each NEO has a single instance at a time.
+    """
+
+    MAGIC = b'NEOSTORE'
+
+    # Bump whenever the layout of the sections changes
+    VERSION = 1
+
+    # Magic, offset and length of the json directory
+    PREFIX = struct.Struct('<8sQQ')
+
+    # Sections start on multiples of the largest item size
+    ALIGN = 8
+
+    # Number of most recently used NEOs kept built
+    CACHE_SIZE = 65536
+
+    # a dict of orbit column to typecode, one value per orbit
+    OrbitColumns = {
+        'date_ordinal': 'q',
+        'neo_row': 'i',
+        'miss_distance_km': 'd',
+        'km_per_second': 'd',
+        'km_per_hour': 'd',
+        'diameter_min_km': 'd',
+        'is_hazardous': 'b'
+    }
+
+    # a dict of NEO column to typecode, one value per NEO
+    NeoColumns = {
+        'abs_magnitude_h': 'd',
+        'diameter_min_km': 'd',
+        'diameter_max_km': 'd',
+        'is_hazardous': 'b',
+        'closest_miss_km': 'd',
+        'max_km_per_second': 'd'
+    }
+
+    # Fixed-width string columns of the orbits and of the NEOs
+    OrbitTexts = ('close_approach_date_full',)
+    NeoTexts = ('id', 'neo_reference_id', 'name', 'nasa_jpl_url')
+
+    def __init__(self, buffer, directory, cache_size=None):
+        """
+        :param buffer: mmap of the store file
+        :param directory: dict of the store directory
+        :param cache_size: optional int representing the number of most
+        recently used NEOs kept built, CACHE_SIZE by default
+        """
+        self.buffer = buffer
+        self.directory = directory
+        self.neos = directory['neos']
+        self.orbits = directory['orbits']
+        self.sections = {}
+        view = memoryview(buffer)
+
+        for name, (offset, kind, count) in directory['sections'].items():
+            if kind.endswith('s'):
+                width = int(kind[:-1])
+                self.sections[name] = (view[offset:offset + width * count],
+                                       width)
+            else:
+                size = struct.calcsize(kind)
+                self.sections[name] = \
+                    view[offset:offset + size * count].cast(kind)
+
+        self.date_ordinals = self.sections['date.ordinal']
+        self.date_start = self.sections['date.start']
+        self.dates = [date.fromordinal(ordinal).isoformat()
+                      for ordinal in self.date_ordinals]
+        self.date_strings = dict(zip(self.date_ordinals, map(sys.intern,
+                                                             self.dates)))
+        self.name_rows = None
+        self.cache_size = cache_size or self.CACHE_SIZE
+        self.neo_cache = OrderedDict()
+        # Built instances still referenced, by record
+        self.neo_refs = weakref.WeakValueDictionary()
+        self.orbit_refs = weakref.WeakValueDictionary()
+        # Held while building NEOs and updating the cache, which searches
+        # running in several threads share
+        self.neo_lock = threading.Lock()
+
+    @staticmethod
+    def default_path(filename):
+        """
+        :param filename: str representing the pathway of the source csv file
+        :return: str representing the default store pathway for the file
+        """
+        return f'{filename}.store'
+
+    @staticmethod
+    def source_key(filename):
+        """
+        Builds the key identifying a version of the source csv file from its
+        metadata, so a store is checked without reading the csv file
+
+        :param filename: str representing the pathway of the source csv file
+        :return: dict of the file path, size and mtime
+        """
+        stat = os.stat(filename)
+        return {
+            'path': os.path.abspath(filename),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns
+        }
+
+    @classmethod
+    def build(cls, path, filename, neo_name_db, neo_date_db, date_index):
+        """
+        Writes the store of loaded data, replacing any previous store
+        atomically
+
+        :param path: str representing the pathway of the store file
+        :param filename: str representing the pathway of the source csv file
+        :param neo_name_db: dict of NEO name to NearEarthObject
+        :param neo_date_db: dict of date string to list of OrbitPaths
+        :param date_index: sorted list of the date strings in neo_date_db
+        :return: None
+        """
+        neos = list(neo_name_db.values())
+        neo_rows = {neo: row for row, neo in enumerate(neos)}
+        orbits = [orbit for approach_date in date_index
+                  for orbit in neo_date_db[approach_date]]
+        orbit_rows = {id(orbit): row for row, orbit in enumerate(orbits)}
+
+        ordinals = array('q', map(OrbitColumns.to_ordinal, date_index))
+        date_start = array('q', [0])
+        date_ordinal = array('q')
+        for approach_date, ordinal in zip(date_index, ordinals):
+            count = len(neo_date_db[approach_date])
+            date_start.append(date_start[-1] + count)
+            date_ordinal.extend(repeat(ordinal, count))
+
+        neo_start = array('q', [0])
+        neo_orbits = array('i')
+        for neo in neos:
+            neo_orbits.extend(orbit_rows[id(orbit)] for orbit in neo.orbits)
+            neo_start.append(len(neo_orbits))
+
+        columns = {
+            'date.ordinal': ordinals,
+            'date.start': date_start,
+            'orbit.date_ordinal': date_ordinal,
+            'orbit.neo_row': array('i', (neo_rows[orbit.neo]
+                                         for orbit in orbits)),
+            'neo.orbit_start': neo_start,
+            'neo.orbits': neo_orbits
+        }
+        for attribute in ('miss_distance_km', 'km_per_second', 'km_per_hour',
+                          'diameter_min_km', 'is_hazardous'):
+            columns[f'orbit.{attribute}'] = array(
+                cls.OrbitColumns[attribute],
+                (getattr(orbit, attribute) for orbit in orbits))
+        for attribute, typecode in cls.NeoColumns.items():
+            columns[f'neo.{attribute}'] = array(typecode, (
+                getattr(neo, attribute) or 0 for neo in neos))
+
+        texts = {f'orbit.{attribute}': [getattr(orbit, attribute)
+                                        for orbit in orbits]
+                 for attribute in cls.OrbitTexts}
+        texts.update({f'neo.{attribute}': [getattr(neo, attribute)
+                                           for neo in neos]
+                      for attribute in cls.NeoTexts})
+
+        cls.write(path, filename, len(neos), len(orbits), columns, texts)
+
+    @classmethod
+    def write(cls, path, filename, neos, orbits, columns, texts,
+              **directory):
+        """
+        Writes the sections of a store file, replacing any previous file
+        atomically
+
+        :param path: str representing the pathway of the store file
+        :param filename: str representing the pathway of the source csv file
+        :param neos: int representing the number of NEO records
+        :param orbits: int representing the number of orbit records
+        :param columns: dict of section name to array of values
+        :param texts: dict of section name to list of strings
+        :param directory: additional entries of the directory
+        :return: None
+        """
+        directory.update({
+            'version': cls.VERSION,
+            'byteorder': sys.byteorder,
+            'source': OrbitStore.source_key(filename),
+            'neos': neos,
+            'orbits': orbits,
+            'sections': {}
+        })
+        tmp_path = f'{path}.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            f.write(bytes(cls.PREFIX.size))
+
+            for name, column in columns.items():
+                OrbitStore.write_section(f, directory, name, column.typecode,
+                                         len(column), column.tobytes())
+
+            for name, values in texts.items():
+                encoded = [value.encode('utf-8') for value in values]
+                width = max(map(len, encoded), default=0) or 1
+                OrbitStore.write_section(
+                    f, directory, name, f'{width}s', len(encoded),
+                    b''.join(value.ljust(width, b'\0') for value in encoded))
+
+            offset = f.tell()
+            header = json.dumps(directory).encode('utf-8')
+            f.write(header)
+            f.seek(0)
+            f.write(cls.PREFIX.pack(cls.MAGIC, offset, len(header)))
+
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def write_section(f, directory, name, kind, count, data):
+        """
+        Writes a section at the next aligned offset of a store file
+
+        :param f: binary file being written
+        :param directory: dict of the store directory, the section is added
+        :param name: str representing the section
+        :param kind: str representing the typecode or the string width
+        :param count: int representing the number of values
+        :param data: bytes of the values
+        :return: None
+        """
+        f.write(bytes(-f.tell() % OrbitStore.ALIGN))
+        directory['sections'][name] = [f.tell(), kind, count]
+        f.write(data)
+
+    @classmethod
+    def open(cls, path, filename=None, cache_size=None):
+        """
+        Maps a store file
+
+        :param path: str representing the pathway of the store file
+        :param filename: optional str representing the pathway of the source
+        csv file, the store must have been built from its current version
+        if it exists
+        :param cache_size: optional int representing the number of most
+        recently used NEOs kept built
+        :return: OrbitStore or None if the store is missing, unreadable or
+        stale
+        """
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, offset, length = cls.PREFIX.unpack_from(buffer)
+            directory = json.loads(buffer[offset:offset + length])
+        except (struct.error, ValueError):
+            magic, directory = None, {}
+
+        if magic != cls.MAGIC or \
+                directory.get('version') != cls.VERSION or \
+                directory.get('byteorder') != sys.byteorder or \
+                (filename and os.path.exists(filename) and
+                 directory.get('source') != cls.source_key(filename)):
+            buffer.close()
+            return None
+
+        return cls(buffer, directory, cache_size)
+
+    def get_text(self, name, row):
+        """
+        :param name: str representing a string section
+        :param row: int representing the record
+        :return: str of the record
+        """
+        view, width = self.sections[name]
+        return bytes(view[row * width:(row + 1) * width]) \
+            .rstrip(b'\0').decode('utf-8')
+
+    def get_neo(self, row):
+        """
+        Gets the NearEarthObject of a NEO record with all its orbits,
+        building it if no instance is cached or referenced
+
+        :param row: int representing the NEO record
+        :return: NearEarthObject
+        """
+        with self.neo_lock:
+            neo = self.neo_refs.get(row)
+
+            if neo is None:
+                neo = self.neo_refs[row] = self.read_neo(row)
+                for orbit_row, orbit in zip(self.get_orbit_rows(row),
+                                            neo.orbits):
+                    self.orbit_refs[orbit_row] = orbit
+
+            cache = self.neo_cache
+            cache[row] = neo
+            cache.move_to_end(row)
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+            return neo
+
+    def get_orbit(self, row):
+        """
+        Gets the OrbitPath of an orbit record, building it, with its NEO and
+        the NEO's other orbits, if no instance is referenced
+
+        :param row: int representing the orbit record
+        :return: OrbitPath
+        """
+        orbit = self.orbit_refs.get(row)
+        if orbit is None:
+            # The NEO is held until the orbit is, as another thread may drop
+            # it from the cache meanwhile
+            neo = self.get_neo(self.sections['orbit.neo_row'][row])
+            orbit = self.orbit_refs[row]
+            del neo
+        return orbit
+
+    def get_orbit_rows(self, row):
+        """
+        :param row: int representing the NEO record
+        :return: memoryview of the orbit records of the NEO, in the order
+        the orbits were added
+        """
+        orbit_start = self.sections['neo.orbit_start']
+        return self.sections['neo.orbits'][orbit_start[row]:
+                                           orbit_start[row + 1]]
+
+    def read_neo(self, row):
+        """
+        Builds the NearEarthObject of a NEO record with all its orbits
+
+        :param row: int representing the NEO record
+        :return: NearEarthObject
+        """
+        sections = self.sections
+        neo = NearEarthObject.from_record((
+            self.get_text('neo.id', row),
+            self.get_text('neo.neo_reference_id', row),
+            sys.intern(self.get_text('neo.name', row)),
+            self.get_text('neo.nasa_jpl_url', row),
+            sections['neo.abs_magnitude_h'][row],
+            sections['neo.diameter_min_km'][row],
+            sections['neo.diameter_max_km'][row],
+            bool(sections['neo.is_hazardous'][row])))
+
+        for orbit_row in self.get_orbit_rows(row):
+            neo.update_orbits(OrbitPath.from_record(neo, (
+                sections['orbit.km_per_second'][orbit_row],
+                sections['orbit.km_per_hour'][orbit_row],
+                self.date_strings[sections['orbit.date_ordinal'][orbit_row]],
+                self.get_text('orbit.close_approach_date_full', orbit_row),
+                sections['orbit.miss_distance_km'][orbit_row])))
+
+        return neo
+
+    def find_neo(self, name):
+        """
+        :param name: str representing the NEO name
+        :return: int representing its NEO record or None if not found
+        """
+        if self.name_rows is None:
+            self.name_rows = {self.get_text('neo.name', row): row
+                              for row in range(self.neos)}
+        return self.name_rows.get(name)
+
+
+class MappedOrbits(Sequence):
+    """
+    Object representing the orbits of an OrbitStore as a sequence of
+    OrbitPaths in close approach date order, built on access.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: OrbitStore
+        """
+        self.store = store
+
+    def __len__(self):
+        return self.store.orbits
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(map(self.store.get_orbit,
+                            range(*row.indices(self.store.orbits))))
+        if row < 0:
+            row += self.store.orbits
+        if not 0 <= row < self.store.orbits:
+            raise IndexError(row)
+        return self.store.get_orbit(row)
+
+
+class MappedDates(Mapping):
+    """
+    Object representing the orbits of an OrbitStore as a read-only dict of
+    date string to list of OrbitPaths, like NEODatabase.neo_date_db.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: OrbitStore
+        """
+        self.store = store
+
+    def __getitem__(self, approach_date):
+        dates = self.store.dates
+        position = bisect_left(dates, approach_date)
+        if position == len(dates) or dates[position] != approach_date:
+            raise KeyError(approach_date)
+
+        start, end = self.store.date_start[position:position + 2]
+        return list(map(self.store.get_orbit, range(start, end)))
+
+    def __iter__(self):
+        return iter(self.store.dates)
+
+    def __len__(self):
+        return len(self.store.dates)
+
+
+class MappedNames(Mapping):
+    """
+    Object representing the NEOs of an OrbitStore as a read-only dict of
+    NEO name to NearEarthObject, like NEODatabase.neo_name_db.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: OrbitStore
+        """
+        self.store = store
+
+    def __getitem__(self, name):
+        row = self.store.find_neo(name)
+        if row is None:
+            raise KeyError(name)
+        return self.store.get_neo(row)
+
+    def __iter__(self):
+        return (self.store.get_text('neo.name', row)
+                for row in range(self.store.neos))
+
+    def __len__(self):
+        return self.store.neos
+
+
+class MappedColumns(OrbitColumns):
+    """
+    Object giving the OrbitColumns interface over the columns of an
+    OrbitStore, so searches evaluate filters directly over the mapped data.
+    Only the OrbitPaths of the rows passing the filters are built.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: OrbitStore
+        """
+        self.store = store
+        self.orbits = MappedOrbits(store)
+        self.date_ordinal = store.sections['orbit.date_ordinal']
+        self.indexes = {}
+        self.bitmaps = {}
+
+        for attribute in OrbitColumns.Columns:
+            setattr(self, attribute, store.sections[f'orbit.{attribute}'])
+
+    def append(self, orbit):
+        """
+        The mapped columns are read-only
+
+        :param orbit: OrbitPath
+        :return: bool, always False
+        """
+        return False
+
+    def select(self, start, end, filters):
+        """
+        Finds the OrbitPaths in a slice of rows that pass every filter,
+        building only those
+
+        :param start: int representing the first row
+        :param end: int representing one past the last row
+        :param filters: iterable of FilterExpression objects
+        :return: list of OrbitPaths
+        """
+        mask = OrbitColumns.mask(
+            filters, lambda attribute: getattr(self, attribute)[start:end])
+        rows = range(start, end)
+
+        if mask is not None:
+            rows = compress(rows, mask)
+
+        return list(map(self.store.get_orbit, rows))
+
+
+class StoreStats(TableStats):
+    """
+    Object holding the statistics of the data of an OrbitStore, collected
+    from its columns rather than from OrbitPath instances.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: OrbitStore
+        """
+        self.store = store
+        self.dates = store.dates
+        self.date_totals = store.date_start
+        self.columns = {}
+
+    def get_values(self, attribute):
+        if attribute == 'approach_count':
+            orbit_start = self.store.sections['neo.orbit_start']
+            return map(sub, orbit_start[1:], orbit_start[:-1])
+        if attribute in TableStats.Columns:
+            return self.store.sections[f'orbit.{attribute}']
+        return self.store.sections[f'neo.{attribute}']
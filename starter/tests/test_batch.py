@@ -0,0 +1,58 @@
+import pathlib
+import unittest
+
+from batch import BatchSearcher
+from database import NEODatabase
+from search import Query, NEOSearcher
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestBatchSearcher(unittest.TestCase):
+    """
+    Test Class with test cases for answering batches of queries with shared
+    scans on a small sample of the Near Earth Object data.
+    """
+
+    SPECS = [
+        dict(start_date='2020-01-01', end_date='2020-01-05', number=None),
+        dict(start_date='2020-01-03', end_date='2020-01-08', number=20,
+             filter=["distance:<:30000000"], return_object='Path'),
+        dict(start_date='2020-01-04', end_date='2020-01-06', number=None,
+             filter=["distance:<:30000000"], return_object='Path'),
+        dict(date='2020-01-10', number=5, filter=["approaches:>:1"]),
+        dict(start_date='2020-01-09', end_date='2020-01-10', number=None,
+             filter=["is_hazardous:=:True or diameter:>:0.2"]),
+    ]
+
+    def test_batch_matches_single_queries(self):
+        for options in ({}, {'columnar': True}, {'bitmaps': True}):
+            db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv',
+                             **options)
+            db.load_data()
+            queries = [Query(**spec).build_query() for spec in self.SPECS]
+
+            searcher = BatchSearcher(db)
+            results = searcher.run(queries)
+
+            self.assertEqual(searcher.scans, 2)
+            for query, batch_results in zip(queries, results):
+                expected = NEOSearcher(db).get_objects(query)
+                self.assertEqual(batch_results, expected)
+
+    def test_group_merges_overlapping_ranges(self):
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        db.load_data()
+        searcher = BatchSearcher(db)
+        batch = [searcher.prepare(Query(**spec).build_query())
+                 for spec in self.SPECS]
+
+        self.assertEqual(
+            [(start_date, end_date, len(group)) for start_date, end_date, group
+             in BatchSearcher.group(batch)],
+            [('2020-01-01', '2020-01-08', 3), ('2020-01-09', '2020-01-10', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
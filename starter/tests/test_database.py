@@ -0,0 +1,476 @@
+import copy
+import csv
+import gc
+import operator
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+
+from columns import OrbitColumns
+from database import NEODatabase
+from exceptions import UnsupportedFeature
+from indexes import bitmap_rows
+from ingest import RowDecoder
+from locks import ReadWriteLock
+from models import NearEarthObject, OrbitPath
+from partitions import PartitionManifest
+from search import Query, NEOSearcher
+from rowindex import RowIndex
+from snapshot import Snapshot
+from store import OrbitStore
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestNEODatabase(unittest.TestCase):
+    """
+    Test Class with test cases for loading and maintaining the NEODatabase
+    on a small sample of the Near Earth Object data.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.neo_data_file = os.path.join(self.tmp_dir, 'neo_sample.csv')
+        shutil.copy(f'{TESTS_ROOT}/data/neo_sample.csv', self.neo_data_file)
+        self.snapshot_file = Snapshot.default_path(self.neo_data_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load_db(self, **kwargs):
+        db = NEODatabase(filename=self.neo_data_file, **kwargs)
+        db.load_data()
+        return db
+
+    def test_snapshot_matches_csv_load(self):
+        csv_db = self.load_db()
+        self.load_db(snapshot=self.snapshot_file)
+        self.assertTrue(os.path.exists(self.snapshot_file))
+
+        snapshot_db = self.load_db(snapshot=self.snapshot_file)
+        self.assertEqual(list(snapshot_db.neo_name_db), list(csv_db.neo_name_db))
+        self.assertEqual(list(snapshot_db.neo_date_db), list(csv_db.neo_date_db))
+        for date, orbits in csv_db.neo_date_db.items():
+            self.assertEqual(
+                [(o.name, o.miss_distance_km) for o in orbits],
+                [(o.name, o.miss_distance_km) for o in snapshot_db.neo_date_db[date]]
+            )
+
+    def test_loads_keep_caller_gc_setting(self):
+        self.load_db(snapshot=self.snapshot_file)
+
+        gc.disable()
+        try:
+            self.load_db()
+            self.load_db(snapshot=self.snapshot_file)
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+        self.load_db(snapshot=self.snapshot_file)
+        self.assertTrue(gc.isenabled())
+
+    def test_snapshot_rebuilds_when_csv_changes(self):
+        self.load_db(snapshot=self.snapshot_file)
+
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        with open(self.neo_data_file, 'w') as f:
+            f.writelines(lines[:-1])
+
+        self.assertIsNone(Snapshot(self.snapshot_file).load(self.neo_data_file))
+        db = self.load_db(snapshot=self.snapshot_file)
+        orbit_count = sum(map(len, db.neo_date_db.values()))
+        self.assertEqual(orbit_count, len(lines) - 2)
+
+    def test_store_matches_csv_load(self):
+        store_file = OrbitStore.default_path(self.neo_data_file)
+        csv_db = self.load_db()
+        self.load_db(store=store_file)
+        built = os.stat(store_file).st_mtime_ns
+
+        store_db = self.load_db(store=store_file)
+        self.assertEqual(os.stat(store_file).st_mtime_ns, built)
+        self.assertIsNotNone(store_db.mapped)
+        self.assertEqual(list(store_db.neo_name_db), list(csv_db.neo_name_db))
+        self.assertEqual(list(store_db.neo_date_db), csv_db.date_index)
+        self.assertEqual(store_db.get_stats().count,
+                         csv_db.get_stats().count)
+
+        for date, orbits in csv_db.neo_date_db.items():
+            self.assertEqual(
+                [(o.name, o.close_approach_date_full, o.miss_distance_km,
+                  o.is_hazardous) for o in orbits],
+                [(o.name, o.close_approach_date_full, o.miss_distance_km,
+                  o.is_hazardous) for o in store_db.neo_date_db[date]]
+            )
+
+        name = next(iter(csv_db.neo_name_db))
+        neo = store_db.neo_name_db[name]
+        self.assertIs(store_db.neo_name_db[name], neo)
+        self.assertIs(neo.orbits[0].neo, neo)
+        self.assertEqual(neo.closest_miss_km,
+                         csv_db.neo_name_db[name].closest_miss_km)
+
+        for filters, return_object in (([], 'NEO'),
+                                       (["distance:<:12000000"], 'Path'),
+                                       (["approaches:>:1"], 'NEO')):
+            query_selectors = Query(
+                number=100, start_date='2020-01-02', end_date='2020-01-08',
+                filter=filters, return_object=return_object
+            ).build_query()
+            self.assertEqual(
+                [o.name for o in
+                 NEOSearcher(store_db).get_objects(query_selectors)],
+                [o.name for o in
+                 NEOSearcher(csv_db).get_objects(query_selectors)]
+            )
+
+        # Daily summaries are collected from the mapped columns
+        query_selectors = Query(
+            start_date='2020-01-01', end_date='2020-12-31', number=None,
+            group_by='month', by_hazard=True).build_query()
+        self.assertEqual(
+            [(s.period, s.is_hazardous, s.approaches, s.distinct_neos,
+              s.miss_mean_km) for s in
+             NEOSearcher(store_db).get_objects(query_selectors)],
+            [(s.period, s.is_hazardous, s.approaches, s.distinct_neos,
+              s.miss_mean_km) for s in
+             NEOSearcher(csv_db).get_objects(query_selectors)])
+
+        with self.assertRaises(UnsupportedFeature):
+            store_db.insert(neo, neo.orbits[0])
+
+    def test_store_rebuilds_when_csv_changes(self):
+        store_file = OrbitStore.default_path(self.neo_data_file)
+        self.load_db(store=store_file)
+
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        with open(self.neo_data_file, 'w') as f:
+            f.writelines(lines[:-1])
+
+        self.assertIsNone(OrbitStore.open(store_file, self.neo_data_file))
+        db = self.load_db(store=store_file)
+        self.assertEqual(len(db.columns), len(lines) - 2)
+
+    def test_row_index_reads_results_from_csv(self):
+        index_file = RowIndex.default_path(self.neo_data_file)
+        csv_db = self.load_db()
+        self.load_db(row_index=index_file)
+        built = os.stat(index_file).st_mtime_ns
+
+        lazy_db = self.load_db(row_index=index_file)
+        self.assertEqual(os.stat(index_file).st_mtime_ns, built)
+        self.assertEqual(list(lazy_db.neo_name_db), list(csv_db.neo_name_db))
+        self.assertEqual(list(lazy_db.neo_date_db), csv_db.date_index)
+
+        for filters, return_object in (([], 'NEO'),
+                                       (["distance:<:12000000"], 'Path'),
+                                       (["approaches:>:1"], 'NEO')):
+            query_selectors = Query(
+                number=100, start_date='2020-01-02', end_date='2020-01-08',
+                filter=filters, return_object=return_object
+            ).build_query()
+            self.assertEqual(
+                [o.to_record() for o in
+                 NEOSearcher(lazy_db).get_objects(query_selectors)],
+                [o.to_record() for o in
+                 NEOSearcher(csv_db).get_objects(query_selectors)]
+            )
+
+        # The cache is bounded, but a NEO is reused while it is referenced
+        index = RowIndex.open(index_file, self.neo_data_file, cache_size=2)
+        neo = index.get_neo(0)
+        for row in range(1, 5):
+            index.get_neo(row)
+        self.assertEqual(len(index.neo_cache), 2)
+        self.assertIs(index.get_neo(0), neo)
+        self.assertEqual(
+            [orbit.to_record() for orbit in neo.orbits],
+            [orbit.to_record() for orbit in csv_db.neo_name_db[neo.name].orbits])
+
+    def test_row_index_skips_blank_lines(self):
+        csv_db = self.load_db()
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        with open(self.neo_data_file, 'w') as f:
+            for number, line in enumerate(lines):
+                f.write(line + ('\n' if number % 10 == 5 else ''))
+            f.write('\n')
+
+        index_file = RowIndex.default_path(self.neo_data_file)
+        lazy_db = self.load_db(row_index=index_file)
+        query_selectors = Query(
+            number=None, start_date='2020-01-01', end_date='2020-01-10',
+            return_object='Path').build_query()
+        self.assertEqual(
+            [o.to_record() for o in
+             NEOSearcher(lazy_db).get_objects(query_selectors)],
+            [o.to_record() for o in
+             NEOSearcher(csv_db).get_objects(query_selectors)]
+        )
+
+    def test_partitions_load_only_searched_dates(self):
+        partition_dir = PartitionManifest.default_path(self.neo_data_file)
+        csv_db = self.load_db()
+        db = self.load_db(partitions=partition_dir, period='day',
+                          max_partitions=2)
+        self.assertEqual(len(db.manifest.partitions), 10)
+        self.assertEqual(db.neo_date_db, {})
+
+        def search(query_db, **kwargs):
+            query_selectors = Query(number=None, return_object='Path',
+                                    **kwargs).build_query()
+            return [orbit.to_record() for orbit in
+                    NEOSearcher(query_db).get_objects(query_selectors)]
+
+        for kwargs in ({'start_date': '2020-01-02', 'end_date': '2020-01-03'},
+                       {'date': '2020-01-04'},
+                       {'start_date': '2020-01-01', 'end_date': '2020-01-10',
+                        'filter': ["approaches:>:1"]}):
+            self.assertEqual(search(db, **kwargs), search(csv_db, **kwargs))
+
+        # NEO filters loaded every partition, only the last two searched
+        # are kept by the next search
+        self.assertEqual(len(db.loaded), 10)
+        kwargs = {'start_date': '2020-01-09', 'end_date': '2020-01-10'}
+        self.assertEqual(search(db, **kwargs), search(csv_db, **kwargs))
+        self.assertEqual(list(db.loaded), ['2020-01-09', '2020-01-10'])
+        self.assertEqual(list(db.neo_date_db), ['2020-01-09', '2020-01-10'])
+        self.assertEqual(
+            sum(len(neo.orbits) for neo in db.neo_name_db.values()), 7)
+
+    def test_partitions_reject_ingest(self):
+        partition_dir = PartitionManifest.default_path(self.neo_data_file)
+        db = self.load_db(partitions=partition_dir, period='day',
+                          max_partitions=2)
+        db.load_range('2020-01-01', '2020-01-01')
+        rows = len(db.neo_date_db['2020-01-01'])
+
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        delta_file = os.path.join(self.tmp_dir, 'delta.csv')
+        with open(delta_file, 'w') as f:
+            f.writelines(lines)
+
+        # Orbits of unloaded partitions could not be deduplicated, and
+        # orbits added to loaded ones would be lost on eviction
+        with self.assertRaises(UnsupportedFeature):
+            db.ingest(delta_file)
+        orbit = copy.copy(db.neo_date_db['2020-01-01'][0])
+        with self.assertRaises(UnsupportedFeature):
+            db.insert(orbit.neo, orbit)
+
+        db.load_range('2020-01-05', '2020-01-06')
+        self.assertNotIn('2020-01-01', db.loaded)
+        db.load_range('2020-01-01', '2020-01-01')
+        self.assertEqual(len(db.neo_date_db['2020-01-01']), rows)
+        self.assertEqual(sum(partition.rows for partition in
+                             db.loaded.values()),
+                         sum(map(len, db.neo_date_db.values())))
+
+    def test_row_decoder_matches_model_records(self):
+        with open(self.neo_data_file, newline='') as f:
+            reader = csv.reader(f)
+            decoder = RowDecoder(next(reader))
+            rows = list(reader)
+        with open(self.neo_data_file, newline='') as f:
+            dict_rows = list(csv.DictReader(f))
+
+        for row, dict_row in zip(rows, dict_rows):
+            self.assertEqual(decoder.neo_record(row),
+                             NearEarthObject.parse_record(dict_row))
+            self.assertEqual(decoder.orbit_record(row),
+                             OrbitPath.parse_record(dict_row))
+
+        with self.assertRaises(ValueError):
+            RowDecoder(['name', 'close_approach_date'])
+
+    def test_parallel_load_matches_serial_load(self):
+        serial_db = self.load_db()
+        parallel_db = self.load_db(workers=3)
+
+        self.assertEqual(list(parallel_db.neo_name_db), list(serial_db.neo_name_db))
+        self.assertEqual(list(parallel_db.neo_date_db), list(serial_db.neo_date_db))
+        for name, neo in parallel_db.neo_name_db.items():
+            self.assertEqual(
+                [orbit.to_record() for orbit in neo.orbits],
+                [orbit.to_record() for orbit in serial_db.neo_name_db[name].orbits]
+            )
+            for orbit in neo.orbits:
+                self.assertIs(orbit.neo, neo)
+        for date, orbits in parallel_db.neo_date_db.items():
+            self.assertEqual(
+                [(orbit.name, orbit.to_record()) for orbit in orbits],
+                [(orbit.name, orbit.to_record()) for orbit in serial_db.neo_date_db[date]]
+            )
+
+    def test_date_index_is_sorted(self):
+        db = self.load_db()
+        self.assertEqual(db.date_index, sorted(db.neo_date_db))
+        self.assertEqual(db.get_dates('2020-01-03', '2020-01-05'),
+                         ['2020-01-03', '2020-01-04', '2020-01-05'])
+        self.assertEqual(db.get_dates('2019-12-25', '2020-01-02'),
+                         ['2020-01-01', '2020-01-02'])
+        self.assertEqual(db.get_dates('2021-01-01', '2021-12-31'), [])
+
+    def test_insert_updates_date_index(self):
+        db = self.load_db()
+        neo = next(iter(db.neo_name_db.values()))
+        orbit = copy.copy(neo.orbits[0])
+        orbit.close_approach_date = '2019-12-31'
+
+        self.assertIs(db.insert(neo, orbit), neo)
+        self.assertEqual(db.date_index[0], '2019-12-31')
+        self.assertEqual(db.date_index, sorted(db.neo_date_db))
+        self.assertIn(orbit, neo.orbits)
+
+    def test_neo_aggregates_follow_orbits(self):
+        db = self.load_db()
+
+        for neo in db.neo_name_db.values():
+            closest = min(neo.orbits, key=lambda orbit: orbit.miss_distance_km)
+            dates = [orbit.close_approach_date for orbit in neo.orbits]
+            self.assertEqual(neo.approach_count, len(neo.orbits))
+            self.assertEqual(neo.closest_miss_km, closest.miss_distance_km)
+            self.assertEqual(neo.closest_approach_date,
+                             closest.close_approach_date)
+            self.assertEqual(neo.first_approach_date, min(dates))
+            self.assertEqual(neo.last_approach_date, max(dates))
+            self.assertEqual(neo.max_km_per_second,
+                             max(orbit.km_per_second for orbit in neo.orbits))
+
+        neo = next(iter(db.neo_name_db.values()))
+        orbit = copy.copy(neo.orbits[0])
+        orbit.close_approach_date = '2021-06-01'
+        orbit.miss_distance_km = neo.closest_miss_km / 2
+        db.insert(neo, orbit)
+
+        self.assertEqual(neo.closest_miss_km, orbit.miss_distance_km)
+        self.assertEqual(neo.closest_approach_date, '2021-06-01')
+        self.assertEqual(neo.last_approach_date, '2021-06-01')
+
+    def test_ingest_merges_delta(self):
+        db = self.load_db(columnar=True)
+        columns = db.get_columns()
+        stats = db.get_stats()
+        summaries = db.get_summaries()
+        orbit_count = len(columns)
+
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        header, first_row, last_row = lines[0], lines[1], lines[-1]
+        fields = last_row.split(',')
+        fields[17], fields[18] = '2020-01-11', '2020-Jan-11 12:00'
+        new_orbit = ','.join(fields)
+        new_neo = new_orbit.replace(new_orbit.split(',')[2], '(2020 ZZ1)')
+
+        delta_file = os.path.join(self.tmp_dir, 'delta.csv')
+        with open(delta_file, 'w') as f:
+            f.writelines([header, first_row, new_orbit, new_neo, new_orbit])
+
+        self.assertEqual(db.ingest(delta_file), 2)
+        self.assertIs(db.get_columns(), columns)
+        self.assertEqual(len(columns), orbit_count + 2)
+        self.assertIs(db.get_stats(), stats)
+        self.assertEqual(stats.count, orbit_count + 2)
+        self.assertEqual(stats.count_rows('2020-01-11', '2020-01-11'), 2)
+        self.assertIs(db.get_summaries(), summaries)
+        self.assertEqual(sum(summary.approaches for summary in
+                             summaries.get('2020-01-11').values()), 2)
+
+        neo = db.neo_name_db[new_orbit.split(',')[2]]
+        self.assertEqual(neo.orbits[-1].close_approach_date, '2020-01-11')
+        self.assertIs(neo.orbits[-1].neo, neo)
+        self.assertIn('(2020 ZZ1)', db.neo_name_db)
+        self.assertEqual(db.date_index[-1], '2020-01-11')
+        self.assertEqual(len(db.neo_date_db['2020-01-11']), 2)
+
+    def test_ingest_merges_into_indexes(self):
+        db = self.load_db(columnar=True, indexed=True, bitmaps=True)
+        columns = db.get_columns()
+        orbit_count = len(columns)
+
+        with open(self.neo_data_file) as f:
+            lines = f.readlines()
+        delta = [lines[0]]
+        for line in lines[1:20]:
+            fields = line.split(',')
+            fields[17], fields[18] = '2020-01-11', '2020-Jan-11 12:00'
+            delta.append(','.join(fields))
+
+        delta_file = os.path.join(self.tmp_dir, 'delta.csv')
+        with open(delta_file, 'w') as f:
+            f.writelines(delta)
+
+        # Orbits of the same NEO on the same date are merged
+        self.assertEqual(db.ingest(delta_file), 11)
+        self.assertIs(db.get_columns(), columns)
+        self.assertEqual(len(columns), orbit_count + 11)
+
+        rebuilt = OrbitColumns(db.neo_date_db, db.date_index)
+        rebuilt.build_indexes()
+        rebuilt.build_bitmaps()
+        for attribute in ('miss_distance_km', 'diameter_min_km'):
+            index = columns.indexes[attribute]
+            self.assertEqual(index.values,
+                             rebuilt.indexes[attribute].values)
+            self.assertEqual(index.rows, rebuilt.indexes[attribute].rows)
+        self.assertEqual(columns.indexes['is_hazardous'].buckets,
+                         rebuilt.indexes['is_hazardous'].buckets)
+        for attribute, index in columns.bitmaps.items():
+            for operation in (operator.ge, operator.lt):
+                value = getattr(columns, attribute)[-1]
+                self.assertEqual(
+                    list(bitmap_rows(index.get_bitmap(operation, value, 0,
+                                                      len(columns)), 0)),
+                    [row for row, row_value in
+                     enumerate(getattr(columns, attribute))
+                     if operation(row_value, value)])
+
+    def test_searches_see_whole_writes(self):
+        db = self.load_db(columnar=True)
+        templates = db.neo_date_db[db.date_index[0]][:5]
+        query = Query(start_date='2021-01-01', end_date='2021-12-31',
+                      number=None, return_object='Path').build_query()
+        counts = []
+
+        def write():
+            for day in range(1, 29):
+                with db.lock.write():
+                    for template in templates:
+                        orbit = copy.copy(template)
+                        orbit.close_approach_date = f'2021-02-{day:02}'
+                        db.insert(template.neo, orbit)
+
+        def read():
+            searcher = NEOSearcher(db)
+            for _ in range(50):
+                counts.append(searcher.count(query))
+
+        threads = [threading.Thread(target=write)] + \
+            [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(counts), 150)
+        self.assertTrue(all(count % len(templates) == 0 for count in counts))
+        self.assertEqual(NEOSearcher(db).count(query), 28 * len(templates))
+
+        lock = ReadWriteLock()
+        with lock.write(), lock.read(), lock.write():
+            self.assertIs(lock.writer, threading.current_thread())
+        with lock.read(), self.assertRaises(RuntimeError):
+            lock.acquire_write()
+        self.assertIsNone(lock.writer)
+
+
+if __name__ == '__main__':
+    unittest.main()
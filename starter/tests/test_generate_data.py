@@ -0,0 +1,55 @@
+import csv
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.generate_data import FIELDNAMES, generate
+from database import NEODatabase
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestGenerateData(unittest.TestCase):
+    """
+    Test Class with test cases for the synthetic Near Earth Object data
+    generated for the benchmarks.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def generate(self, name, **kwargs):
+        filename = os.path.join(self.tmp_dir, name)
+        generate(filename, 600, **kwargs)
+        with open(filename, 'rb') as f:
+            return filename, f.read()
+
+    def test_same_seed_generates_same_file(self):
+        _, first = self.generate('first.csv', seed=7)
+        _, second = self.generate('second.csv', seed=7)
+        _, other = self.generate('other.csv', seed=8)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_generated_file_has_loader_schema(self):
+        filename, _ = self.generate('neo.csv')
+        with open(f'{TESTS_ROOT}/data/neo_sample.csv', newline='') as f:
+            self.assertEqual(next(csv.reader(f)), FIELDNAMES)
+
+        db = NEODatabase(filename=filename)
+        db.load_data()
+        self.assertEqual(sum(map(len, db.neo_date_db.values())), 600)
+        self.assertEqual(db.date_index, sorted(db.date_index))
+        self.assertTrue(all(isinstance(neo.is_hazardous, bool)
+                            for neo in db.neo_name_db.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
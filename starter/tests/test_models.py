@@ -0,0 +1,72 @@
+import csv
+import pathlib
+import unittest
+
+from models import NearEarthObject, OrbitPath
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestModels(unittest.TestCase):
+    """
+    Test Class with test cases for the slotted, typed NearEarthObject and
+    OrbitPath models built from rows of a small sample of the Near Earth
+    Object data.
+    """
+
+    def setUp(self):
+        with open(f'{TESTS_ROOT}/data/neo_sample.csv', newline='') as f:
+            self.rows = list(csv.DictReader(f))
+
+    def test_parse_record_types_fields(self):
+        for row in self.rows:
+            neo = NearEarthObject(**row)
+            orbit = OrbitPath(neo=neo, **row)
+
+            self.assertIs(neo.is_hazardous,
+                          row['is_potentially_hazardous_asteroid'] == 'True')
+            for value in (neo.abs_magnitude_h, neo.diameter_min_km,
+                          neo.diameter_max_km, orbit.km_per_second,
+                          orbit.km_per_hour, orbit.miss_distance_km):
+                self.assertIsInstance(value, float)
+            self.assertEqual(orbit.miss_distance_km,
+                             float(row['miss_distance_kilometers']))
+            self.assertEqual(orbit.close_approach_date,
+                             row['close_approach_date'])
+
+    def test_records_round_trip(self):
+        row = self.rows[0]
+        neo = NearEarthObject(**row)
+        orbit = OrbitPath(neo=neo, **row)
+
+        copied_neo = NearEarthObject.from_record(neo.to_record())
+        copied_orbit = OrbitPath.from_record(copied_neo, orbit.to_record())
+
+        self.assertEqual(copied_neo.to_record(), neo.to_record())
+        self.assertEqual(copied_orbit.to_record(), orbit.to_record())
+        self.assertIs(copied_orbit.neo, copied_neo)
+        self.assertEqual(copied_neo.orbits, [])
+
+    def test_orbit_reads_neo_fields_from_its_neo(self):
+        row = self.rows[1]
+        neo = NearEarthObject(**row)
+        orbit = OrbitPath(neo=neo, **row)
+
+        for attribute in ('id', 'name', 'diameter_min_km', 'is_hazardous'):
+            self.assertEqual(getattr(orbit, attribute),
+                             getattr(neo, attribute))
+        neo.is_hazardous = not neo.is_hazardous
+        self.assertEqual(orbit.is_hazardous, neo.is_hazardous)
+
+        # Fields are slots, undeclared attributes cannot be set
+        with self.assertRaises(AttributeError):
+            neo.undeclared = 1
+        with self.assertRaises(AttributeError):
+            orbit.undeclared = 1
+        with self.assertRaises(AttributeError):
+            orbit.name = 'other'
+
+
+if __name__ == '__main__':
+    unittest.main()
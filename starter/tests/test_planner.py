@@ -0,0 +1,94 @@
+import pathlib
+import unittest
+
+from database import NEODatabase
+from planner import Plan
+from search import Filter, Query, NEOSearcher
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestQueryPlanner(unittest.TestCase):
+    """
+    Test Class with test cases for the data statistics and the QueryPlanner
+    on a small sample of the Near Earth Object data.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        cls.db.load_data()
+
+    def test_stats_count_rows_and_hazard_ratio(self):
+        stats = self.db.get_stats()
+        orbits = [orbit for approach_date in self.db.date_index
+                  for orbit in self.db.neo_date_db[approach_date]]
+
+        self.assertEqual(stats.count, len(orbits))
+        self.assertEqual(
+            stats.count_rows('2020-01-02', '2020-01-04'),
+            sum(len(self.db.neo_date_db[approach_date]) for approach_date in
+                self.db.get_dates('2020-01-02', '2020-01-04')))
+        self.assertEqual(stats.count_rows('2021-01-01', '2021-01-10'), 0)
+        self.assertAlmostEqual(
+            stats.get_column('is_hazardous').ratio,
+            sum(orbit.is_hazardous for orbit in orbits) / len(orbits))
+
+        distances = stats.get_column('miss_distance_km')
+        self.assertEqual(distances.min,
+                         min(orbit.miss_distance_km for orbit in orbits))
+        self.assertEqual(distances.fraction_below(distances.min), 0.0)
+        self.assertEqual(
+            distances.fraction_below(distances.max, inclusive=True), 1.0)
+
+    def test_filters_ordered_most_selective_first(self):
+        filters = Filter.create_filter_options(
+            ["is_hazardous:=:False", "distance:<:12000000"])
+        plan = NEOSearcher(self.db).planner.plan(
+            '2020-01-01', '2020-01-10', filters, None)
+
+        self.assertEqual(plan.access, Plan.ROWS)
+        self.assertEqual([filter.field for filter in plan.filters],
+                         ['distance', 'is_hazardous'])
+
+    def test_explain_counts_actual_rows(self):
+        indexed_db = NEODatabase(
+            filename=f'{TESTS_ROOT}/data/neo_sample.csv', indexed=True
+        )
+        indexed_db.load_data()
+
+        for db in (self.db, indexed_db):
+            searcher = NEOSearcher(db, explain=True)
+            plan, results = searcher.iter_planned(Query(
+                number=100, start_date='2020-01-02', end_date='2020-01-08',
+                filter=["distance:<:9000000", "diameter:>:0.05"],
+                return_object='Path'
+            ).build_query())
+            results = list(results)
+
+            self.assertEqual(plan.steps[-1].actual, len(results))
+            self.assertIn('estimated', plan.describe())
+
+        self.assertEqual(plan.access, Plan.INDEX)
+
+    def test_searches_sharing_a_searcher_keep_their_plans(self):
+        searcher = NEOSearcher(self.db, explain=True)
+        sorted_plan, sorted_results = searcher.iter_planned(Query(
+            number=3, start_date='2020-01-01', end_date='2020-01-10',
+            sort_by='distance', return_object='Path').build_query())
+        plan, results = searcher.iter_planned(Query(
+            number=None, start_date='2020-01-02', end_date='2020-01-08',
+            filter=["distance:<:9000000"], return_object='Path'
+        ).build_query())
+
+        self.assertEqual(len(list(sorted_results)), 3)
+        self.assertEqual(sorted_plan.steps[-1].label, 'top 3 by distance')
+        self.assertEqual(sorted_plan.steps[-1].actual, 3)
+        results = list(results)
+        self.assertEqual(plan.steps[-1].actual, len(results))
+        self.assertNotIn('top', plan.describe())
+
+
+if __name__ == '__main__':
+    unittest.main()
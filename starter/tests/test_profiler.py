@@ -0,0 +1,88 @@
+import pathlib
+import unittest
+from unittest import mock
+
+from database import NEODatabase
+from profiler import Profiler
+from search import Query, NEOSearcher
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestProfiler(unittest.TestCase):
+    """
+    Test Class with test cases for profiling the load and search stages on a
+    small sample of the Near Earth Object data.
+    """
+
+    def setUp(self):
+        self.query = Query(
+            number=5, start_date='2020-01-02', end_date='2020-01-08',
+            filter=["distance:<:40000000", "diameter:>:0.05"],
+            return_object='NEO'
+        ).build_query()
+
+    def test_profiled_search_matches_and_counts_rows(self):
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        db.load_data()
+        expected = [neo.name for neo in NEOSearcher(db).get_objects(
+            self.query)]
+
+        profiler = Profiler()
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv',
+                         profiler=profiler)
+        db.load_data()
+        searcher = NEOSearcher(db, explain=True, profiler=profiler)
+        with profiler.stage('write'):
+            plan, results = searcher.iter_planned(self.query)
+            results = list(results)
+
+        self.assertEqual([neo.name for neo in results], expected)
+        stages = {stage['stage']: stage for stage in
+                  profiler.summary()['stages']}
+        self.assertEqual(stages['load: csv parse']['rows_out'],
+                         sum(map(len, db.neo_date_db.values())))
+        self.assertEqual(stages['search: limit']['rows_out'], len(results))
+
+        # Each traced step consumes the rows of the one before it
+        for step in plan.steps[1:]:
+            name = 'search: ' + ('limit' if step is plan.steps[-1]
+                                 else step.label)
+            self.assertEqual(stages[name]['rows_out'], step.actual)
+        self.assertEqual(
+            stages['search: filter diameter > 0.05']['rows_in'],
+            stages['search: filter distance < 40000000.0']['rows_out'])
+
+        # Self times exclude nested stages, so they add up to the total
+        self.assertLessEqual(
+            sum(stage['wall_s'] for stage in stages.values()),
+            profiler.summary()['total_s'])
+        self.assertGreaterEqual(stages['write']['total_s'],
+                                stages['write']['wall_s'])
+
+    def test_hooks_called_after_each_stage(self):
+        calls = []
+        profiler = Profiler(hooks=[lambda profiler, stage:
+                                   calls.append(stage.name)])
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv',
+                         profiler=profiler)
+        db.load_data()
+        NEOSearcher(db, profiler=profiler).get_objects(self.query)
+
+        self.assertEqual(calls[:2], ['load: models', 'load: date index'])
+        self.assertIn('search: plan', calls)
+        self.assertIn('search', profiler.describe())
+
+    @unittest.skipIf(Profiler.peak_memory() is None, 'peak memory unknown')
+    def test_peak_memory_units_follow_platform(self):
+        usage = mock.Mock(ru_maxrss=2048)
+        with mock.patch('profiler.resource.getrusage', return_value=usage):
+            with mock.patch('profiler.sys.platform', 'darwin'):
+                self.assertEqual(Profiler.peak_memory(), 2048)
+            with mock.patch('profiler.sys.platform', 'linux'):
+                self.assertEqual(Profiler.peak_memory(), 2048 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,408 @@
+import argparse
+import copy
+import pathlib
+import unittest
+
+from cache import ResultCache
+from database import NEODatabase
+from exceptions import UnsupportedFeature
+from indexes import ChunkedBitmap, bitmap_rows
+from main import verify_number
+from planner import Plan
+from search import Filter, FilterExpression, Query, NEOSearcher
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestNEOSearcher(unittest.TestCase):
+    """
+    Test Class with test cases for the NEOSearcher on a small sample of the
+    Near Earth Object data.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        cls.db.load_data()
+
+    def search(self, **kwargs):
+        kwargs.setdefault('number', 100)
+        query_selectors = Query(**kwargs).build_query()
+        return NEOSearcher(self.db).get_objects(query_selectors)
+
+    def test_between_dates_missing_from_data(self):
+        results = self.search(
+            start_date='2019-12-01', end_date='2020-01-01', return_object='Path'
+        )
+        self.assertEqual(len(results), len(self.db.neo_date_db['2020-01-01']))
+
+        results = self.search(
+            start_date='2021-01-01', end_date='2021-01-10', return_object='Path'
+        )
+        self.assertEqual(results, [])
+
+    def test_between_dates_in_date_order(self):
+        results = self.search(
+            start_date='2020-01-02', end_date='2020-01-04', return_object='Path'
+        )
+        dates = [orbit.close_approach_date for orbit in results]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(set(dates), {'2020-01-02', '2020-01-03', '2020-01-04'})
+
+    def test_columnar_matches_row_search(self):
+        columnar_db = NEODatabase(
+            filename=f'{TESTS_ROOT}/data/neo_sample.csv', columnar=True
+        )
+        columnar_db.load_data()
+
+        for filters in (None, ["is_hazardous:=:True"], ["distance:<=:20000000"],
+                        ["diameter:>:0.042", "is_hazardous:=:False"]):
+            query_selectors = Query(
+                number=100, start_date='2020-01-02', end_date='2020-01-08',
+                filter=filters, return_object='Path'
+            ).build_query()
+            self.assertEqual(
+                [(o.name, o.close_approach_date) for o in
+                 NEOSearcher(columnar_db).get_objects(query_selectors)],
+                [(o.name, o.close_approach_date) for o in
+                 NEOSearcher(self.db).get_objects(query_selectors)]
+            )
+
+    def test_indexed_matches_row_search(self):
+        indexed_db = NEODatabase(
+            filename=f'{TESTS_ROOT}/data/neo_sample.csv', indexed=True
+        )
+        indexed_db.load_data()
+        self.assertTrue(indexed_db.get_columns().indexes)
+
+        for filters in (["distance:<:12000000"], ["distance:>=:60000000"],
+                        ["is_hazardous:=:True", "diameter:>:0.2"],
+                        ["diameter:=:0.118324", "distance:>:20000000"]):
+            query_selectors = Query(
+                number=100, start_date='2020-01-02', end_date='2020-01-08',
+                filter=filters, return_object='Path'
+            ).build_query()
+            self.assertEqual(
+                [(o.name, o.close_approach_date) for o in
+                 NEOSearcher(indexed_db).get_objects(query_selectors)],
+                [(o.name, o.close_approach_date) for o in
+                 NEOSearcher(self.db).get_objects(query_selectors)]
+            )
+
+    def test_filter_expressions(self):
+        columnar_db = NEODatabase(
+            filename=f'{TESTS_ROOT}/data/neo_sample.csv', columnar=True
+        )
+        columnar_db.load_data()
+        orbits = [orbit for approach_date in
+                  self.db.get_dates('2020-01-01', '2020-01-10')
+                  for orbit in self.db.neo_date_db[approach_date]]
+
+        expressions = {
+            ("distance:>=:10000000", "distance:<=:40000000"):
+                lambda o: 10000000 <= o.miss_distance_km <= 40000000,
+            ("distance:between:10000000:40000000 and not is_hazardous:=:true",):
+                lambda o: (10000000 <= o.miss_distance_km <= 40000000 and
+                           not o.is_hazardous),
+            ("is_hazardous:=:True OR (diameter:<:0.1 and distance:>:30000000)",):
+                lambda o: (o.is_hazardous or (o.diameter_min_km < 0.1 and
+                                              o.miss_distance_km > 30000000)),
+        }
+
+        for filters, predicate in expressions.items():
+            expected = [(o.name, o.close_approach_date_full)
+                        for o in orbits if predicate(o)]
+            self.assertTrue(expected)
+
+            for db in (self.db, columnar_db):
+                query_selectors = Query(
+                    number=100, start_date='2020-01-01', end_date='2020-01-10',
+                    filter=list(filters), return_object='Path'
+                ).build_query()
+                self.assertEqual(
+                    [(o.name, o.close_approach_date_full) for o in
+                     NEOSearcher(db).get_objects(query_selectors)],
+                    expected
+                )
+
+    def test_compiled_filters_and_incomplete_expressions(self):
+        orbits = self.db.neo_date_db['2020-01-04']
+        filters = Filter.create_filter_options(
+            ["not (is_hazardous:=:true or diameter:>:0.5)",
+             "distance:between:10000000:60000000"])
+        predicate = FilterExpression.compile(filters)
+        self.assertEqual(
+            [orbit for orbit in orbits if predicate(orbit)],
+            [orbit for orbit in orbits
+             if not (orbit.is_hazardous or orbit.diameter_min_km > 0.5) and
+             10000000 <= orbit.miss_distance_km <= 60000000])
+        self.assertTrue(all(map(FilterExpression.compile([]), orbits)))
+
+        class FilterXor(FilterExpression):
+            def atoms(self):
+                return iter(())
+
+        with self.assertRaises(TypeError):
+            FilterXor()
+
+    def test_bitmap_matches_row_search(self):
+        bitmap_db = NEODatabase(filename=self.db.filename, bitmaps=True)
+        bitmap_db.load_data()
+        self.assertTrue(bitmap_db.get_columns().bitmaps)
+
+        for filters in (["is_hazardous:=:True", "distance:<:30000000"],
+                        ["distance:between:10000000:40000000 and "
+                         "not is_hazardous:=:true"],
+                        ["is_hazardous:=:True OR (diameter:<:0.1 and "
+                         "distance:>:30000000)"],
+                        ["diameter:=:0.118324"]):
+            query_selectors = Query(
+                number=None, start_date='2020-01-02', end_date='2020-01-08',
+                filter=filters, return_object='Path'
+            ).build_query()
+            searcher = NEOSearcher(bitmap_db)
+            expected = [(o.name, o.close_approach_date_full) for o in
+                        NEOSearcher(self.db).get_objects(query_selectors)]
+
+            plan, results = searcher.iter_planned(query_selectors)
+            self.assertEqual(
+                [(o.name, o.close_approach_date_full) for o in results],
+                expected)
+            self.assertEqual(plan.access, Plan.BITMAP)
+            plan, count = searcher.count_planned(query_selectors)
+            self.assertEqual(plan.access, Plan.BITMAP)
+            self.assertEqual(count, len(expected))
+            self.assertEqual(NEOSearcher(self.db).count(query_selectors),
+                             len(expected))
+
+        # Rows appended to the columnar copy are added to the bitmaps
+        query_selectors = Query(
+            number=None, start_date='2020-01-01', end_date='2020-01-31',
+            filter=["is_hazardous:=:True"], return_object='Path'
+        ).build_query()
+        count = NEOSearcher(bitmap_db).count(query_selectors)
+        neo = next(neo for neo in bitmap_db.neo_name_db.values()
+                   if neo.is_hazardous)
+        orbit = copy.copy(neo.orbits[0])
+        orbit.close_approach_date = '2020-01-11'
+        bitmap_db.insert(neo, orbit)
+        self.assertEqual(NEOSearcher(bitmap_db).count(query_selectors),
+                         count + 1)
+
+    def test_chunked_bitmap_slices_across_chunks(self):
+        rows = list(range(3, 200000, 7))
+        bitmap = ChunkedBitmap(rows[:20000])
+        for row in rows[20000:]:
+            bitmap.add(row)
+        others = ChunkedBitmap([0, 65536, 131073])
+
+        for start, end in ((0, 10), (65530, 65545), (1000, 150000),
+                           (190000, 400000), (300000, 300010)):
+            expected = [row for row in rows if start <= row < end]
+            self.assertEqual(
+                list(bitmap_rows(bitmap.get(start, end), start)), expected)
+            union = ChunkedBitmap.union([bitmap, others], start, end)
+            self.assertEqual(
+                list(bitmap_rows(union, start)),
+                sorted(expected + [row for row in (0, 65536, 131073)
+                                   if start <= row < end]))
+
+    def test_neo_results_are_unique(self):
+        orbits = self.search(start_date='2020-01-01', end_date='2020-01-10',
+                             return_object='Path')
+        distinct = []
+        for orbit in orbits:
+            if orbit.neo not in distinct:
+                distinct.append(orbit.neo)
+
+        self.assertLess(len(distinct), len(orbits))
+        self.assertEqual(
+            self.search(start_date='2020-01-01', end_date='2020-01-10'),
+            distinct)
+        self.assertEqual(
+            self.search(start_date='2020-01-01', end_date='2020-01-10',
+                        number=5),
+            distinct[:5])
+
+    def test_group_by_matches_orbits(self):
+        orbits = self.search(start_date='2020-01-01', end_date='2020-01-10',
+                             number=None, return_object='Path')
+        days = {}
+        for orbit in orbits:
+            days.setdefault(orbit.close_approach_date, []).append(orbit)
+        expected = [
+            (day, len(day_orbits), sum(o.is_hazardous for o in day_orbits),
+             len({o.name for o in day_orbits}),
+             min(o.miss_distance_km for o in day_orbits),
+             max(o.miss_distance_km for o in day_orbits))
+            for day, day_orbits in sorted(days.items())]
+
+        columnar_db = NEODatabase(filename=self.db.filename, columnar=True)
+        columnar_db.load_data()
+
+        for db, filters in ((self.db, None),
+                            (self.db, ["distance:>=:0"]),
+                            (columnar_db, ["diameter:>=:0"])):
+            query_selectors = Query(
+                start_date='2020-01-01', end_date='2020-01-10', number=None,
+                filter=filters, group_by='day').build_query()
+            summaries = NEOSearcher(db).get_objects(query_selectors)
+            self.assertEqual(
+                [(s.period, s.approaches, s.hazardous, s.distinct_neos,
+                  s.miss_min_km, s.miss_max_km) for s in summaries],
+                expected)
+
+        summaries = self.search(start_date='2020-01-01',
+                                end_date='2020-12-31', group_by='year',
+                                by_hazard=True)
+        self.assertEqual([(s.period, s.is_hazardous) for s in summaries],
+                         [('2020', False), ('2020', True)])
+        self.assertEqual(sum(s.approaches for s in summaries),
+                         self.db.get_stats().count_rows('2020-01-01',
+                                                        '2020-12-31'))
+        with self.assertRaises(UnsupportedFeature):
+            Query(date='2020-01-01', group_by='week').build_query()
+
+    def test_sort_by_matches_full_sort(self):
+        indexed_db = NEODatabase(filename=self.db.filename, indexed=True)
+        indexed_db.load_data()
+        attributes = {'distance': 'miss_distance_km',
+                      'diameter': 'diameter_min_km',
+                      'speed': 'km_per_second',
+                      'date': 'close_approach_date'}
+        filters = ["is_hazardous:=:False"]
+        orbits = self.search(start_date='2020-01-01', end_date='2020-12-31',
+                             number=None, filter=filters,
+                             return_object='Path')
+
+        for sort_by, attribute in attributes.items():
+            for descending, number in ((False, 3), (True, 3), (True, 12)):
+                # Ties keep the stream order in either direction
+                ordered = sorted(orbits, key=lambda orbit: getattr(
+                    orbit, attribute), reverse=descending)
+                expected = {
+                    'Path': [(o.name, o.close_approach_date_full)
+                             for o in ordered[:number]],
+                    'NEO': [neo.name for neo in
+                            dict.fromkeys(o.neo for o in ordered)][:number]}
+
+                for db in (self.db, indexed_db):
+                    for return_object in ('Path', 'NEO'):
+                        query_selectors = Query(
+                            start_date='2020-01-01', end_date='2020-12-31',
+                            number=number, filter=filters, sort_by=sort_by,
+                            descending=descending,
+                            return_object=return_object).build_query()
+                        plan, results = NEOSearcher(db).iter_planned(
+                            query_selectors)
+                        results = list(results)
+                        self.assertEqual(
+                            [(o.name, o.close_approach_date_full)
+                             if return_object == 'Path' else o.name
+                             for o in results],
+                            expected[return_object],
+                            (sort_by, descending, return_object))
+
+                        # Few results are read in the order of the index
+                        if db is indexed_db and number == 3 and \
+                                sort_by in ('distance', 'diameter'):
+                            self.assertEqual(plan.access,
+                                             'sorted index scan')
+
+    def test_neo_aggregate_filters(self):
+        neos = self.search(start_date='2020-01-01', end_date='2020-01-10')
+        closest = sorted(neo.closest_miss_km for neo in neos)[len(neos) // 2]
+
+        results = self.search(
+            start_date='2020-01-01', end_date='2020-01-10',
+            filter=[f"closest_distance:<:{closest}", "approaches:>=:2"])
+        self.assertEqual(results, [
+            neo for neo in neos
+            if neo.closest_miss_km < closest and neo.approach_count >= 2])
+
+        orbits = self.search(
+            start_date='2020-01-01', end_date='2020-01-10',
+            filter=["max_speed:>:20", "is_hazardous:=:False"],
+            return_object='Path')
+        self.assertTrue(orbits)
+        self.assertTrue(all(orbit.neo.max_km_per_second > 20 and
+                            not orbit.is_hazardous for orbit in orbits))
+
+        with self.assertRaises(UnsupportedFeature):
+            self.search(start_date='2020-01-01', end_date='2020-01-10',
+                        filter=["approaches:>:1 or distance:<:1000"])
+
+    def test_malformed_filter_expressions(self):
+        for filters in (["is_hazardous:=:maybe"], ["distance:>:far"],
+                        ["(distance:>:1 or diameter:<:1"], ["not"],
+                        ["distance:between:1"], ["size:>:1"]):
+            with self.assertRaises(UnsupportedFeature):
+                self.search(start_date='2020-01-01', end_date='2020-01-10',
+                            filter=filters)
+
+    def test_negative_number_rejected(self):
+        for number in (-1, '5'):
+            with self.assertRaises(UnsupportedFeature):
+                self.search(date='2020-01-04', number=number)
+        self.assertEqual(len(self.search(date='2020-01-04', number=0)), 0)
+
+        self.assertEqual(verify_number('3'), 3)
+        for number_str in ('-1', 'many'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                verify_number(number_str)
+
+    def test_iter_objects_stops_at_number(self):
+        fetched_dates = []
+
+        class TrackingDict(dict):
+            def get(self, key, default=None):
+                fetched_dates.append(key)
+                return super().get(key, default)
+
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        db.load_data()
+        db.neo_date_db = TrackingDict(db.neo_date_db)
+
+        query_selectors = Query(
+            number=2, start_date='2020-01-01', end_date='2020-01-10', return_object='Path'
+        ).build_query()
+        results = NEOSearcher(db).iter_objects(query_selectors)
+        self.assertEqual(fetched_dates, [])
+
+        self.assertEqual(len(list(results)), 2)
+        self.assertEqual(fetched_dates, ['2020-01-01'])
+
+    def test_cache_serves_smaller_numbers_and_invalidates(self):
+        db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        db.load_data()
+        searcher = NEOSearcher(db, cache=ResultCache())
+
+        def search(number, filters):
+            query_selectors = Query(
+                number=number, start_date='2020-01-01', end_date='2020-01-10',
+                filter=filters, return_object='Path'
+            ).build_query()
+            return searcher.get_objects(query_selectors)
+
+        expected = NEOSearcher(db).get_objects(Query(
+            number=5, start_date='2020-01-01', end_date='2020-01-10',
+            filter=["is_hazardous:=:False", "distance:>:1000"], return_object='Path'
+        ).build_query())
+
+        search(10, ["is_hazardous:=:False", "distance:>:1000"])
+        results = search(5, ["distance:>:1000.0", "is_hazardous:=:False"])
+        self.assertEqual(results, expected)
+        self.assertEqual((searcher.cache.hits, searcher.cache.misses), (1, 1))
+
+        search(20, ["distance:>:1000", "is_hazardous:=:False"])
+        self.assertEqual(searcher.cache.misses, 2)
+
+        neo = next(iter(db.neo_name_db.values()))
+        db.insert(neo, neo.orbits[0])
+        search(5, ["distance:>:1000", "is_hazardous:=:False"])
+        self.assertEqual((searcher.cache.misses, searcher.cache.invalidations), (3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pathlib
+import threading
+import unittest
+
+from database import NEODatabase
+from server import NEOServer
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestNEOServer(unittest.TestCase):
+    """
+    Test Class with test cases for answering queries over HTTP with the
+    NEOServer on a small sample of the Near Earth Object data.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        cls.db.load_data()
+
+    def fetch(self, *targets):
+        async def run():
+            server = NEOServer(self.db, port=0)
+            await server.start()
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            responses = []
+
+            for target in targets:
+                writer.write(f'GET {target} HTTP/1.1\r\n\r\n'.encode())
+                status = (await reader.readline()).decode().split(' ', 1)[1].strip()
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    key, _, value = line.partition(':')
+                    headers[key.lower()] = value.strip()
+                body = await reader.readexactly(int(headers['content-length']))
+                responses.append((status, headers['content-type'], body))
+
+            writer.close()
+            server.server.close()
+            await server.server.wait_closed()
+            return responses
+
+        return asyncio.run(run())
+
+    def test_query_json_and_csv(self):
+        (status, content_type, body), (csv_status, csv_type, csv_body) = self.fetch(
+            '/query?date=2020-01-04&number=5&return_object=Path&filter=is_hazardous:=:False',
+            '/query?date=2020-01-04&number=5&format=csv'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(content_type, 'application/json')
+        rows = json.loads(body)
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row['close_approach_date'] == '2020-01-04' for row in rows))
+        self.assertTrue(all(row['is_potentially_hazardous'] is False for row in rows))
+
+        self.assertEqual(csv_status, '200 OK')
+        self.assertEqual(csv_type, 'text/csv')
+        self.assertEqual(len(csv_body.decode().strip().splitlines()), 6)
+
+    def test_bad_query_and_stats(self):
+        (status, _, _), (stats_status, _, body) = self.fetch(
+            '/query?date=2020-01-04&return_object=Comet', '/stats'
+        )
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(stats_status, '200 OK')
+        stats = json.loads(body)
+        self.assertEqual((stats['queries'], stats['errors']), (1, 1))
+
+    def test_slow_query_does_not_block_other_requests(self):
+        released = threading.Event()
+
+        async def request(port, target):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {target} HTTP/1.0\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b'\r\n\r\n')
+            return head.decode().split(' ', 2)[1], body
+
+        async def run():
+            server = NEOServer(self.db, port=0, threads=4)
+            search = server.searcher.iter_objects
+
+            def slow_search(query_selectors):
+                # The first search waits until released
+                if not released.is_set():
+                    released.wait(5)
+                return search(query_selectors)
+
+            server.searcher.iter_objects = slow_search
+            await server.start()
+
+            slow = asyncio.ensure_future(request(
+                server.port, '/query?date=2020-01-04&number=5'))
+            await asyncio.sleep(0.1)
+            stats = await asyncio.wait_for(request(server.port, '/stats'), 2)
+            blocked = not slow.done()
+            released.set()
+            queries = await asyncio.gather(slow, *(
+                request(server.port, f'/query?date=2020-01-0{day}&number=3')
+                for day in range(1, 9)))
+
+            server.server.close()
+            await server.server.wait_closed()
+            return stats, blocked, queries
+
+        (stats_status, stats_body), blocked, queries = asyncio.run(run())
+        self.assertEqual(stats_status, '200')
+        self.assertEqual(json.loads(stats_body)['queries'], 0)
+        self.assertTrue(blocked)
+        self.assertEqual([status for status, _ in queries], ['200'] * 9)
+        self.assertEqual(len(json.loads(queries[0][1])), 5)
+        self.assertTrue(all(len(json.loads(body)) == 3
+                            for _, body in queries[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
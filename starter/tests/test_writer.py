@@ -0,0 +1,75 @@
+import csv
+import gzip
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+from database import NEODatabase
+from search import Query, NEOSearcher
+from writer import NEOWriter
+
+
+TESTS_ROOT = pathlib.Path(__file__).parent
+
+
+class TestNEOWriter(unittest.TestCase):
+    """
+    Test Class with test cases for writing search results with the NEOWriter
+    on a small sample of the Near Earth Object data.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(filename=f'{TESTS_ROOT}/data/neo_sample.csv')
+        cls.db.load_data()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def search(self, **kwargs):
+        query_selectors = Query(**kwargs).build_query()
+        return NEOSearcher(self.db).iter_objects(query_selectors)
+
+    def read_csv(self, filename, opener=open):
+        with opener(filename, 'rt', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_write_csv_streams_results(self):
+        filename = os.path.join(self.tmp_dir, 'paths.csv')
+        results = self.search(number=5, date='2020-01-04', return_object='Path')
+
+        self.assertTrue(NEOWriter().write('csv_file', results, filename=filename))
+        rows = self.read_csv(filename)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[0]), NEOWriter.Fieldnames[type(self.db.neo_date_db['2020-01-04'][0])])
+        self.assertEqual(rows[0]['close_approach_date'], '2020-01-04')
+
+    def test_write_csv_matches_get_row(self):
+        filename = os.path.join(self.tmp_dir, 'neos.csv.gz')
+        neos = list(self.search(number=3, date='2020-01-04', return_object='NEO'))
+
+        NEOWriter().write('csv_file', iter(neos), filename=filename)
+        rows = self.read_csv(filename, opener=gzip.open)
+        self.assertEqual(rows, [
+            {key: str(value) for key, value in NEOWriter.get_row(neo).items()}
+            for neo in neos
+        ])
+
+    def test_write_csv_without_results(self):
+        filename = os.path.join(self.tmp_dir, 'empty.csv')
+        results = self.search(number=5, start_date='2021-01-01', end_date='2021-01-02')
+
+        self.assertTrue(NEOWriter().write('csv_file', results, filename=filename,
+                                          return_object='NEO'))
+        with open(filename) as f:
+            self.assertEqual(f.read().strip().split(','), NEOWriter.Fieldnames[
+                NEOWriter.ReturnObjects['NEO']])
+
+
+if __name__ == '__main__':
+    unittest.main()
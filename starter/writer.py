@@ -1,8 +1,15 @@
+from contextlib import contextmanager
 from enum import Enum
+from itertools import chain
+from operator import attrgetter
+from aggregate import Summary
 from models import NearEarthObject, OrbitPath
 from exceptions import UnsupportedFeature
 
 import csv
+import gzip
+import io
+import sys
 
 
 class OutputFormat(Enum):
@@ -20,12 +27,100 @@ class OutputFormat(Enum):
         return list(map(lambda output: output.value, OutputFormat))
 
 
+def extract_neo(neo):
+    """
+    Row extractor for a NearEarthObject, in the order of its fieldnames
+    """
+    return (neo.id,
+            neo.neo_reference_id,
+            neo.name,
+            neo.nasa_jpl_url,
+            neo.abs_magnitude_h,
+            neo.diameter_min_km,
+            neo.diameter_max_km,
+            neo.is_hazardous,
+            NearEarthObject.get_orbit_dates(neo.orbits),
+            NearEarthObject.get_miss_distances(neo.orbits))
+
+
 class NEOWriter(object):
     """
     Python object use to write the results from supported output
     formatting options.
+
+    Results are written to csv as a stream: rows are extracted into tuples
+    by a function chosen once per output, rather than a dict per row, and
+    written through a large buffer, so exports run in constant memory.
     """
 
+    # a dict of return object name to result type, used to pick the
+    # fieldnames when there are no results
+    ReturnObjects = {'NEO': NearEarthObject, 'Path': OrbitPath,
+                     'Summary': Summary}
+
+    # a dict of result type to csv fieldnames
+    Fieldnames = {
+        NearEarthObject: ['id',
+                          'neo_reference_id',
+                          'name',
+                          'nasa_jpl_url',
+                          'absolute_magnitude_h',
+                          'estimated_diameter_min_km',
+                          'estimated_diameter_max_km',
+                          'is_potentially_hazardous',
+                          'orbit_dates',
+                          'miss_distances_km'
+                          ],
+        OrbitPath: ['id',
+                    'neo_reference_id',
+                    'name',
+                    'km_per_second',
+                    'km_per_hour',
+                    'close_approach_date',
+                    'close_approach_date_full',
+                    'estimated_diameter_min_km',
+                    'estimated_diameter_max_km',
+                    'is_potentially_hazardous',
+                    'miss_distance_km'
+                    ],
+        Summary: ['period',
+                  'is_potentially_hazardous',
+                  'approaches',
+                  'hazardous_approaches',
+                  'distinct_neos',
+                  'min_miss_distance_km',
+                  'mean_miss_distance_km',
+                  'max_miss_distance_km'
+                  ]
+    }
+
+    # a dict of result type to the function extracting a csv row tuple
+    Extractors = {
+        NearEarthObject: extract_neo,
+        OrbitPath: attrgetter('id',
+                              'neo_reference_id',
+                              'name',
+                              'km_per_second',
+                              'km_per_hour',
+                              'close_approach_date',
+                              'close_approach_date_full',
+                              'diameter_min_km',
+                              'diameter_max_km',
+                              'is_hazardous',
+                              'miss_distance_km'),
+        Summary: attrgetter('period',
+                            'is_hazardous',
+                            'approaches',
+                            'hazardous',
+                            'distinct_neos',
+                            'miss_min_km',
+                            'miss_mean_km',
+                            'miss_max_km')
+    }
+
+    # Size in bytes of the output buffer
+    BUFFER_SIZE = 1 << 20
+
     def __init__(self):
         # TODO: How can we use the OutputFormat in the NEOWriter?
         self.output_format = OutputFormat.list()
@@ -36,9 +131,12 @@ class NEOWriter(object):
         calls the appropriate instance write function
 
         :param format: str representing the OutputFormat
-        :param data: collection of NearEarthObject or OrbitPath results
+        :param data: iterable of NearEarthObject or OrbitPath results,
+        consumed only once
         :param kwargs: Additional attributes used for formatting output
-        e.g. filename
+        e.g. filename ('-' for stdout, results.csv by default), compress
+        (gzip the csv, also implied by a .gz filename) and return_object
+        (the result type, used for the header when there are no results)
 
         :return: bool representing if write successful or not
         """
@@ -55,79 +153,108 @@ class NEOWriter(object):
                 print(row)
 
         elif output_choice == 1:
-            with open('results.csv', 'w') as csvfile:
-                fieldnames = self.get_fieldnames(data[0])
-
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-                writer.writeheader()
-
-                if type(data[0]) == NearEarthObject:
-                    for row in data:
-                        writer.writerow({
-                            'id': row.id,
-                            'neo_reference_id': row.neo_reference_id,
-                            'name': row.name,
-                            'nasa_jpl_url': row.nasa_jpl_url,
-                            'absolute_magnitude_h': row.abs_magnitude_h,
-                            'estimated_diameter_min_km': row.diameter_min_km,
-                            'estimated_diameter_max_km': row.diameter_max_km,
-                            'is_potentially_hazardous': row.is_hazardous,
-                            'orbit_dates':
-                                NearEarthObject.get_orbit_dates(row.orbits),
-                            'miss_distances_km':
-                                NearEarthObject.get_miss_distances(row.orbits)
-                            })
-
-                else:
-                    for row in data:
-                        writer.writerow({
-                            'id': row.id,
-                            'neo_reference_id': row.neo_reference_id,
-                            'name': row.name,
-                            'km_per_second': row.km_per_second,
-                            'km_per_hour': row.km_per_hour,
-                            'close_approach_date': row.close_approach_date,
-                            'close_approach_date_full':
-                                row.close_approach_date_full,
-                            'estimated_diameter_min_km': row.diameter_min_km,
-                            'estimated_diameter_max_km': row.diameter_max_km,
-                            'is_potentially_hazardous': row.is_hazardous,
-                            'miss_distance_km': row.miss_distance_km
-                            })
+            self.write_csv(
+                data,
+                filename=kwargs.get('filename') or 'results.csv',
+                compress=kwargs.get('compress', False),
+                return_object=kwargs.get('return_object')
+            )
 
         else:
             raise UnsupportedFeature
 
         return True
 
-    def get_fieldnames(self, obj):
-        fieldnames = None
+    def write_csv(self, data, filename='results.csv', compress=False,
+                  return_object=None):
+        """
+        Streams results to a csv file
 
-        if type(obj) == NearEarthObject:
-            fieldnames = ['id',
-                          'neo_reference_id',
-                          'name',
-                          'nasa_jpl_url',
-                          'absolute_magnitude_h',
-                          'estimated_diameter_min_km',
-                          'estimated_diameter_max_km',
-                          'is_potentially_hazardous',
-                          'orbit_dates',
-                          'miss_distances_km'
-                          ]
+        :param data: iterable of NearEarthObject or OrbitPath results
+        :param filename: str representing the output pathway, '-' for stdout
+        :param compress: bool representing if the output is gzip compressed
+        :param return_object: optional str representing the result type,
+        'NEO', 'Path' or 'Summary'
+        :return: None
+        """
+        # Peek at the first result to pick the row type, then put it back
+        # in front of the rest of the stream
+        data = iter(data)
+        first = next(data, None)
+
+        if first is not None:
+            row_type = type(first)
+            data = chain([first], data)
         else:
-            fieldnames = ['id',
-                          'neo_reference_id',
-                          'name',
-                          'km_per_second',
-                          'km_per_hour',
-                          'close_approach_date',
-                          'close_approach_date_full',
-                          'estimated_diameter_min_km',
-                          'estimated_diameter_max_km',
-                          'is_potentially_hazardous',
-                          'miss_distance_km'
-                          ]
+            row_type = NEOWriter.ReturnObjects.get(return_object, OrbitPath)
+
+        extract = NEOWriter.Extractors[row_type]
+
+        with NEOWriter.open_output(filename, compress) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(NEOWriter.Fieldnames[row_type])
+            writer.writerows(map(extract, data))
+
+    @staticmethod
+    @contextmanager
+    def open_output(filename, compress=False):
+        """
+        Opens a buffered text stream for csv output
+
+        :param filename: str representing the output pathway, '-' for stdout
+        :param compress: bool representing if the output is gzip compressed,
+        implied by a filename ending in .gz
+        :return: context manager of a text stream
+        """
+        compress = compress or filename.endswith('.gz')
 
-        return fieldnames
+        if filename == '-':
+            sys.stdout.flush()
+            raw = sys.stdout.buffer
+        else:
+            raw = open(filename, 'wb', buffering=0)
+
+        try:
+            if compress:
+                raw_stream = gzip.GzipFile(fileobj=raw, mode='wb')
+            else:
+                raw_stream = raw
+
+            buffered = io.BufferedWriter(raw_stream, NEOWriter.BUFFER_SIZE)
+            stream = io.TextIOWrapper(buffered, newline='')
+
+            try:
+                yield stream
+            finally:
+                # Detach rather than close the wrappers, which would also
+                # close stdout
+                stream.detach()
+                buffered.detach()
+                if compress:
+                    raw_stream.close()
+
+        finally:
+            if filename == '-':
+                raw.flush()
+            else:
+                raw.close()
+
+    @staticmethod
+    def get_row(obj):
+        """
+        Converts a search result into a dict of fieldname to value
+
+        :param obj: NearEarthObject or OrbitPath
+        :return: dict with the keys returned by get_fieldnames
+        """
+        row_type = type(obj)
+        return dict(zip(NEOWriter.Fieldnames[row_type],
+                        NEOWriter.Extractors[row_type](obj)))
+
+    def get_fieldnames(self, obj):
+        """
+        :param obj: NearEarthObject or OrbitPath
+        :return: list of csv fieldnames for the type of the result
+        """
+        return NEOWriter.Fieldnames.get(type(obj),
+                                        NEOWriter.Fieldnames[OrbitPath])